@@ -0,0 +1,251 @@
+import bisect
+import heapq
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Section name inside an edit summary, e.g. "/* History */ fix typo"
+SECTION_RE = re.compile(r'/\*\s*(.*?)\s*\*/')
+
+# Sliding windows served from the aggregates, in seconds
+WINDOWS = {"24h": 24 * 3600, "7d": 7 * 24 * 3600}
+
+class _Counts:
+    """
+    Per-title / per-user tallies for one time bucket or one whole window.
+    """
+    __slots__ = ("title_edits", "title_users", "title_sections", "user_counts")
+
+    def __init__(self):
+        self.title_edits = Counter()
+        self.title_users = defaultdict(Counter)
+        self.title_sections = defaultdict(Counter)
+        self.user_counts = Counter()
+
+    def add(self, title: Optional[str], user: Optional[str], section: Optional[str]):
+        if user:
+            self.user_counts[user] += 1
+        if title:
+            self.title_edits[title] += 1
+            if user:
+                self.title_users[title][user] += 1
+            if section:
+                self.title_sections[title][section] += 1
+
+class _Window(_Counts):
+    __slots__ = ("span", "cutoff", "title_last")
+
+    def __init__(self, span: int, cutoff: int):
+        super().__init__()
+        self.span = span
+        # Oldest bucket start still included in the window
+        self.cutoff = cutoff
+        # title -> (epoch, pageid, user, revid) of its newest edit
+        self.title_last: Dict[str, Tuple] = {}
+
+    def subtract(self, bucket: _Counts):
+        for user, count in bucket.user_counts.items():
+            self.user_counts[user] -= count
+            if self.user_counts[user] <= 0:
+                del self.user_counts[user]
+
+        for title, count in bucket.title_edits.items():
+            self.title_edits[title] -= count
+            if self.title_edits[title] <= 0:
+                # No edits left for this title in the window
+                del self.title_edits[title]
+                self.title_users.pop(title, None)
+                self.title_sections.pop(title, None)
+                self.title_last.pop(title, None)
+                continue
+
+            users = self.title_users.get(title)
+            if users is not None:
+                for user, n in bucket.title_users.get(title, {}).items():
+                    users[user] -= n
+                    if users[user] <= 0:
+                        del users[user]
+                if not users:
+                    del self.title_users[title]
+
+            sections = self.title_sections.get(title)
+            if sections is not None:
+                for section, n in bucket.title_sections.get(title, {}).items():
+                    sections[section] -= n
+                    if sections[section] <= 0:
+                        del sections[section]
+                if not sections:
+                    del self.title_sections[title]
+
+class WindowAggregator:
+    """
+    Incrementally maintained top-N aggregates over sliding 24h / 7d windows.
+    Each edit is added to a time bucket and to every window total in O(1);
+    when a bucket slides out of a window it is subtracted from that window's total.
+    Reads are a heap selection over the window totals, not a rescan of the edits.
+    A window keeps whole buckets, including the one holding its start, so it
+    covers its full span plus at most one bucket (`bucket_seconds`) of older edits
+    (for the store-fed 7d window, no older than the store's retention).
+    """
+
+    def __init__(self, bucket_seconds: int = 300, windows: Dict[str, int] = WINDOWS):
+        self.bucket_seconds = bucket_seconds
+        self.buckets: Dict[int, _Counts] = {}
+        self.bucket_starts: List[int] = []
+        now = int(time.time())
+        self.windows = {
+            period: _Window(span, self._bucket_of(now - span))
+            for period, span in windows.items()
+        }
+        # Bumped on every change; lets readers detect that results may differ
+        self.version = 0
+
+    def _bucket_of(self, epoch: int) -> int:
+        return epoch - epoch % self.bucket_seconds
+
+    def clear(self):
+        now = int(time.time())
+        self.buckets = {}
+        self.bucket_starts = []
+        self.windows = {
+            period: _Window(window.span, self._bucket_of(now - window.span))
+            for period, window in self.windows.items()
+        }
+        self.version += 1
+
+    def add(self, edit, expire: bool = True):
+        """
+        Adds one EditRecord (O(1) per window).
+        Bulk loaders call `expire()` once up front and pass expire=False.
+        """
+        if expire:
+            self.expire()
+
+        epoch = edit.epoch
+        start = self._bucket_of(epoch)
+        if all(start < window.cutoff for window in self.windows.values()):
+            return
+
+        title = edit.title
+        user = edit.user
+        section = None
+        comment = edit.comment
+        if comment:
+            match = SECTION_RE.search(comment)
+            if match:
+                section = match.group(1).strip() or None
+
+        bucket = self.buckets.get(start)
+        if bucket is None:
+            bucket = self.buckets[start] = _Counts()
+            bisect.insort(self.bucket_starts, start)
+        bucket.add(title, user, section)
+
+        for window in self.windows.values():
+            if start < window.cutoff:
+                continue
+            window.add(title, user, section)
+            if title:
+                last = window.title_last.get(title)
+                if last is None or last[0] <= epoch:
+                    window.title_last[title] = (epoch, edit.pageid, user or None, edit.revid)
+
+        self.version += 1
+
+    def expire(self, now: Optional[int] = None):
+        """
+        Slides every window forward to `now`, subtracting the buckets that fell out.
+        """
+        if now is None:
+            now = int(time.time())
+
+        for window in self.windows.values():
+            new_cutoff = self._bucket_of(now - window.span)
+            if new_cutoff <= window.cutoff:
+                continue
+            lo = bisect.bisect_left(self.bucket_starts, window.cutoff)
+            hi = bisect.bisect_left(self.bucket_starts, new_cutoff)
+            for start in self.bucket_starts[lo:hi]:
+                window.subtract(self.buckets[start])
+            window.cutoff = new_cutoff
+            self.version += 1
+
+        # Buckets older than the widest window are no longer needed
+        oldest = min(window.cutoff for window in self.windows.values())
+        drop = bisect.bisect_left(self.bucket_starts, oldest)
+        if drop:
+            for start in self.bucket_starts[:drop]:
+                del self.buckets[start]
+            del self.bucket_starts[:drop]
+
+    def top_titles(self, period: str, limit: int = 25, sort: str = "count", section_field: str = "active_section") -> List[Dict]:
+        """
+        Top titles by unique users ("count") or by last edit ("date"),
+        in the same shape as the API-based aggregation.
+        """
+        self.expire()
+        window = self.windows[period]
+        title_last = window.title_last
+
+        if sort == "date":
+            key = lambda t: title_last[t][0]
+        else:
+            key = lambda t: (len(window.title_users[t]), title_last[t][0])
+
+        results = []
+        for title in heapq.nlargest(limit, window.title_users.keys(), key=key):
+            epoch, pageid, last_user, last_revid = title_last[title]
+            info = {
+                "pageid": pageid,
+                "title": title,
+                "last_timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch)),
+                "last_user": last_user,
+                "last_revid": last_revid,
+                "count": len(window.title_users[title])
+            }
+            sections = window.title_sections.get(title)
+            if sections:
+                info[section_field] = max(sections.items(), key=lambda x: x[1])[0]
+            results.append(info)
+        return results
+
+    def top_users(self, period: str, limit: int = 25) -> List[Dict]:
+        """
+        Top users by number of edits in the window.
+        """
+        self.expire()
+        window = self.windows[period]
+        return [{"user": user, "count": count} for user, count in window.user_counts.most_common(limit)]
+
+class EditAggregates:
+    """
+    One WindowAggregator per (namespace, anon_only) combination, fed by EditStore.
+    """
+
+    def __init__(self, namespaces: Tuple[int, ...] = (0, 1)):
+        self.aggregators = {
+            (namespace, anon_only): WindowAggregator()
+            for namespace in namespaces
+            for anon_only in (False, True)
+        }
+
+    def get(self, namespace: int, anon_only: bool = False) -> Optional[WindowAggregator]:
+        return self.aggregators.get((namespace, bool(anon_only)))
+
+    def add(self, edit, expire: bool = True):
+        if (edit.ns, False) not in self.aggregators:
+            return
+        self.aggregators[(edit.ns, False)].add(edit, expire)
+        if edit.anon:
+            self.aggregators[(edit.ns, True)].add(edit, expire)
+
+    def rebuild(self, edits: Iterable):
+        """
+        Recomputes everything from EditRecords, e.g. after a store backfill.
+        """
+        for aggregator in self.aggregators.values():
+            aggregator.clear()
+            aggregator.expire()
+        for edit in edits:
+            self.add(edit, expire=False)
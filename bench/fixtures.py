@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import logging
+import math
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+import fastjson
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SERVER_NAME = "he.wikipedia.org"
+LIVE_STREAM_URL = "https://stream.wikimedia.org/v2/stream/recentchange"
+
+# Title prefixes of the generated non-article namespaces
+NAMESPACE_PREFIXES = {1: "שיחה:", 2: "משתמש:", 3: "שיחת משתמש:", 4: "ויקיפדיה:", 10: "תבנית:", 14: "קטגוריה:"}
+
+WORDS = (
+    "ירושלים", "היסטוריה", "מדינה", "עיר", "נהר", "מלחמה", "ספר", "סרט", "שחקן", "זמר",
+    "כדורגל", "מפלגה", "ממשלה", "בחירות", "אוניברסיטה", "מדע", "פיזיקה", "כימיה", "אמנות", "מוזיקה",
+    "ים", "הר", "מדבר", "כפר", "שכונה", "רחוב", "גשר", "תחנה", "רכבת", "נמל",
+    "מקור", "הערה", "קישור", "תמונה", "טבלה", "רשימה", "פרק", "גרסה", "תיקון", "הרחבה",
+)
+
+SECTIONS = ("היסטוריה", "ביוגרפיה", "קישורים חיצוניים", "הערות שוליים", "ראו גם", "גאוגרפיה", "פעילות", "קריירה", "דמוגרפיה", "תרבות")
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+def make_event(rcid: int, epoch: int, type: str, namespace: int, title: str, user: str, comment: str, revid: int, old_revid: int, oldlen: int, newlen: int, bot: bool = False, minor: bool = False, server_name: str = SERVER_NAME) -> Dict:
+    """
+    One EventStreams `recentchange` event, with the fields the real stream sends.
+    """
+    revision = {"new": revid}
+    length = {"new": newlen}
+    if type != "new":
+        revision["old"] = old_revid
+        length["old"] = oldlen
+    return {
+        "$schema": "/mediawiki/recentchange/1.0.0",
+        "meta": {
+            "uri": f"https://{server_name}/wiki/{title.replace(' ', '_')}",
+            "id": f"{rcid:08x}-0000-4000-8000-{revid:012x}",
+            "dt": _iso(epoch),
+            "domain": server_name,
+            "stream": "mediawiki.recentchange",
+        },
+        "id": rcid,
+        "type": type,
+        "namespace": namespace,
+        "title": title,
+        "title_url": f"https://{server_name}/wiki/{title.replace(' ', '_')}",
+        "comment": comment,
+        "timestamp": epoch,
+        "user": user,
+        "bot": bot,
+        "minor": minor,
+        "patrolled": not minor,
+        "length": length,
+        "revision": revision,
+        "server_url": f"https://{server_name}",
+        "server_name": server_name,
+        "server_script_path": "/w",
+        "wiki": server_name.split(".")[0] + "wiki",
+        "parsedcomment": comment,
+    }
+
+def generate_events(days: float = 7.0, edits_per_hour: int = 500, titles: int = 20000, users: int = 3000, seed: int = 1, end: Optional[int] = None) -> List[Dict]:
+    """
+    A deterministic synthetic history of Hebrew Wikipedia edits, oldest first.
+    Page and user activity is heavily skewed (a few hot pages and prolific
+    editors, a long tail), the rate follows a daily cycle, ~15% of edits are
+    anonymous, ~3% by bots and ~3% of article edits create new pages.
+    """
+    rng = random.Random(seed)
+    end = int(end or time.time())
+    start = end - int(days * 86400)
+    count = int(days * 24 * edits_per_hour)
+
+    # Daily cycle peaking in the Israeli afternoon, about a third of the peak at night
+    stamps = []
+    while len(stamps) < count:
+        epoch = rng.uniform(start, end)
+        hour = (epoch % 86400) / 3600
+        if rng.random() < 0.65 + 0.35 * math.sin(2 * math.pi * (hour - 8) / 24):
+            stamps.append(int(epoch))
+    stamps.sort()
+
+    events = []
+    last_revid: Dict[str, int] = {}
+    new_pages = 0
+    rcid = 10000000
+    revid = 40000000
+    for epoch in stamps:
+        rcid += 1
+        revid += 1
+
+        r = rng.random()
+        namespace = 0 if r < 0.75 else 1 if r < 0.9 else rng.choice((2, 3, 4, 10, 14))
+        if namespace == 0 and rng.random() < 0.03:
+            new_pages += 1
+            title = f"ערך חדש {new_pages}"
+            type = "new"
+        else:
+            name = f"{rng.choice(WORDS)} {int(titles * rng.random() ** 3)}"
+            title = NAMESPACE_PREFIXES.get(namespace, "") + name
+            type = "new" if title not in last_revid and rng.random() < 0.01 else "edit"
+
+        r = rng.random()
+        if r < 0.15:
+            user = f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        elif r < 0.18:
+            user = f"בוט{rng.randint(1, 12)}"
+        else:
+            user = f"משתמש {int(users * rng.random() ** 2)}"
+
+        if rng.random() < 0.4:
+            comment = f"/* {rng.choice(SECTIONS)} */ {rng.choice(WORDS)}"
+        else:
+            comment = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 4)))
+
+        oldlen = rng.randint(200, 60000)
+        newlen = max(0, oldlen + int(rng.gauss(40, 400)))
+        events.append(make_event(
+            rcid, epoch, type, namespace, title, user, comment, revid,
+            last_revid.get(title, 0), oldlen, newlen,
+            bot=user.startswith("בוט"), minor=rng.random() < 0.2,
+        ))
+        last_revid[title] = revid
+    return events
+
+def save_events(events: Iterable[Dict], path: str):
+    """
+    Writes events as JSON lines, the format of a recorded stream capture.
+    """
+    with open(path, "wb") as f:
+        for event in events:
+            f.write(fastjson.dumps_bytes(event) + b"\n")
+
+def load_events(path: str) -> List[Dict]:
+    """
+    Reads JSON lines (or raw `data: ` SSE lines) written by `save_events` / `record`.
+    """
+    events = []
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith(b"data: "):
+                line = line[6:]
+            if not line.startswith(b"{"):
+                continue
+            try:
+                events.append(fastjson.loads(line))
+            except fastjson.JSONDecodeError:
+                continue
+    return events
+
+async def record(path: str, seconds: float, url: str = LIVE_STREAM_URL):
+    """
+    Captures the live EventStreams feed (every wiki, as sent) for `seconds`.
+    """
+    count = 0
+    deadline = time.monotonic() + seconds
+    with open(path, "wb") as f:
+        async with httpx.AsyncClient(timeout=None) as client:
+            async with client.stream("GET", url) as response:
+                async for line in response.aiter_lines():
+                    if time.monotonic() > deadline:
+                        break
+                    if line.startswith("data: "):
+                        f.write(line[6:].encode("utf-8") + b"\n")
+                        count += 1
+    logger.info(f"Recorded {count} events to {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Create fixtures for the offline benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Write a synthetic edit history")
+    generate.add_argument("-o", "--output", required=True)
+    generate.add_argument("--days", type=float, default=7.0)
+    generate.add_argument("--rate", type=int, default=500, help="Edits per hour")
+    generate.add_argument("--seed", type=int, default=1)
+
+    rec = commands.add_parser("record", help="Capture the live EventStreams feed (needs network)")
+    rec.add_argument("-o", "--output", required=True)
+    rec.add_argument("--seconds", type=float, default=600.0)
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        events = generate_events(args.days, args.rate, seed=args.seed)
+        save_events(events, args.output)
+        logger.info(f"Wrote {len(events)} events to {args.output}")
+    else:
+        asyncio.run(record(args.output, args.seconds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import gc
+import logging
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+# Configure logging
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(p / 100 * len(ordered)))) - 1]
+
+class StandInProcess:
+    """
+    Runs `bench.standin` in a child process (so its CPU and memory stay out of
+    the measurements) and points WikiClient at it through the environment.
+    """
+
+    def __init__(self, standin_args: List[str], port: Optional[int] = None):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.args = standin_args
+        self.process = None
+
+    def start(self, timeout: float = 120.0):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen([sys.executable, "-m", "bench.standin", "--port", str(self.port), *self.args], cwd=root)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Stand-in exited during startup")
+            try:
+                httpx.get(f"{self.url}/_stats", timeout=1.0)
+                break
+            except httpx.TransportError:
+                time.sleep(0.2)
+        else:
+            self.stop()
+            raise RuntimeError("Stand-in did not start in time")
+
+        os.environ["EDISCO_API_URL"] = f"{self.url}/w/api.php"
+        os.environ["EDISCO_STREAM_URL"] = f"{self.url}/v2/stream/recentchange"
+        os.environ["EDISCO_REST_URL"] = f"{self.url}/api/rest_v1"
+
+    async def stats(self) -> Dict:
+        async with httpx.AsyncClient() as client:
+            return (await client.get(f"{self.url}/_stats")).json()
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+
+def reset_caches(wiki_client, response_cache=None):
+    """
+    Empties every WikiClient-side cache, so the next call is a cold one.
+    """
+    for name in dir(type(wiki_client)):
+        method = getattr(type(wiki_client), name)
+        if hasattr(method, "cache") and hasattr(method, "refresh"):
+            method.cache.clear()
+    wiki_client.page_metadata.by_title.entries.clear()
+    wiki_client.page_metadata.by_pageid.entries.clear()
+    wiki_client.diff_cache.entries.clear()
+    wiki_client.diff_cache.bytes = 0
+    wiki_client.top_views.days.clear()
+    wiki_client.top_views.missing.clear()
+    wiki_client.title_views.views.clear()
+    wiki_client.title_views.checked.clear()
+    wiki_client.edit_windows.windows.clear()
+    if response_cache is not None:
+        response_cache.entries.clear()
+
+class Case:
+    def __init__(self, name: str, call: Callable[[], Awaitable]):
+        self.name = name
+        self.call = call
+
+class Result:
+    def __init__(self, name: str):
+        self.name = name
+        self.cold: List[float] = []
+        self.warm: List[float] = []
+        self.calls = Counter()
+        self.peak = None
+        self.error = None
+
+    def row(self, iterations: int) -> Dict:
+        return {
+            "name": self.name,
+            "cold_p50_ms": round(percentile(self.cold, 50) * 1000, 2),
+            "cold_p99_ms": round(percentile(self.cold, 99) * 1000, 2),
+            "warm_p50_ms": round(percentile(self.warm, 50) * 1000, 3),
+            "warm_p99_ms": round(percentile(self.warm, 99) * 1000, 3),
+            "upstream_calls": round(sum(self.calls.values()) / max(iterations, 1), 1),
+            "upstream_by_operation": {op: round(count / max(iterations, 1), 1) for op, count in sorted(self.calls.items())},
+            "peak_kib": round(self.peak / 1024, 1) if self.peak is not None else None,
+            "error": self.error,
+        }
+
+async def measure(case: Case, standin: StandInProcess, reset: Callable[[], None], iterations: int, warm_iterations: int, memory: bool) -> Result:
+    """
+    Cold runs (caches emptied before each, upstream calls counted), warm runs
+    (cache hits) and, optionally, one more cold run under tracemalloc for the
+    peak memory it allocates.
+    """
+    result = Result(case.name)
+    try:
+        for _ in range(iterations):
+            reset()
+            before = (await standin.stats())["calls"]
+            started = time.perf_counter()
+            await case.call()
+            result.cold.append(time.perf_counter() - started)
+            after = (await standin.stats())["calls"]
+            for op, count in after.items():
+                if op != "stream" and count - before.get(op, 0):
+                    result.calls[op] += count - before.get(op, 0)
+
+        for _ in range(warm_iterations):
+            started = time.perf_counter()
+            await case.call()
+            result.warm.append(time.perf_counter() - started)
+
+        if memory:
+            reset()
+            gc.collect()
+            tracemalloc.start()
+            try:
+                await case.call()
+                result.peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+def client_cases(wiki_client, revid: int, user: str, word: str) -> List[Case]:
+    wc = wiki_client
+    return [
+        Case("get_recent_edits(limit=50)", lambda: wc.get_recent_edits(limit=50)),
+        Case("get_recent_edits(24h, 2000)", lambda: wc.get_recent_edits(limit=2000, period="24h", max_fetch=2000, fetch_images=False)),
+        Case("get_recent_edits(7d, 10000)", lambda: wc.get_recent_edits(limit=10000, period="7d", max_fetch=10000, fetch_images=False)),
+        Case("get_top_edited_articles(24h)", lambda: wc.get_top_edited_articles(period="24h")),
+        Case("get_top_edited_articles(7d)", lambda: wc.get_top_edited_articles(period="7d")),
+        Case("get_top_editors(24h)", lambda: wc.get_top_editors(period="24h")),
+        Case("get_top_editors(7d)", lambda: wc.get_top_editors(period="7d")),
+        Case("get_top_talk_pages(24h)", lambda: wc.get_top_talk_pages(period="24h")),
+        Case("get_new_articles(24h)", lambda: wc.get_new_articles(period="24h")),
+        Case("get_top_viewed_articles(24h)", lambda: wc.get_top_viewed_articles(period="24h")),
+        Case("get_top_viewed_articles(7d)", lambda: wc.get_top_viewed_articles(period="7d")),
+        Case("get_top_viewed_articles(user)", lambda: wc.get_top_viewed_articles(period="7d", user=user)),
+        Case("get_diff", lambda: wc.get_diff(revid)),
+        Case("search_edits(24h)", lambda: wc.search_edits(word, period="24h")),
+    ]
+
+def route_cases(http: httpx.AsyncClient, revid: int, user: str, word: str) -> List[Case]:
+    async def get(path: str, **params):
+        response = await http.get(path, params=params)
+        response.raise_for_status()
+        return response
+
+    return [
+        Case("/api/recent", lambda: get("/api/recent")),
+        Case("/api/recent?period=24h", lambda: get("/api/recent", period="24h", limit=100)),
+        Case("/api/top-edited?period=24h", lambda: get("/api/top-edited", period="24h")),
+        Case("/api/top-edited?period=7d", lambda: get("/api/top-edited", period="7d")),
+        Case("/api/top-editors?period=24h", lambda: get("/api/top-editors", period="24h")),
+        Case("/api/top-editors?period=7d", lambda: get("/api/top-editors", period="7d")),
+        Case("/api/top-talk-pages?period=24h", lambda: get("/api/top-talk-pages", period="24h")),
+        Case("/api/new-articles?period=24h", lambda: get("/api/new-articles", period="24h")),
+        Case("/api/top-viewed?period=24h", lambda: get("/api/top-viewed", period="24h")),
+        Case("/api/top-viewed?period=7d&user", lambda: get("/api/top-viewed", period="7d", user=user)),
+        Case("/api/diff", lambda: get("/api/diff", revid=revid)),
+        Case("/api/search?period=24h", lambda: get("/api/search", q=word, period="24h")),
+    ]
+
+def print_table(title: str, rows: List[Dict]):
+    print(f"\n{title}")
+    header = f"{'case':<36} {'cold p50':>10} {'cold p99':>10} {'warm p50':>10} {'calls':>7} {'peak KiB':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        if row["error"]:
+            print(f"{row['name']:<36} ERROR {row['error']}")
+            continue
+        peak = row["peak_kib"] if row["peak_kib"] is not None else "-"
+        print(f"{row['name']:<36} {row['cold_p50_ms']:>8.1f}ms {row['cold_p99_ms']:>8.1f}ms {row['warm_p50_ms']:>8.3f}ms {row['upstream_calls']:>7} {peak:>10}")
+
+async def sample(standin: StandInProcess):
+    """
+    A revision, a prolific user and a word from the stand-in's history, used as query arguments.
+    """
+    async with httpx.AsyncClient(base_url=standin.url) as client:
+        response = await client.get("/w/api.php", params={"action": "query", "list": "recentchanges", "rcprop": "ids|user", "rcnamespace": 0, "rclimit": 500, "format": "json"})
+        rows = response.json()["query"]["recentchanges"]
+        await client.post("/_reset")
+    revid = next(row["revid"] for row in rows if row.get("old_revid"))
+    user = Counter(row["user"] for row in rows if "anon" not in row).most_common(1)[0][0]
+    # Every stand-in diff adds a token derived from its revid
+    return revid, user, f"מילה{revid % 997}"
+
+async def run(args, standin: StandInProcess) -> Dict:
+    # Imported only now: the URLs are read from the environment at import time
+    import main as app_module
+    from wiki_client import WikiClient
+
+    revid, user, word = await sample(standin)
+    report = {"client": [], "routes": [], "resident": []}
+    selected = lambda cases: [case for case in cases if not args.only or args.only in case.name]
+
+    wiki_client = WikiClient()
+    try:
+        for case in selected(client_cases(wiki_client, revid, user, word)):
+            result = await measure(case, standin, lambda: reset_caches(wiki_client), args.iterations, args.warm_iterations, not args.no_memory)
+            report["client"].append(result.row(args.iterations))
+    finally:
+        await wiki_client.close()
+    print_table("WikiClient methods (API path, no resident store)", report["client"])
+
+    reset_routes = lambda: reset_caches(app_module.wiki_client, app_module.response_cache)
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://edisco") as http:
+        for case in selected(route_cases(http, revid, user, word)):
+            result = await measure(case, standin, reset_routes, args.iterations, args.warm_iterations, not args.no_memory)
+            report["routes"].append(result.row(args.iterations))
+        print_table("/api routes (API path, no resident store)", report["routes"])
+
+        if args.resident:
+            # Live stream, backfilled edit store and search index, as in production
+            started = time.perf_counter()
+            app_module.stream_hub.start()
+            app_module.edit_store.start()
+            app_module.search_index.start()
+            while not app_module.edit_store.ready:
+                await asyncio.sleep(0.1)
+            report["backfill_s"] = round(time.perf_counter() - started, 2)
+            print(f"\nEdit store backfilled in {report['backfill_s']}s ({len(app_module.edit_store)} edits)")
+            # Let the search index finish its history too, so its diff fetches do not land in the counts
+            index = app_module.search_index
+            while not index.covers(int(time.time()) - index.retention + 600):
+                await asyncio.sleep(0.5)
+            report["index_s"] = round(time.perf_counter() - started, 2)
+            print(f"Search index backfilled in {report['index_s']}s ({len(index.revs)} revisions)")
+            for case in selected(route_cases(http, revid, user, word)):
+                result = await measure(case, standin, reset_routes, args.iterations, args.warm_iterations, not args.no_memory)
+                report["resident"].append(result.row(args.iterations))
+            print_table("/api routes (resident edit store)", report["resident"])
+            await app_module.search_index.stop()
+            await app_module.stream_hub.stop()
+
+    await app_module.wiki_client.close()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for WikiClient methods and /api routes.")
+    parser.add_argument("--iterations", type=int, default=5, help="Cold runs per case")
+    parser.add_argument("--warm-iterations", type=int, default=50, help="Cached runs per case")
+    parser.add_argument("--only", help="Run only cases whose name contains this")
+    parser.add_argument("--resident", action="store_true", help="Also measure the routes with the edit store backfilled")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--json", help="Write the report to this file")
+    args, standin_args = parser.parse_known_args()
+
+    standin = StandInProcess(standin_args)
+    standin.start()
+    try:
+        report = asyncio.run(run(args, standin))
+    finally:
+        standin.stop()
+
+    if args.json:
+        import fastjson
+        with open(args.json, "wb") as f:
+            f.write(fastjson.dumps_bytes(report))
+
+if __name__ == "__main__":
+    main()
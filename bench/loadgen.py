@@ -0,0 +1,327 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+import fastjson
+from bench.harness import StandInProcess, free_port, percentile
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Until the measurement window is known, nothing is counted
+UNSET = 2 ** 62
+
+class ProcessMonitor:
+    """
+    Samples a process's CPU time and RSS in a background thread
+    (psutil when installed, /proc otherwise).
+    """
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples = [] # (wall time, cpu seconds, rss bytes)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._process = psutil.Process(pid) if psutil else None
+
+    def _sample(self):
+        if self._process is not None:
+            cpu = self._process.cpu_times()
+            return cpu.user + cpu.system, self._process.memory_info().rss
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        rss = 0
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+        return cpu, rss
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                cpu, rss = self._sample()
+            except (OSError, ValueError):
+                return
+            self.samples.append((time.time(), cpu, rss))
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self, start: float, end: float) -> Dict:
+        window = [sample for sample in self.samples if start <= sample[0] <= end]
+        if len(window) < 2:
+            return {}
+        cpu = [
+            (b[1] - a[1]) / (b[0] - a[0]) * 100
+            for a, b in zip(window, window[1:]) if b[0] > a[0]
+        ]
+        return {
+            "cpu_mean_pct": round((window[-1][1] - window[0][1]) / (window[-1][0] - window[0][0]) * 100, 1),
+            "cpu_max_pct": round(max(cpu), 1),
+            "rss_start_mib": round(window[0][2] / 2 ** 20, 1),
+            "rss_peak_mib": round(max(sample[2] for sample in self.samples) / 2 ** 20, 1),
+            "rss_end_mib": round(window[-1][2] / 2 ** 20, 1),
+        }
+
+class AppProcess:
+    """
+    One uvicorn worker running the app against the stand-in (the EDISCO_*_URL
+    variables set by StandInProcess are inherited).
+    """
+
+    def __init__(self, port: Optional[int] = None):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.log = tempfile.NamedTemporaryFile(prefix="edisco-loadgen-", suffix=".log", delete=False)
+        self.process = None
+
+    def start(self, timeout: float = 60.0):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=root, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"App exited during startup (see {self.log.name})")
+            try:
+                httpx.get(self.url + "/", timeout=1.0)
+                return
+            except httpx.TransportError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("App did not start in time")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+        self.log.close()
+
+def _decode(message, fmt: str) -> List[Dict]:
+    if isinstance(message, bytes):
+        data = msgpack.unpackb(message, raw=False)
+    else:
+        data = fastjson.loads(message)
+    return data if isinstance(data, list) else [data]
+
+async def _subscriber(url: str, fmt: str, delay: float, slot: int, window, counts: List[int], samples: Optional[List], stats: Counter):
+    import websockets
+
+    await asyncio.sleep(delay)
+    try:
+        async with websockets.connect(url, max_size=None, ping_interval=None, open_timeout=60) as ws:
+            stats["connected"] += 1
+            counts[slot] = 0
+            async for message in ws:
+                received = time.time()
+                start, end = window[0], window[1]
+                for event in _decode(message, fmt):
+                    # Compact / msgpack events carry "rcid", raw ones the EventStreams "id"
+                    rcid = event.get("rcid") or event.get("id") or 0
+                    if start <= rcid < end:
+                        counts[slot] += 1
+                        if samples is not None:
+                            samples.append((rcid, received))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        code = getattr(getattr(e, "rcvd", None), "code", None)
+        stats[f"closed_{code}" if code else f"error_{type(e).__name__}"] += 1
+
+async def _run_subscribers(url: str, fmt: str, clients: int, sample: int, ramp: float, window, connected, stop_event):
+    # -1 until the subscriber connects
+    counts = [-1] * clients
+    samples = []
+    stats = Counter()
+    tasks = [
+        asyncio.create_task(_subscriber(url, fmt, ramp * i / max(clients, 1), i, window, counts, samples if i < sample else None, stats))
+        for i in range(clients)
+    ]
+    while not stop_event.is_set():
+        connected.value = stats["connected"]
+        await asyncio.sleep(0.2)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {"counts": counts, "samples": samples, "stats": dict(stats)}
+
+def _worker(url: str, fmt: str, clients: int, sample: int, ramp: float, window, connected, stop_event, results):
+    results.put(asyncio.run(_run_subscribers(url, fmt, clients, sample, ramp, window, connected, stop_event)))
+
+def live_url(app: AppProcess, args) -> str:
+    params = {"format": args.format}
+    if args.batch_ms:
+        params["batch_ms"] = args.batch_ms
+    if args.policy:
+        params["policy"] = args.policy
+    query = "&".join(f"{key}={value}" for key, value in params.items())
+    return app.url.replace("http://", "ws://") + f"/ws/live?{query}"
+
+def run(args, standin: StandInProcess, app: AppProcess) -> Dict:
+    # Wait until the app is reading the stand-in's stream
+    deadline = time.monotonic() + 60
+    while httpx.get(standin.url + "/_stats").json()["stream_connections"] < 1:
+        if time.monotonic() > deadline:
+            raise RuntimeError("App never connected to the stand-in stream")
+        time.sleep(0.2)
+
+    monitor = ProcessMonitor(app.process.pid)
+    monitor.start()
+
+    context = multiprocessing.get_context("spawn")
+    window = context.Array("q", [UNSET, UNSET], lock=False)
+    connected = [context.Value("i", 0, lock=False) for _ in range(args.processes)]
+    stop_event = context.Event()
+    results = context.Queue()
+    url = live_url(app, args)
+    per_process = [args.clients // args.processes + (1 if i < args.clients % args.processes else 0) for i in range(args.processes)]
+    sample_per_process = max(1, args.sample // args.processes)
+    workers = [
+        context.Process(target=_worker, args=(url, args.format, n, min(n, sample_per_process), args.ramp, window, connected[i], stop_event, results))
+        for i, n in enumerate(per_process)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        deadline = time.monotonic() + args.ramp + 60
+        while sum(value.value for value in connected) < args.clients and time.monotonic() < deadline:
+            time.sleep(0.5)
+        connected_count = sum(value.value for value in connected)
+        logger.info(f"{connected_count}/{args.clients} subscribers connected")
+        time.sleep(args.settle)
+
+        started = time.time()
+        window[0] = httpx.get(standin.url + "/_stats").json()["next_rcid"]
+        time.sleep(args.duration)
+        window[1] = httpx.get(standin.url + "/_stats").json()["next_rcid"]
+        ended = time.time()
+        # Events from the window still in flight are counted until the drain ends
+        time.sleep(args.drain)
+        stop_event.set()
+        outcomes = [results.get(timeout=120) for _ in workers]
+    finally:
+        stop_event.set()
+        for worker in workers:
+            worker.join(timeout=30)
+        monitor.stop()
+
+    emitted = httpx.get(standin.url + "/_emitted", params={"from_rcid": window[0], "to_rcid": window[1]}).json()
+    # /ws/live subscribers receive edits only (StreamHub.client_types)
+    expected = sum(1 for _, _, type in emitted if type == "edit")
+    emitted_at = {rcid: at for rcid, at, _ in emitted}
+
+    counts = [count for outcome in outcomes for count in outcome["counts"] if count >= 0]
+    latencies = [
+        (received - emitted_at[rcid]) * 1000
+        for outcome in outcomes for rcid, received in outcome["samples"] if rcid in emitted_at
+    ]
+    stats = Counter()
+    for outcome in outcomes:
+        stats.update(outcome["stats"])
+
+    speed = httpx.get(standin.url + "/_stats").json()["speed"]
+    return {
+        "clients": args.clients,
+        "connected": connected_count,
+        "speed": speed,
+        "format": args.format,
+        "batch_ms": args.batch_ms,
+        "duration_s": round(ended - started, 1),
+        "events": expected,
+        "events_per_s": round(expected / max(ended - started, 1e-9), 2),
+        "deliveries": sum(counts),
+        "deliveries_per_s": round(sum(counts) / max(ended - started, 1e-9), 1),
+        "dropped": sum(max(expected - count, 0) for count in counts),
+        "clients_with_drops": sum(1 for count in counts if count < expected),
+        "disconnects": {key: value for key, value in stats.items() if key != "connected"},
+        "latency_ms": {
+            "samples": len(latencies),
+            "p50": round(percentile(latencies, 50), 1),
+            "p90": round(percentile(latencies, 90), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "max": round(max(latencies), 1) if latencies else 0.0,
+        },
+        "app": monitor.summary(started, ended),
+    }
+
+def print_report(report: Dict):
+    latency = report["latency_ms"]
+    app = report["app"]
+    print(f"\n/ws/live fan-out: {report['connected']}/{report['clients']} subscribers, replay {report['speed']}x, format={report['format']}, batch_ms={report['batch_ms']}")
+    print(f"  events         {report['events']} in {report['duration_s']}s ({report['events_per_s']}/s)")
+    print(f"  deliveries     {report['deliveries']} ({report['deliveries_per_s']}/s)")
+    print(f"  dropped        {report['dropped']} ({report['clients_with_drops']} subscribers affected)")
+    print(f"  disconnects    {report['disconnects'] or 'none'}")
+    print(f"  latency        p50 {latency['p50']}ms  p90 {latency['p90']}ms  p99 {latency['p99']}ms  max {latency['max']}ms  ({latency['samples']} samples)")
+    if app:
+        print(f"  app CPU        mean {app['cpu_mean_pct']}%  max {app['cpu_max_pct']}%")
+        print(f"  app RSS        {app['rss_start_mib']} -> {app['rss_end_mib']} MiB (peak {app['rss_peak_mib']} MiB)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /ws/live fan-out with stream traffic replayed by the stand-in.")
+    parser.add_argument("--clients", type=int, default=1000, help="Simulated WebSocket subscribers")
+    parser.add_argument("--processes", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Load generator processes")
+    parser.add_argument("--duration", type=float, default=60.0, help="Measurement window, seconds")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Seconds over which subscribers connect")
+    parser.add_argument("--settle", type=float, default=2.0, help="Pause between connecting and measuring")
+    parser.add_argument("--drain", type=float, default=5.0, help="Time allowed for in-flight events after the window")
+    parser.add_argument("--sample", type=int, default=100, help="Subscribers whose per-event latency is recorded")
+    parser.add_argument("--format", default="json", choices=("json", "msgpack", "raw"))
+    parser.add_argument("--batch-ms", type=int, default=0)
+    parser.add_argument("--policy", choices=("drop_oldest", "disconnect"))
+    parser.add_argument("--json", help="Write the report to this file")
+    args, standin_args = parser.parse_known_args()
+    if args.format == "msgpack" and msgpack is None:
+        parser.error("format=msgpack needs the msgpack package")
+
+    standin = StandInProcess(standin_args)
+    standin.start()
+    app = AppProcess()
+    try:
+        app.start()
+        report = run(args, standin, app)
+    finally:
+        app.stop()
+        standin.stop()
+
+    print_report(report)
+    logger.info(f"App log: {app.log.name}")
+    if args.json:
+        with open(args.json, "wb") as f:
+            f.write(fastjson.dumps_bytes(report))
+
+if __name__ == "__main__":
+    main()
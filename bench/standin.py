@@ -0,0 +1,542 @@
+import argparse
+import asyncio
+import logging
+import random
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncGenerator, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+import fastjson
+from bench.fixtures import SERVER_NAME, WORDS, generate_events, load_events, make_event
+from edit_store import EditRecord, format_timestamp, parse_timestamp
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FOREIGN_SERVERS = ("en.wikipedia.org", "commons.wikimedia.org", "www.wikidata.org", "de.wikipedia.org", "fr.wikipedia.org")
+
+def _continue_token(record: EditRecord) -> str:
+    return datetime.fromtimestamp(record.epoch, tz=timezone.utc).strftime("%Y%m%d%H%M%S") + f"|{record.rcid}"
+
+def _parse_continue(token: str):
+    stamp, _, rcid = token.partition("|")
+    epoch = int(datetime.strptime(stamp, "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc).timestamp())
+    return epoch, int(rcid)
+
+def _hash(*parts) -> int:
+    return zlib.crc32("|".join(map(str, parts)).encode("utf-8"))
+
+def diff_html(revid: int) -> str:
+    """
+    Deterministic MediaWiki diff table for `revid`: a few changed lines with
+    surrounding context, plus one token unique to the revision ("מילה<n>").
+    """
+    rng = random.Random(revid)
+
+    def sentence(n=12):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    rows = []
+    for _ in range(rng.randint(1, 4)):
+        line = rng.randint(1, 400)
+        rows.append(f'<tr>\n  <td colspan="2" class="diff-lineno">שורה {line}:</td>\n  <td colspan="2" class="diff-lineno">שורה {line}:</td>\n</tr>')
+        context = sentence()
+        rows.append(f'<tr>\n  <td class="diff-marker"></td>\n  <td class="diff-context diff-side-deleted"><div>{context}</div></td>\n  <td class="diff-marker"></td>\n  <td class="diff-context diff-side-added"><div>{context}</div></td>\n</tr>')
+        before, after = sentence(6), sentence(6)
+        removed, added = rng.choice(WORDS), f"{rng.choice(WORDS)} מילה{revid % 997}"
+        rows.append(
+            f'<tr>\n  <td class="diff-marker" data-marker="−"></td>\n  <td class="diff-deletedline diff-side-deleted"><div>{before} <del class="diffchange diffchange-inline">{removed}</del> {after}</div></td>\n'
+            f'  <td class="diff-marker" data-marker="+"></td>\n  <td class="diff-addedline diff-side-added"><div>{before} <ins class="diffchange diffchange-inline">{added}</ins> {after}</div></td>\n</tr>'
+        )
+    return "\n".join(rows)
+
+class StandIn:
+    """
+    Local stand-in for the MediaWiki Action API, the pageviews REST API and
+    EventStreams, serving one edit history (generated or recorded).
+    Covers the calls WikiClient makes: list=recentchanges (with rccontinue
+    paging and an `rclimit` cap), prop=pageimages|description, prop=pageviews,
+    prop=revisions&rvdiffto, action=compare, metrics/pageviews/top and the
+    recentchange SSE stream, which replays `capture` at `speed` with fresh ids
+    and timestamps. Every upstream call waits `latency` (+ up to `jitter`)
+    seconds and is counted per operation.
+    """
+
+    def __init__(self, events: List[Dict], capture: Optional[List[Dict]] = None, latency: float = 0.0, jitter: float = 0.0, max_limit: int = 500, diffs_per_request: int = 0, speed: float = 1.0, foreign_ratio: int = 0, rebase: bool = True, seed: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.max_limit = max_limit
+        # MediaWiki renders only a few uncached diffs per rvdiffto request (0 = no limit)
+        self.diffs_per_request = diffs_per_request
+        self.speed = speed
+        self.foreign_ratio = foreign_ratio
+        self.rng = random.Random(seed)
+
+        history = [event for event in events if event.get("server_name") == SERVER_NAME and event.get("type") in ("edit", "new")]
+        history.sort(key=lambda event: (event.get("timestamp", 0), event.get("id", 0)))
+        # Move the history so its newest edit is "now"; period windows then always have data
+        shift = int(time.time()) - history[-1]["timestamp"] if rebase and history else 0
+
+        self.records: List[EditRecord] = []
+        self.keys: List[tuple] = [] # (epoch, rcid), ascending
+        self.by_user: Dict[str, List[int]] = {}
+        self.by_title: Dict[str, List[int]] = {}
+        self.by_revid: Dict[int, int] = {}
+        self.pageids: Dict[str, int] = {}
+        self.titles: Dict[int, str] = {}
+        self.last_revid: Dict[str, int] = {}
+        for event in history:
+            record = EditRecord.from_stream_event(event)
+            record.epoch += shift
+            self._append(record)
+        self.next_rcid = max((record.rcid for record in self.records), default=10000000) + 1
+        self.next_revid = max((record.revid for record in self.records), default=40000000) + 1
+
+        # Most edited articles stand in for the most viewed ones
+        edit_counts = Counter(record.title for record in self.records if record.ns == 0)
+        self.popular = ["עמוד_ראשי", "מיוחד:חיפוש"] + [title.replace(" ", "_") for title, _ in edit_counts.most_common(998)]
+        self.edit_counts = edit_counts
+
+        if capture is None:
+            # Replay the last hour of the history
+            since = self.records[-1].epoch - 3600 if self.records else 0
+            capture = [self._event(record) for record in self.records[bisect_left(self.keys, (since, -1)):]]
+        self.capture = sorted(capture, key=lambda event: event.get("timestamp", 0))
+        self.foreign_lines = self._foreign_lines()
+
+        # (rcid, wall time, type) of every replayed Hebrew Wikipedia edit, for delivery latency
+        self.emitted = deque(maxlen=1000000)
+        self.calls = Counter()
+        self.rows = 0
+        self.bytes = 0
+        self.stream_connections = 0
+        self.app = self._build_app()
+
+    def _append(self, record: EditRecord):
+        position = len(self.records)
+        if record.title not in self.pageids:
+            pageid = len(self.pageids) + 1000
+            self.pageids[record.title] = pageid
+            self.titles[pageid] = record.title
+        record.pageid = self.pageids[record.title]
+        self.records.append(record)
+        self.keys.append((record.epoch, record.rcid))
+        self.by_user.setdefault(record.user, []).append(position)
+        self.by_title.setdefault(record.title, []).append(position)
+        self.by_revid[record.revid] = position
+        self.last_revid[record.title] = record.revid
+
+    def _event(self, record: EditRecord) -> Dict:
+        return make_event(
+            record.rcid, record.epoch, record.type, record.ns, record.title, record.user, record.comment,
+            record.revid, record.old_revid, record.oldlen, record.newlen,
+            bot=bool(record.flags & 2), minor=bool(record.flags & 4),
+        )
+
+    def _foreign_lines(self) -> List[bytes]:
+        # Other wikis' traffic, which clients must skip; only synthesized for fixtures without it
+        if not self.foreign_ratio or any(event.get("server_name") != SERVER_NAME for event in self.capture):
+            return []
+        lines = []
+        for i, event in enumerate(self.capture[:500]):
+            server = FOREIGN_SERVERS[i % len(FOREIGN_SERVERS)]
+            foreign = dict(event, server_name=server, server_url=f"https://{server}", wiki=server.split(".")[0] + "wiki")
+            foreign["meta"] = dict(event.get("meta", {}), domain=server)
+            lines.append(b"event: message\ndata: " + fastjson.dumps_bytes(foreign) + b"\n\n")
+        return lines
+
+    async def _delay(self):
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _respond(self, data: Dict, status_code: int = 200) -> Response:
+        body = fastjson.dumps_bytes(data)
+        self.bytes += len(body)
+        return Response(content=body, status_code=status_code, media_type="application/json")
+
+    # Action API
+
+    def recentchanges(self, params: Dict[str, str]) -> Dict:
+        props = set(params.get("rcprop", "title|timestamp|ids").split("|"))
+        namespaces = {int(ns) for ns in params["rcnamespace"].split("|")} if params.get("rcnamespace", "") != "" else None
+        types = set(params["rctype"].split("|")) if params.get("rctype") else None
+        show = set(params["rcshow"].split("|")) if params.get("rcshow") else set()
+        limit = params.get("rclimit", "10")
+        limit = self.max_limit if limit == "max" else max(1, min(int(limit), self.max_limit))
+
+        # Only the default (older) direction: rcstart is the newest bound, rcend the oldest
+        hi = len(self.keys)
+        lo = 0
+        if params.get("rcstart"):
+            hi = bisect_right(self.keys, (parse_timestamp(params["rcstart"]), float("inf")))
+        if params.get("rcend"):
+            lo = bisect_left(self.keys, (parse_timestamp(params["rcend"]), -1))
+        if params.get("rccontinue"):
+            hi = min(hi, bisect_right(self.keys, _parse_continue(params["rccontinue"])))
+
+        candidates = None
+        if params.get("rcuser"):
+            candidates = self.by_user.get(params["rcuser"].replace("_", " "), [])
+        elif params.get("rctitle"):
+            candidates = self.by_title.get(params["rctitle"].replace("_", " "), [])
+        if candidates is None:
+            positions = range(hi - 1, lo - 1, -1)
+        else:
+            first, last = bisect_left(candidates, lo), bisect_left(candidates, hi)
+            positions = (candidates[i] for i in range(last - 1, first - 1, -1))
+
+        rows = []
+        token = None
+        for position in positions:
+            record = self.records[position]
+            if namespaces is not None and record.ns not in namespaces:
+                continue
+            if types is not None and record.type not in types:
+                continue
+            if show and not self._shown(record, show):
+                continue
+            if len(rows) == limit:
+                token = _continue_token(record)
+                break
+            rows.append(self._row(record, props))
+
+        self.rows += len(rows)
+        data = {"batchcomplete": "", "query": {"recentchanges": rows}}
+        if token:
+            data["continue"] = {"rccontinue": token, "continue": "-||"}
+        return data
+
+    @staticmethod
+    def _shown(record: EditRecord, show: set) -> bool:
+        flags = {"anon": record.anon, "bot": bool(record.flags & 2), "minor": bool(record.flags & 4)}
+        for condition in show:
+            negate = condition.startswith("!")
+            value = flags.get(condition.lstrip("!"))
+            if value is not None and value == negate:
+                return False
+        return True
+
+    @staticmethod
+    def _row(record: EditRecord, props: set) -> Dict:
+        row = {"type": record.type}
+        if "title" in props:
+            row["ns"] = record.ns
+            row["title"] = record.title
+        if "ids" in props:
+            row["pageid"] = record.pageid
+            row["revid"] = record.revid
+            row["old_revid"] = record.old_revid
+            row["rcid"] = record.rcid
+        if "user" in props:
+            row["user"] = record.user
+            if record.anon:
+                row["anon"] = ""
+        if "timestamp" in props:
+            row["timestamp"] = format_timestamp(record.epoch)
+        if "comment" in props:
+            row["comment"] = record.comment
+        if "sizes" in props:
+            row["oldlen"] = record.oldlen
+            row["newlen"] = record.newlen
+        if "flags" in props:
+            if record.flags & 2:
+                row["bot"] = ""
+            if record.flags & 4:
+                row["minor"] = ""
+            if record.type == "new":
+                row["new"] = ""
+        if "tags" in props:
+            row["tags"] = []
+        return row
+
+    def _pages(self, params: Dict[str, str]):
+        """
+        Resolves `titles` / `pageids` to (pageid, title) pairs plus the query's
+        "normalized" list and missing pages.
+        """
+        found = []
+        normalized = []
+        missing = {}
+        if params.get("pageids"):
+            for pageid in params["pageids"].split("|"):
+                title = self.titles.get(int(pageid))
+                if title is None:
+                    missing[pageid] = {"pageid": int(pageid), "missing": ""}
+                else:
+                    found.append((int(pageid), title))
+        for title in filter(None, params.get("titles", "").split("|")):
+            canonical = title.replace("_", " ")
+            if canonical != title:
+                normalized.append({"from": title, "to": canonical})
+            pageid = self.pageids.get(canonical)
+            if pageid is None and canonical.replace(" ", "_") in self.popular:
+                # Popular special pages and the main page exist without edits in the history
+                pageid = self.pageids[canonical] = len(self.pageids) + 1000
+                self.titles[pageid] = canonical
+            if pageid is None:
+                missing[str(-1 - len(missing))] = {"ns": 0, "title": canonical, "missing": ""}
+            else:
+                found.append((pageid, canonical))
+        return found, normalized, missing
+
+    def page_info(self, params: Dict[str, str]) -> Dict:
+        props = set(params.get("prop", "").split("|"))
+        found, normalized, missing = self._pages(params)
+        pages = dict(missing)
+        for pageid, title in found:
+            page = {"pageid": pageid, "ns": 0, "title": title}
+            h = _hash(title)
+            if "pageimages" in props and h % 5 < 3:
+                name = f"Bench_{pageid}.jpg"
+                page["thumbnail"] = {"source": f"https://upload.wikimedia.org/wikipedia/commons/thumb/{h % 16:x}/{h % 256:02x}/{name}/100px-{name}", "width": 100, "height": 75}
+            if "description" in props and h % 3:
+                page["description"] = f"{WORDS[h % len(WORDS)]} {WORDS[(h >> 8) % len(WORDS)]}"
+                page["descriptionsource"] = "local"
+            if "pageviews" in props:
+                page["pageviews"] = self._title_views(title, int(params.get("pvipdays", 60)))
+            pages[str(pageid)] = page
+        query = {"pages": pages}
+        if normalized:
+            query["normalized"] = normalized
+        return {"batchcomplete": "", "query": query}
+
+    def _title_views(self, title: str, days: int) -> Dict[str, Optional[int]]:
+        today = datetime.now(timezone.utc).date()
+        views = {}
+        for i in range(days - 1, -1, -1):
+            day = (today - timedelta(days=i)).isoformat()
+            # Today's counts are not published yet
+            views[day] = None if i == 0 else 20 * self.edit_counts.get(title, 0) + _hash(title, day) % 300
+        return views
+
+    def revisions(self, params: Dict[str, str]) -> Dict:
+        pages = {}
+        bad = {}
+        rendered = 0
+        for revid in map(int, filter(None, params.get("revids", "").split("|"))):
+            position = self.by_revid.get(revid)
+            if position is None:
+                bad[str(revid)] = {"revid": revid, "missing": ""}
+                continue
+            record = self.records[position]
+            page = pages.setdefault(str(record.pageid), {"pageid": record.pageid, "ns": record.ns, "title": record.title, "revisions": []})
+            revision = {"revid": revid, "parentid": record.old_revid}
+            if params.get("rvdiffto"):
+                if self.diffs_per_request and rendered >= self.diffs_per_request:
+                    revision["diff"] = {"notcached": ""}
+                else:
+                    rendered += 1
+                    revision["diff"] = {"from": record.old_revid, "to": revid, "*": diff_html(revid)}
+            page["revisions"].append(revision)
+        data = {"batchcomplete": "", "query": {"pages": pages}}
+        if bad:
+            data["query"]["badrevids"] = bad
+        return data
+
+    def compare(self, params: Dict[str, str]) -> Dict:
+        revid = int(params.get("fromrev", 0))
+        position = self.by_revid.get(revid)
+        if position is None:
+            return {"error": {"code": "nosuchrevid", "info": f"There is no revision with ID {revid}."}}
+        record = self.records[position]
+        return {"compare": {"fromrevid": revid, "fromtitle": record.title, "torevid": record.old_revid, "totitle": record.title, "*": diff_html(revid)}}
+
+    def operation(self, params: Dict[str, str]) -> str:
+        if params.get("action") == "compare":
+            return "compare"
+        if params.get("list") == "recentchanges":
+            return "recentchanges"
+        props = set(params.get("prop", "").split("|"))
+        if "revisions" in props:
+            return "revisions"
+        if "pageviews" in props:
+            return "pageviews"
+        if props & {"pageimages", "description"}:
+            return "pageimages"
+        return "unsupported"
+
+    # Pageviews REST API
+
+    def top(self, year: str, month: str, day: str):
+        requested = date(int(year), int(month), int(day))
+        if requested >= datetime.now(timezone.utc).date():
+            return None
+        articles = []
+        for rank, title in enumerate(self.popular):
+            base = 400000 // (rank + 1) ** 0.8
+            articles.append((title, int(base * (0.7 + 0.6 * (_hash(title, requested) % 1000) / 1000))))
+        articles.sort(key=lambda article: article[1], reverse=True)
+        return {"items": [{
+            "project": "he.wikipedia", "access": "all-access", "year": year, "month": month, "day": day,
+            "articles": [{"article": title, "views": views, "rank": i + 1} for i, (title, views) in enumerate(articles)],
+        }]}
+
+    # EventStreams
+
+    def _live(self, event: Dict) -> Dict:
+        """
+        A capture event re-issued now, with fresh ids; Hebrew Wikipedia edits
+        join the history so API calls (diffs, recent changes) can see them.
+        """
+        now = int(time.time())
+        event = dict(event, timestamp=now)
+        event["meta"] = dict(event.get("meta", {}), dt=datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"))
+        if event.get("server_name") != SERVER_NAME or event.get("type") not in ("edit", "new"):
+            return event
+
+        event["id"] = self.next_rcid
+        self.next_rcid += 1
+        revision = {"new": self.next_revid}
+        self.next_revid += 1
+        if event.get("type") != "new" and event.get("title") in self.last_revid:
+            revision["old"] = self.last_revid[event["title"]]
+        event["revision"] = revision
+        self._append(EditRecord.from_stream_event(event))
+        self.emitted.append((event["id"], time.time(), event["type"]))
+        return event
+
+    async def stream(self, since: Optional[str]) -> AsyncGenerator[bytes, None]:
+        self.calls["stream"] += 1
+        self.stream_connections += 1
+        try:
+            yield b":ok\n\n"
+            if since:
+                epoch = parse_timestamp(since[:19] + "Z")
+                for record in self.records[bisect_left(self.keys, (epoch, -1)):]:
+                    yield b"event: message\ndata: " + fastjson.dumps_bytes(self._event(record)) + b"\n\n"
+
+            foreign = 0
+            while self.capture:
+                started = time.monotonic()
+                base = self.capture[0].get("timestamp", 0)
+                chunk = []
+                for event in self.capture:
+                    due = started + (event.get("timestamp", 0) - base) / self.speed
+                    delay = due - time.monotonic()
+                    if delay > 0.002:
+                        # Send what is due in one write, then wait for the next event
+                        if chunk:
+                            yield b"".join(chunk)
+                            chunk = []
+                        await asyncio.sleep(delay)
+                    chunk.append(b"event: message\ndata: " + fastjson.dumps_bytes(self._live(event)) + b"\n\n")
+                    for _ in range(self.foreign_ratio if self.foreign_lines else 0):
+                        chunk.append(self.foreign_lines[foreign % len(self.foreign_lines)])
+                        foreign += 1
+                if chunk:
+                    yield b"".join(chunk)
+        finally:
+            self.stream_connections -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "calls": dict(self.calls),
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "stream_connections": self.stream_connections,
+            "records": len(self.records),
+            "next_rcid": self.next_rcid,
+            "speed": self.speed,
+        }
+
+    def reset(self):
+        self.calls.clear()
+        self.rows = 0
+        self.bytes = 0
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Edisco stand-in")
+
+        @app.get("/w/api.php")
+        async def api(request: Request):
+            params = dict(request.query_params)
+            operation = self.operation(params)
+            self.calls[operation] += 1
+            await self._delay()
+            if operation == "recentchanges":
+                return self._respond(self.recentchanges(params))
+            if operation == "revisions":
+                return self._respond(self.revisions(params))
+            if operation == "compare":
+                return self._respond(self.compare(params))
+            if operation in ("pageviews", "pageimages"):
+                return self._respond(self.page_info(params))
+            return self._respond({"error": {"code": "unsupported", "info": "Not supported by the stand-in."}})
+
+        @app.get("/api/rest_v1/metrics/pageviews/top/{project}/{access}/{year}/{month}/{day}")
+        async def top(project: str, access: str, year: str, month: str, day: str):
+            self.calls["top"] += 1
+            await self._delay()
+            data = self.top(year, month, day)
+            if data is None:
+                return self._respond({"type": "https://mediawiki.org/wiki/HyperSwitch/errors/not_found", "title": "Not found.", "detail": "The date(s) you used are valid, but we either do not have data for those date(s), or the project you asked for is not loaded yet."}, 404)
+            return self._respond(data)
+
+        @app.get("/v2/stream/recentchange")
+        async def recentchange(since: Optional[str] = None):
+            return StreamingResponse(self.stream(since), media_type="text/event-stream")
+
+        @app.get("/_stats")
+        async def get_stats():
+            return JSONResponse(self.stats())
+
+        @app.get("/_emitted")
+        async def get_emitted(from_rcid: int = 0, to_rcid: Optional[int] = None):
+            return JSONResponse([entry for entry in self.emitted if entry[0] >= from_rcid and (to_rcid is None or entry[0] < to_rcid)])
+
+        @app.post("/_reset")
+        async def post_reset():
+            self.reset()
+            return JSONResponse(self.stats())
+
+        return app
+
+def build_standin(args) -> StandIn:
+    if args.fixture:
+        events = load_events(args.fixture)
+    else:
+        events = generate_events(args.days, args.rate, seed=args.seed)
+    capture = load_events(args.capture) if args.capture else None
+    standin = StandIn(
+        events, capture,
+        latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+        max_limit=args.max_limit, diffs_per_request=args.diffs_per_request,
+        speed=args.speed, foreign_ratio=args.foreign_ratio, rebase=not args.no_rebase, seed=args.seed,
+    )
+    logger.info(f"Stand-in serving {len(standin.records)} edits, replaying {len(standin.capture)} events at {args.speed}x")
+    return standin
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--fixture", help="Edit history (JSON lines of recentchange events); generated if omitted")
+    parser.add_argument("--capture", help="Stream capture to replay; defaults to the last hour of the history")
+    parser.add_argument("--days", type=float, default=7.0, help="Generated history length")
+    parser.add_argument("--rate", type=int, default=500, help="Generated edits per hour")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added to every upstream call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra latency, 0..N ms")
+    parser.add_argument("--max-limit", type=int, default=500, help="rclimit cap (rows per page)")
+    parser.add_argument("--diffs-per-request", type=int, default=0, help="Diffs rendered per rvdiffto call (0 = all)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Stream replay speed")
+    parser.add_argument("--foreign-ratio", type=int, default=0, help="Other-wiki events sent per Hebrew Wikipedia event")
+    parser.add_argument("--no-rebase", action="store_true", help="Keep fixture timestamps instead of ending the history now")
+
+def main():
+    parser = argparse.ArgumentParser(description="Local MediaWiki / EventStreams stand-in for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    standin = build_standin(args)
+    uvicorn.run(standin.app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import zlib
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+from request_governor import BULK
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class DiffCache:
+    """
+    LRU of diff HTML keyed by revid, bounded by total stored bytes.
+    A revision's diff never changes, so entries never expire; they are only evicted.
+    Bodies of at least `compress_min` bytes are zlib-compressed when `compress` is set.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, compress: bool = True, compress_min: int = 1024):
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.compress_min = compress_min
+        self.entries = OrderedDict() # revid -> (compressed, data)
+        self.bytes = 0
+
+    def __contains__(self, revid: int) -> bool:
+        return revid in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, revid: int) -> Optional[str]:
+        entry = self.entries.get(revid)
+        if entry is None:
+            return None
+        self.entries.move_to_end(revid)
+        compressed, data = entry
+        return (zlib.decompress(data) if compressed else data).decode("utf-8")
+
+    def set(self, revid: int, diff_html: str):
+        data = diff_html.encode("utf-8")
+        compressed = self.compress and len(data) >= self.compress_min
+        if compressed:
+            data = zlib.compress(data, 6)
+
+        if len(data) > self.max_bytes:
+            return
+
+        if revid in self.entries:
+            self.bytes -= len(self.entries.pop(revid)[1])
+        self.entries[revid] = (compressed, data)
+        self.bytes += len(data)
+
+        while self.bytes > self.max_bytes:
+            _, (_, old) = self.entries.popitem(last=False)
+            self.bytes -= len(old)
+
+class DiffPrefetcher:
+    """
+    Background workers that warm WikiClient's diff cache for revisions users
+    are likely to open (the newest live edits, the top-edited list).
+    The queue is bounded; revids submitted while it is full are dropped.
+    """
+
+    def __init__(self, wiki_client, concurrency: int = 2, queue_size: int = 200):
+        self.wiki_client = wiki_client
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        # Created here so it binds to the running event loop
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        for _ in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, revids: Iterable[Optional[int]]):
+        if self.queue is None:
+            return
+        for revid in revids:
+            if not revid or revid in self.wiki_client.diff_cache:
+                continue
+            try:
+                self.queue.put_nowait(revid)
+            except asyncio.QueueFull:
+                return
+
+    def submit_stream_event(self, event):
+        """
+        StreamHub listener: prefetches the diff of every live edit.
+        """
+        if event.get("type") == "edit":
+            self.submit([(event.get("revision") or {}).get("new")])
+
+    async def _worker(self):
+        while True:
+            revid = await self.queue.get()
+            try:
+                if revid not in self.wiki_client.diff_cache:
+                    await self.wiki_client.get_diff(revid, priority=BULK)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error prefetching diff {revid}: {e}")
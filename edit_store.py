@@ -0,0 +1,313 @@
+import asyncio
+import logging
+import re
+import sys
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aggregates import EditAggregates
+from request_governor import BULK
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Matches IPv4 / IPv6 user names (anonymous edits)
+IP_RE = re.compile(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$|:')
+
+def parse_timestamp(ts: str) -> int:
+    """
+    Converts a MediaWiki ISO timestamp ("2024-01-01T12:00:00Z") to epoch seconds.
+    """
+    return int(datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp())
+
+def format_timestamp(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+# EditRecord.flags bits for the recentchanges boolean keys
+ANON = 1
+BOT = 2
+MINOR = 4
+FLAG_KEYS = (("anon", ANON), ("bot", BOT), ("minor", MINOR))
+
+class EditRecord:
+    """
+    Compact resident form of one recentchanges row.
+    Title, user and type strings are interned, so every edit of a page or by a
+    user shares one string object; the timestamp is kept as epoch seconds and
+    boolean keys as bit flags. `to_row()` rebuilds the API row shape on demand.
+    """
+    __slots__ = ("epoch", "rcid", "revid", "old_revid", "pageid", "ns", "type", "title", "user", "comment", "oldlen", "newlen", "flags")
+
+    def __init__(self, epoch: int, rcid: int, revid: int = 0, old_revid: int = 0, pageid: Optional[int] = None, ns: Optional[int] = None, type: Optional[str] = None, title: Optional[str] = None, user: Optional[str] = None, comment: str = "", oldlen: int = 0, newlen: int = 0, flags: int = 0):
+        self.epoch = epoch
+        self.rcid = rcid
+        self.revid = revid
+        self.old_revid = old_revid
+        self.pageid = pageid
+        self.ns = ns
+        self.type = sys.intern(type) if type else type
+        self.title = sys.intern(title) if title else title
+        self.user = sys.intern(user) if user else user
+        self.comment = comment
+        self.oldlen = oldlen
+        self.newlen = newlen
+        self.flags = flags
+
+    @property
+    def anon(self) -> bool:
+        return bool(self.flags & ANON)
+
+    @classmethod
+    def from_row(cls, row: Dict) -> "EditRecord":
+        flags = 0
+        for key, bit in FLAG_KEYS:
+            if key in row:
+                flags |= bit
+        return cls(
+            parse_timestamp(row["timestamp"]), row["rcid"],
+            row.get("revid", 0), row.get("old_revid", 0), row.get("pageid"), row.get("ns"),
+            row.get("type"), row.get("title"), row.get("user"), row.get("comment", ""),
+            row.get("oldlen", 0), row.get("newlen", 0), flags,
+        )
+
+    @classmethod
+    def from_stream_event(cls, event: Dict) -> "EditRecord":
+        user = event.get("user", "")
+        revision = event.get("revision") or {}
+        length = event.get("length") or {}
+        flags = ANON if IP_RE.search(user or "") else 0
+        if event.get("bot"):
+            flags |= BOT
+        if event.get("minor"):
+            flags |= MINOR
+        return cls(
+            event.get("timestamp", 0), event.get("id"),
+            revision.get("new", 0), revision.get("old", 0), None, event.get("namespace"),
+            event.get("type"), event.get("title"), user, event.get("comment", ""),
+            length.get("old", 0) or 0, length.get("new", 0) or 0, flags,
+        )
+
+    def to_row(self) -> Dict:
+        row = {
+            "type": self.type,
+            "ns": self.ns,
+            "title": self.title,
+            "rcid": self.rcid,
+            "revid": self.revid,
+            "old_revid": self.old_revid,
+            "user": self.user,
+            "timestamp": format_timestamp(self.epoch),
+            "comment": self.comment,
+            "oldlen": self.oldlen,
+            "newlen": self.newlen,
+        }
+        if self.pageid is not None:
+            row["pageid"] = self.pageid
+        for key, bit in FLAG_KEYS:
+            if self.flags & bit:
+                row[key] = ""
+        return row
+
+class EditStore:
+    """
+    Resident, time-ordered store of recent changes for the given namespaces.
+    Fed by the live stream (via StreamHub listeners), backfilled once from the API
+    at startup, and trimmed to the retention window as new edits arrive.
+    Edits are held as compact EditRecords; `query()` returns them in the
+    `list=recentchanges` row shape so WikiClient can serve them directly.
+    """
+
+    def __init__(self, wiki_client, namespaces: Tuple[int, ...] = (0, 1), retention: timedelta = timedelta(days=7)):
+        self.wiki_client = wiki_client
+        self.namespaces = namespaces
+        self.retention = int(retention.total_seconds())
+        # EditRecords ordered oldest -> newest
+        self.edits: deque = deque()
+        self.rcids = set()
+        # Learned from API rows; stream events do not carry a page id
+        self.title_pageids: Dict[str, int] = {}
+        # Sliding-window top-N aggregates, maintained on every add
+        self.aggregates = EditAggregates(namespaces)
+        # Callbacks for every newly added EditRecord, e.g. the search index
+        self.listeners: List[Callable[[EditRecord], None]] = []
+        self.ready = False
+        self.covered_since: Optional[int] = None
+        self._backfill_task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self.edits)
+
+    def covers(self, namespace: int, since: Optional[int]) -> bool:
+        """
+        True if the store can answer a query for `namespace` starting at epoch `since`.
+        """
+        if not self.ready or namespace not in self.namespaces:
+            return False
+        if since is None:
+            return True
+        return since >= self.covered_since
+
+    def add_listener(self, listener: Callable[[EditRecord], None]):
+        """
+        Registers a synchronous callback for rows added after startup.
+        Rows merged in by the backfill are not announced; listeners read them from `edits`.
+        """
+        self.listeners.append(listener)
+
+    def ingest_stream_event(self, event: Dict):
+        """
+        StreamHub listener: adds one live event to the store.
+        """
+        if event.get("namespace") not in self.namespaces:
+            return
+        self.add(EditRecord.from_stream_event(event))
+
+    def add(self, edit: EditRecord):
+        """
+        Adds one EditRecord (use `EditRecord.from_row` for API rows).
+        """
+        if edit.rcid is None or edit.rcid in self.rcids:
+            return
+
+        if edit.pageid is not None:
+            self.title_pageids[edit.title] = edit.pageid
+        else:
+            edit.pageid = self.title_pageids.get(edit.title)
+
+        epoch = edit.epoch
+        self.rcids.add(edit.rcid)
+
+        # Stream events arrive almost in order; walk back from the newest end
+        if not self.edits or self.edits[-1].epoch <= epoch:
+            self.edits.append(edit)
+        else:
+            index = len(self.edits)
+            while index > 0 and self.edits[index - 1].epoch > epoch:
+                index -= 1
+            self.edits.insert(index, edit)
+
+        self.aggregates.add(edit)
+        for listener in self.listeners:
+            try:
+                listener(edit)
+            except Exception as e:
+                logger.error(f"Edit store listener error: {e}")
+        self.evict()
+
+    def evict(self, now: Optional[int] = None):
+        """
+        Drops everything older than the retention window.
+        """
+        if now is None:
+            now = int(datetime.now(timezone.utc).timestamp())
+        cutoff = now - self.retention
+        while self.edits and self.edits[0].epoch < cutoff:
+            self.rcids.discard(self.edits.popleft().rcid)
+
+    def start(self):
+        """
+        Schedules the one-time backfill (idempotent).
+        """
+        if self._backfill_task is None:
+            self._backfill_task = asyncio.create_task(self._backfill_until_ready())
+
+    async def _backfill_until_ready(self, retry_delay: float = 60.0):
+        while not self.ready:
+            try:
+                await self.backfill()
+            except Exception as e:
+                logger.error(f"Edit store backfill failed: {e}")
+            if not self.ready:
+                await asyncio.sleep(retry_delay)
+
+    async def backfill(self, chunk_retries: int = 2):
+        """
+        Loads the missing history once from the MediaWiki API, in parallel 6-hour chunks,
+        and merges it with whatever the live stream delivered in the meantime.
+        Failed chunks are retried `chunk_retries` times; if some still fail, coverage
+        starts after the newest failed chunk so older queries go to the API.
+        """
+        started = int(datetime.now(timezone.utc).timestamp())
+        chunks = int(self.retention / (6 * 3600))
+
+        def as_datetime(epoch):
+            return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+        # (namespace, newer bound, older bound) in epoch seconds
+        pending = [
+            (namespace, started - i * 6 * 3600, started - (i + 1) * 6 * 3600)
+            for namespace in self.namespaces
+            for i in range(chunks)
+        ]
+        rows = []
+        for attempt in range(chunk_retries + 1):
+            results = await asyncio.gather(*(
+                self.wiki_client._fetch_edits_worker(as_datetime(t_start), as_datetime(t_end), 100000, namespace, False, "ids|title|user|timestamp|comment|sizes|flags", priority=BULK, raise_errors=True)
+                for namespace, t_start, t_end in pending
+            ), return_exceptions=True)
+            failed = []
+            for chunk, res in zip(pending, results):
+                if isinstance(res, Exception):
+                    logger.error(f"Edit store backfill chunk failed (attempt {attempt + 1}): {res}")
+                    failed.append(chunk)
+                else:
+                    rows.extend(res)
+            pending = failed
+            if not pending:
+                break
+
+        # Merge in one pass instead of inserting each historical row into the deque
+        merged = {}
+        for row in rows:
+            if "rcid" in row and "timestamp" in row:
+                edit = EditRecord.from_row(row)
+                merged[edit.rcid] = edit
+                if edit.pageid is not None:
+                    self.title_pageids[edit.title] = edit.pageid
+        count = len(merged)
+        if not count:
+            # The API returned nothing (likely unreachable); keep falling back to it
+            logger.warning("Edit store backfill returned no edits, will retry")
+            return
+
+        for edit in self.edits:
+            if edit.pageid is None:
+                edit.pageid = self.title_pageids.get(edit.title)
+            merged.setdefault(edit.rcid, edit)
+
+        self.edits = deque(sorted(merged.values(), key=lambda edit: edit.epoch))
+        self.rcids = set(merged.keys())
+        self.evict()
+        self.aggregates.rebuild(self.edits)
+
+        self.covered_since = started - self.retention
+        if pending:
+            # Only the history newer than every hole is complete
+            self.covered_since = max(t_start for _, t_start, _ in pending)
+            logger.warning(f"Edit store backfill left {len(pending)} chunk(s) missing; covering edits since {format_timestamp(self.covered_since)}")
+        self.ready = True
+        logger.info(f"Edit store backfilled {count} edits ({len(self.edits)} resident)")
+
+    def query(self, namespace: int, since: Optional[int] = None, max_fetch: int = 500, anon_only: bool = False, user: Optional[str] = None, title: Optional[str] = None) -> List[Dict]:
+        """
+        Returns up to `max_fetch` matching rows, newest first.
+        Filters mirror the recentchanges API parameters (rcnamespace, rcshow=anon, rcuser, rctitle).
+        """
+        results = []
+        for edit in reversed(self.edits):
+            if since is not None and edit.epoch < since:
+                break
+            if edit.ns != namespace:
+                continue
+            if anon_only and not edit.flags & ANON:
+                continue
+            if user and edit.user != user:
+                continue
+            if title and edit.title != title:
+                continue
+            results.append(edit.to_row())
+            if len(results) >= max_fetch:
+                break
+        return results
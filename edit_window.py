@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+import metrics
+import tracing
+from edit_store import EditRecord
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Union of the rcprop fields every window consumer needs
+# (aggregations: title, user, timestamp, comment; recent edits: sizes)
+WINDOW_PROPS = "ids|title|user|timestamp|comment|sizes"
+WINDOW_PROP_SET = frozenset(WINDOW_PROPS.split("|"))
+
+PERIOD_SECONDS = {"1h": 3600, "24h": 24 * 3600, "7d": 7 * 24 * 3600}
+
+# A refresh re-reads this far before the previous fetch, for edits that showed up late
+REFRESH_OVERLAP = 60
+
+WINDOW_REQUESTS = metrics.counter("edisco_edit_window_requests_total", "Edit window lookups by action (hit, full, refresh, extend, error).", ("action",))
+
+def _as_datetime(epoch: int) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+class _Window:
+    __slots__ = ("edits", "rcids", "complete", "requested", "fetched_at", "used_at", "lock")
+
+    def __init__(self):
+        self.edits: List[EditRecord] = [] # newest first
+        self.rcids: Set[int] = set()
+        # True when `edits` reaches back to the start of the period
+        self.complete = False
+        # Largest row count asked for; an incomplete window keeps this many newest edits
+        self.requested = 0
+        self.fetched_at: Optional[float] = None
+        self.used_at = time.time()
+        self.lock = asyncio.Lock()
+
+def _records(rows: List[Dict]) -> List[EditRecord]:
+    """
+    API rows as EditRecords, newest first.
+    """
+    edits = [EditRecord.from_row(row) for row in rows if "rcid" in row and "timestamp" in row]
+    edits.sort(key=lambda edit: edit.epoch, reverse=True)
+    return edits
+
+class EditWindows:
+    """
+    Shared recent-changes windows, one per (namespace, period, anon_only, user, title).
+    Top-edited, top-editors, talk pages and get_recent_edits all read the same
+    rcid-deduplicated rows, fetched once with the union of their rcprop fields
+    (WINDOW_PROPS), instead of each paging through the same range on its own.
+    A window is fetched with the density-planned fetch, grown at its old end when
+    a consumer needs more rows than it holds, and after `ttl` seconds refreshed
+    from its newest edit forward (only the edits made since), with edits that left
+    the period dropped. Edits are held as compact EditRecords, like the EditStore's.
+    A failed fetch leaves the window as it was (an unfetched window is retried
+    by the next lookup), and the lookup gets whatever rows the window holds.
+    Windows unused for `max_age` seconds, and windows whose range the EditStore
+    now covers (queries go there instead), are dropped by `sweep()`, which runs
+    on every lookup and, once `start()` is called, every `ttl` seconds.
+    """
+
+    def __init__(self, wiki_client, ttl: float = 60.0, max_age: float = 600.0, max_windows: int = 16):
+        self.wiki_client = wiki_client
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_windows = max_windows
+        self.windows = OrderedDict() # key -> _Window
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Edit window sweep error: {e}")
+
+    def sweep(self, now: Optional[float] = None):
+        """
+        Drops windows idle for `max_age` seconds and windows the EditStore covers.
+        Windows with a fetch in progress are kept.
+        """
+        if now is None:
+            now = time.time()
+        store = self.wiki_client.edit_store
+        for key, window in list(self.windows.items()):
+            if window.lock.locked():
+                continue
+            namespace, period = key[0], key[1]
+            if now - window.used_at >= self.max_age or (store and store.covers(namespace, int(now) - PERIOD_SECONDS[period])):
+                del self.windows[key]
+
+    def _window(self, key: Tuple) -> _Window:
+        self.sweep()
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = _Window()
+        window.used_at = time.time()
+        self.windows.move_to_end(key)
+        while len(self.windows) > self.max_windows:
+            self.windows.popitem(last=False)
+        return window
+
+    async def get(self, namespace: int, period: str, max_fetch: int, anon_only: bool = False, user: Optional[str] = None, title: Optional[str] = None) -> List[Dict]:
+        """
+        The newest `max_fetch` edits of the window, newest first, as
+        `list=recentchanges` rows built for this caller.
+        """
+        key = (namespace, period, anon_only, user, title)
+        window = self._window(key)
+        async with window.lock:
+            now = time.time()
+            since = int(now) - PERIOD_SECONDS[period]
+            fetch = (namespace, anon_only, user, title)
+
+            action = "hit"
+            try:
+                if window.fetched_at is None or now - window.fetched_at >= self.max_age:
+                    action = "full"
+                    with tracing.span("edit_window", action=action, period=period, namespace=namespace):
+                        await self._fetch(window, since, max_fetch, fetch)
+                else:
+                    if now - window.fetched_at >= self.ttl:
+                        action = "refresh"
+                        with tracing.span("edit_window", action=action, period=period, namespace=namespace):
+                            await self._refresh(window, since, fetch)
+                    if not window.complete and len(window.edits) < max_fetch:
+                        action = "extend"
+                        with tracing.span("edit_window", action=action, period=period, namespace=namespace):
+                            await self._extend(window, since, max_fetch, fetch)
+            except Exception as e:
+                logger.error(f"Error fetching edit window ({action}): {e}")
+                action = "error"
+            WINDOW_REQUESTS.inc(action)
+            return [edit.to_row() for edit in window.edits[:max_fetch]]
+
+    async def _fetch(self, window: _Window, since: int, max_fetch: int, fetch: Tuple):
+        namespace, anon_only, user, title = fetch
+        fetched_at = time.time()
+        rows = await self.wiki_client._fetch_edits_planned(since, max_fetch, namespace, anon_only, WINDOW_PROPS, user, title, raise_errors=True)
+        window.edits = _records(rows)
+        window.rcids = {edit.rcid for edit in window.edits}
+        window.complete = len(rows) < max_fetch
+        window.requested = max_fetch
+        window.fetched_at = fetched_at
+
+    async def _refresh(self, window: _Window, since: int, fetch: Tuple):
+        """
+        Adds the edits made since the newest one held and drops the ones that
+        left the period (or, for an incomplete window, fell past `requested`).
+        """
+        if not window.edits:
+            # Nothing to continue from: refetch with the planned fetch
+            await self._fetch(window, since, window.requested, fetch)
+            return
+
+        namespace, anon_only, user, title = fetch
+        fetched_at = time.time()
+        # Edits older than the previous fetch were already seen, even when the newest held one is older
+        newest = max(window.edits[0].epoch, int(window.fetched_at) - REFRESH_OVERLAP)
+        # rcend is inclusive, so edits from the newest second come back and are skipped by rcid
+        new_rows = await self.wiki_client._fetch_edits_worker(None, _as_datetime(newest), 100000, namespace, anon_only, WINDOW_PROPS, user, title, raise_errors=True)
+
+        added = [edit for edit in _records(new_rows) if edit.rcid not in window.rcids]
+        window.edits = added + window.edits
+        window.rcids.update(edit.rcid for edit in added)
+
+        edits = window.edits
+        while edits and edits[-1].epoch < since:
+            window.rcids.discard(edits.pop().rcid)
+        if not window.complete:
+            while len(edits) > window.requested:
+                window.rcids.discard(edits.pop().rcid)
+        window.fetched_at = fetched_at
+
+    async def _extend(self, window: _Window, since: int, max_fetch: int, fetch: Tuple):
+        """
+        Fetches older edits, from the oldest one held back towards the start of
+        the period, until the window holds `max_fetch` rows or the period is exhausted.
+        """
+        namespace, anon_only, user, title = fetch
+        needed = max_fetch - len(window.edits)
+        oldest = window.edits[-1].epoch if window.edits else None
+        older = await self.wiki_client._fetch_edits_planned(since, needed, namespace, anon_only, WINDOW_PROPS, user, title, until=oldest, raise_errors=True)
+
+        added = [edit for edit in _records(older) if edit.rcid not in window.rcids]
+        window.edits.extend(added)
+        window.rcids.update(edit.rcid for edit in added)
+        window.complete = len(older) < needed
+        window.requested = max(window.requested, max_fetch)
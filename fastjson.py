@@ -0,0 +1,38 @@
+import json
+from typing import Any, Union
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Pluggable JSON codec: orjson when installed, the standard library otherwise.
+# Output is always compact UTF-8 (no ASCII escaping), whichever backend is used.
+
+JSONDecodeError = orjson.JSONDecodeError if orjson else json.JSONDecodeError
+
+def loads(data: Union[str, bytes]) -> Any:
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys).encode("utf-8")
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    return dumps_bytes(obj, sort_keys).decode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered through this module (orjson when available).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,41 @@
+import math
+from typing import List, Tuple
+
+
+# Rows returned by one `list=recentchanges` call
+ROWS_PER_CALL = 500
+
+def estimate_density(count: int, newest: int, reached: int) -> float:
+    """
+    Edits per second, given that `count` edits were found between `newest` and
+    `reached` (epoch seconds) and that span was fetched completely.
+    The span runs to the boundary reached, not to the oldest row found, so
+    an empty stretch that was covered counts against the density.
+    """
+    return max(count, 1) / max(newest - reached, 1)
+
+def plan_intervals(newest: int, oldest: int, density: float, needed: int, fill: float = 0.8, margin: float = 1.1, max_intervals: int = 10) -> List[Tuple[int, int]]:
+    """
+    Plans the next fetch round as contiguous (start, end) intervals, newest first,
+    reaching back from `newest` only as far as `needed` more edits should take
+    at `density` (with `margin`), but never past `oldest`.
+    Each interval is sized to hold about `fill` of one API call, so sparse
+    stretches merge into a few wide intervals and busy ones split into many.
+    A round covers at most `max_intervals` calls' worth of edits; the caller
+    re-measures density and plans the next round from where this one ends.
+    """
+    span = min(
+        newest - oldest,
+        math.ceil(needed * margin / density),
+        math.ceil(max_intervals * fill * ROWS_PER_CALL / density),
+    )
+    expected = density * span
+    count = min(max_intervals, max(1, math.ceil(expected / (fill * ROWS_PER_CALL))))
+
+    intervals = []
+    start = newest
+    for i in range(1, count + 1):
+        end = newest - span * i // count
+        intervals.append((start, end))
+        start = end
+    return intervals
@@ -0,0 +1,120 @@
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+import fastjson
+import tracing
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+class _Encoded:
+    """
+    One payload rendered once: its JSON body, ETag and lazily built compressed bodies.
+    """
+    __slots__ = ("source", "body", "etag", "encodings")
+
+    def __init__(self, source: Any, body: bytes):
+        self.source = source
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.encodings: Dict[str, bytes] = {}
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """
+        Strong ETag of the body as sent: compressed bodies are different bytes,
+        so they get the encoding appended to the content hash.
+        """
+        if encoding is None:
+            return self.etag
+        return self.etag[:-1] + "-" + encoding + '"'
+
+    def encoded(self, encoding: str) -> bytes:
+        data = self.encodings.get(encoding)
+        if data is None:
+            with tracing.span("compress", encoding=encoding):
+                if encoding == "br":
+                    data = brotli.compress(self.body, quality=9)
+                else:
+                    data = gzip.compress(self.body, 9, mtime=0)
+            self.encodings[encoding] = data
+        return data
+
+class EncodedResponseCache:
+    """
+    Serves API results with a content-hash ETag per encoding (If-None-Match -> 304)
+    and gzip / brotli negotiated from Accept-Encoding.
+    Cached WikiClient methods return the same result object until it is
+    refreshed, so the rendered body, ETag and compressed bodies are kept per
+    result object and an unchanged result is never re-encoded or re-hashed.
+    """
+
+    def __init__(self, max_entries: int = 256, min_size: int = 512):
+        self.max_entries = max_entries
+        # Bodies smaller than this are sent uncompressed
+        self.min_size = min_size
+        self.entries = OrderedDict() # id(results) -> _Encoded
+
+    def _encode(self, results: Any) -> _Encoded:
+        key = id(results)
+        entry = self.entries.get(key)
+        # The entry keeps `results` alive, so a matching id is the same object
+        if entry is not None and entry.source is results:
+            self.entries.move_to_end(key)
+            return entry
+
+        with tracing.span("encode"):
+            entry = _Encoded(results, fastjson.dumps_bytes({"results": results}))
+        self.entries[key] = entry
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _accepted(accept_encoding: str) -> Dict[str, float]:
+        accepted = {}
+        for part in accept_encoding.split(","):
+            name, _, params = part.strip().partition(";")
+            q = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            if name:
+                accepted[name.strip().lower()] = q
+        return accepted
+
+    def _choose_encoding(self, request: Request) -> Optional[str]:
+        accepted = self._accepted(request.headers.get("accept-encoding", ""))
+        if brotli is not None and accepted.get("br", 0) > 0:
+            return "br"
+        if accepted.get("gzip", 0) > 0:
+            return "gzip"
+        return None
+
+    def response(self, request: Request, results: Any) -> Response:
+        """
+        Builds the response for `{"results": results}`.
+        """
+        entry = self._encode(results)
+        encoding = self._choose_encoding(request) if len(entry.body) >= self.min_size else None
+        etag = entry.etag_for(encoding)
+        headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip().lstrip("W/") for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        body = entry.body
+        if encoding:
+            body = entry.encoded(encoding)
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
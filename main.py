@@ -1,16 +1,31 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from wiki_client import WikiClient
+from stream_hub import StreamHub, LiveFilter, encode_frame, resolve_format
+from edit_store import EditStore
+from prewarm import CachePrewarmer
+from diff_cache import DiffPrefetcher
+from search_index import DiffSearchIndex
+from panels import PanelPublisher
+from fastjson import FastJSONResponse
+from http_cache import EncodedResponseCache
+from tracing import ServerTimingMiddleware, TraceStore
 import asyncio
+import fastjson
 import logging
+import metrics
 import os
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Edisco")
+app = FastAPI(title="Edisco", default_response_class=FastJSONResponse)
+
+# Server-Timing on /api responses; EDISCO_TRACE_DEBUG=1 also keeps full span lists for /debug/traces
+trace_store = TraceStore() if os.environ.get("EDISCO_TRACE_DEBUG") == "1" else None
+app.add_middleware(ServerTimingMiddleware, store=trace_store)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -18,12 +33,72 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Initialize WikiClient
 wiki_client = WikiClient()
 
+# Single upstream EventStreams connection shared by all /ws/live clients
+stream_hub = StreamHub(wiki_client)
+
+# Rolling 7-day store of main and talk namespace edits, fed by the stream
+edit_store = EditStore(wiki_client)
+wiki_client.edit_store = edit_store
+stream_hub.add_listener(edit_store.ingest_stream_event)
+
+# Inverted index over added/removed diff text, fed by the edit store
+search_index = DiffSearchIndex(wiki_client, edit_store)
+wiki_client.search_index = search_index
+edit_store.add_listener(search_index.submit)
+
+# Keeps the dashboard's default queries warm in the async_cache
+prewarmer = CachePrewarmer(wiki_client)
+
+# Pushes panel updates to /ws/panels subscribers when their data changes
+panel_publisher = PanelPublisher(wiki_client)
+
+# ETag / compressed bodies for the cached /api endpoints, kept per result object
+response_cache = EncodedResponseCache()
+
+# Optional on-disk cache of the daily top-viewed rankings (EDISCO_PAGEVIEW_CACHE_DIR)
+wiki_client.top_views.cache_dir = os.environ.get("EDISCO_PAGEVIEW_CACHE_DIR")
+
+# Optional diff prefetching for the live feed and top-edited list (EDISCO_PREFETCH_DIFFS=1)
+diff_prefetcher = None
+if os.environ.get("EDISCO_PREFETCH_DIFFS") == "1":
+    diff_prefetcher = DiffPrefetcher(wiki_client)
+    wiki_client.diff_prefetcher = diff_prefetcher
+    stream_hub.add_listener(diff_prefetcher.submit_stream_event)
+
+# Gauges read from the live objects whenever /metrics is scraped
+metrics.gauge("edisco_live_subscribers", "Connected /ws/live subscribers.", collect=lambda: len(stream_hub.subscribers))
+metrics.gauge("edisco_live_queued_events", "Events waiting in /ws/live subscriber queues.", collect=lambda: sum(sub.queue.qsize() for sub in stream_hub.subscribers))
+metrics.gauge("edisco_live_queue_depth_max", "Deepest /ws/live subscriber queue.", collect=lambda: max((sub.queue.qsize() for sub in stream_hub.subscribers), default=0))
+metrics.gauge("edisco_panel_subscribers", "Connected /ws/panels sockets.", collect=lambda: len(panel_publisher.subscriptions))
+metrics.gauge("edisco_panel_topics", "Distinct panel topics being pushed.", collect=lambda: len(panel_publisher.topics))
+metrics.gauge("edisco_stream_last_event_timestamp_seconds", "Timestamp of the last upstream stream event.", collect=lambda: stream_hub.last_timestamp or 0)
+metrics.gauge("edisco_edit_store_edits", "Edits resident in the edit store.", collect=lambda: len(edit_store))
+metrics.gauge("edisco_search_index_revisions", "Revisions in the diff search index.", collect=lambda: len(search_index.revs))
+metrics.gauge("edisco_diff_cache_entries", "Diffs held in the diff cache.", collect=lambda: len(wiki_client.diff_cache))
+metrics.gauge("edisco_diff_cache_bytes", "Stored size of the diff cache.", collect=lambda: wiki_client.diff_cache.bytes)
+metrics.gauge("edisco_page_metadata_entries", "Page metadata cache entries, by key.", ("key",), collect=lambda: {"title": len(wiki_client.page_metadata.by_title), "pageid": len(wiki_client.page_metadata.by_pageid)})
+metrics.gauge("edisco_response_cache_entries", "Encoded /api responses held.", collect=lambda: len(response_cache.entries))
+
 @app.on_event("startup")
 async def startup_event():
-    pass
+    stream_hub.start()
+    # Backfill history in the background; queries fall back to the API until it is ready
+    edit_store.start()
+    search_index.start()
+    prewarmer.start()
+    wiki_client.edit_windows.start()
+    if diff_prefetcher:
+        diff_prefetcher.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await prewarmer.stop()
+    await wiki_client.edit_windows.stop()
+    await search_index.stop()
+    if diff_prefetcher:
+        await diff_prefetcher.stop()
+    await panel_publisher.stop()
+    await stream_hub.stop()
     await wiki_client.close()
 
 @app.get("/")
@@ -33,15 +108,126 @@ async def get():
 
 @app.websocket("/ws/live")
 async def websocket_endpoint(websocket: WebSocket):
+    """
+    Live edit feed, in a compact recentchanges-style schema.
+    `format=json|msgpack|raw` picks the encoding (msgpack frames are binary;
+    raw is the full EventStreams payload). Filters are given as query parameters
+    (`namespace=0|1`, `anon_only=true`, `user`, `title`) and applied on the server;
+    `policy=drop_oldest|disconnect` picks what happens when the client falls behind.
+    With `batch_ms` (and optionally `batch_size`, default 100) events are sent as
+    JSON arrays, one frame per `batch_ms` milliseconds or `batch_size` events.
+    """
     await websocket.accept()
+    params = websocket.query_params
+    try:
+        live_filter = LiveFilter.from_params(params)
+        batch_ms = min(max(int(params.get("batch_ms", 0)), 0), 5000)
+        batch_size = min(max(int(params.get("batch_size", 100)), 1), 1000)
+        fmt = resolve_format(params.get("format"))
+        subscription = stream_hub.subscribe(live_filter, params.get("policy"))
+    except ValueError as e:
+        logger.warning(f"Rejecting live subscriber: {e}")
+        await websocket.close(code=1008)
+        return
+
+    async def send_events():
+        while True:
+            if batch_ms:
+                events = await subscription.get_batch(batch_size, batch_ms / 1000)
+                frame = encode_frame(events, fmt) if events is not None else None
+            else:
+                event = await subscription.get()
+                frame = event.encode(fmt) if event is not None else None
+            if frame is None:
+                # Too slow under the disconnect policy; the client reconnects and resyncs
+                await websocket.close(code=1013)
+                return
+            if isinstance(frame, bytes):
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+
+    async def wait_for_disconnect():
+        # Clients send nothing; reading is how a closed socket is noticed
+        # even when no event matches its filter
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    sender = asyncio.create_task(send_events())
+    receiver = asyncio.create_task(wait_for_disconnect())
     try:
-        async for edit in wiki_client.get_recent_edits_stream():
-            await websocket.send_json(edit)
+        done, _ = await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+        if receiver in done:
+            logger.info("Client disconnected")
+        else:
+            sender.result()
     except WebSocketDisconnect:
         logger.info("Client disconnected")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         await websocket.close()
+    finally:
+        stream_hub.unsubscribe(subscription)
+        for task in (sender, receiver):
+            task.cancel()
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+
+@app.websocket("/ws/panels")
+async def panels_endpoint(websocket: WebSocket):
+    """
+    Panel subscriptions. Clients send
+    {"action": "subscribe", "panel": "top-edited", "params": {"period": "24h", ...}}
+    or {"action": "unsubscribe", "panel": "top-edited"}; the server pushes
+    {"panel", "params", "results"} whenever a subscribed panel's data changes.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action")
+            panel = message.get("panel")
+            if action == "subscribe":
+                try:
+                    await panel_publisher.subscribe(websocket, panel, message.get("params") or {})
+                except ValueError as e:
+                    await websocket.send_json({"panel": panel, "error": str(e)})
+            elif action == "unsubscribe":
+                panel_publisher.unsubscribe(websocket, panel)
+    except WebSocketDisconnect:
+        logger.info("Panel client disconnected")
+    except Exception as e:
+        logger.error(f"Panel WebSocket error: {e}")
+        await websocket.close()
+    finally:
+        panel_publisher.unsubscribe(websocket)
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus text-format metrics.
+    """
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/traces")
+async def get_traces():
+    """
+    Recent /api request traces, newest first (EDISCO_TRACE_DEBUG=1).
+    """
+    if trace_store is None:
+        raise HTTPException(status_code=404, detail="Tracing debug mode is off")
+    return {"traces": trace_store.recent()}
+
+@app.get("/debug/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """
+    One trace with its full span list (ids come from the X-Trace-Id header).
+    """
+    trace = trace_store.get(trace_id) if trace_store is not None else None
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace.to_dict()
 
 @app.get("/api/search")
 async def search(q: str, period: str = "7d"):
@@ -54,6 +240,19 @@ async def search(q: str, period: str = "7d"):
     results = await wiki_client.search_edits(q, period=period)
     return {"results": results}
 
+@app.get("/api/search/stream")
+async def search_stream(q: str, period: str = "7d"):
+    """
+    Streams search matches as NDJSON (one edit per line) while they are found.
+    """
+    async def lines():
+        if not q:
+            return
+        async for result in wiki_client.search_edits_stream(q, period=period):
+            yield fastjson.dumps_bytes(result) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.get("/api/recent")
 async def get_recent(limit: int = 50, period: str = None, anon_only: bool = False, user: str = None, title: str = None, sort: str = "date"):
     """
@@ -63,7 +262,7 @@ async def get_recent(limit: int = 50, period: str = None, anon_only: bool = Fals
     return {"results": results}
 
 @app.get("/api/top-edited")
-async def top_edited(limit: int = 25, period: str = "24h", anon_only: bool = False, user: str = None, title: str = None, sort: str = "count"):
+async def top_edited(request: Request, limit: int = 25, period: str = "24h", anon_only: bool = False, user: str = None, title: str = None, sort: str = "count"):
     """
     Get top edited articles.
     Args:
@@ -71,39 +270,39 @@ async def top_edited(limit: int = 25, period: str = "24h", anon_only: bool = Fal
         period (str): The time period to consider (e.g., "24h", "7d"). Defaults to "24h".
     """
     results = await wiki_client.get_top_edited_articles(limit=limit, period=period, anon_only=anon_only, user=user, title=title, sort=sort)
-    return {"results": results}
+    return response_cache.response(request, results)
 
 @app.get("/api/top-editors")
-async def top_editors(limit: int = 25, period: str = "24h", anon_only: bool = False, user: str = None, title: str = None):
+async def top_editors(request: Request, limit: int = 25, period: str = "24h", anon_only: bool = False, user: str = None, title: str = None):
     """
     Get top editors.
     """
     results = await wiki_client.get_top_editors(limit=limit, period=period, anon_only=anon_only, user=user, title=title)
-    return {"results": results}
+    return response_cache.response(request, results)
 
 @app.get("/api/top-talk-pages")
-async def top_talk_pages(limit: int = 25, period: str = "24h", anon_only: bool = False, user: str = None, title: str = None, sort: str = "count"):
+async def top_talk_pages(request: Request, limit: int = 25, period: str = "24h", anon_only: bool = False, user: str = None, title: str = None, sort: str = "count"):
     """
     Get top talk pages.
     """
     results = await wiki_client.get_top_talk_pages(limit=limit, period=period, anon_only=anon_only, user=user, title=title, sort=sort)
-    return {"results": results}
+    return response_cache.response(request, results)
 
 @app.get("/api/new-articles")
-async def new_articles(limit: int = 25, period: str = "24h", anon_only: bool = False, user: str = None, title: str = None):
+async def new_articles(request: Request, limit: int = 25, period: str = "24h", anon_only: bool = False, user: str = None, title: str = None):
     """
     Get new articles.
     """
     results = await wiki_client.get_new_articles(limit=limit, period=period, anon_only=anon_only, user=user, title=title)
-    return {"results": results}
+    return response_cache.response(request, results)
 
 @app.get("/api/top-viewed")
-async def top_viewed(limit: int = 25, period: str = "24h", user: str = None, title: str = None):
+async def top_viewed(request: Request, limit: int = 25, period: str = "24h", user: str = None, title: str = None):
     """
     Get top viewed articles.
     """
     results = await wiki_client.get_top_viewed_articles(limit=limit, period=period, user=user, title=title)
-    return {"results": results}
+    return response_cache.response(request, results)
 
 @app.get("/api/diff")
 async def get_diff(revid: int):
@@ -0,0 +1,150 @@
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# Minimal Prometheus text-format (0.0.4) metrics: counters, gauges and histograms
+# with fixed label names, registered in one process-wide REGISTRY and rendered
+# by the app's /metrics endpoint.
+
+LabelValues = Tuple[str, ...]
+
+# Upstream HTTP latencies, seconds
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, values: Tuple) -> LabelValues:
+        if len(values) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {values}")
+        return tuple(str(value) for value in values)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def get(self, *labels) -> float:
+        return self.values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in sorted(self.values.items())]
+
+class Gauge(_Metric):
+    """
+    Set directly, or computed at scrape time by `collect`, which returns a
+    number (no labels) or a {label values: number} dict.
+    """
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), collect: Optional[Callable[[], Union[float, Dict[Tuple, float]]]] = None):
+        super().__init__(name, help, labels)
+        self.values: Dict[LabelValues, float] = {}
+        self.collect = collect
+
+    def set(self, value: float, *labels):
+        self.values[self._key(labels)] = value
+
+    def samples(self):
+        values = self.values
+        if self.collect is not None:
+            collected = self.collect()
+            if isinstance(collected, dict):
+                values = {self._key(key if isinstance(key, tuple) else (key,)): value for key, value in collected.items()}
+            else:
+                values = {(): collected}
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in sorted(values.items())]
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[LabelValues, List] = {} # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        samples = []
+        for key, entry in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, entry):
+                samples.append((f"{self.name}_bucket", _format_labels(self.labels + ("le",), key + (_format_value(bound),)), count))
+            samples.append((f"{self.name}_bucket", _format_labels(self.labels + ("le",), key + ("+Inf",)), entry[-1]))
+            samples.append((f"{self.name}_sum", _format_labels(self.labels, key), entry[-2]))
+            samples.append((f"{self.name}_count", _format_labels(self.labels, key), entry[-1]))
+        return samples
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        """
+        Registers `metric`, or returns the one already registered under its name
+        (so a module imported twice does not duplicate its metrics).
+        """
+        return self.metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labels))
+
+def gauge(name: str, help: str, labels: Tuple[str, ...] = (), collect=None) -> Gauge:
+    metric = REGISTRY.register(Gauge(name, help, labels))
+    if collect is not None:
+        metric.collect = collect
+    return metric
+
+def histogram(name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
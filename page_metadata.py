@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional
+
+import fastjson
+import tracing
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def normalize_title(title: str) -> str:
+    """
+    MediaWiki treats underscores and spaces in titles the same way.
+    """
+    return title.replace("_", " ")
+
+class _TTLCache:
+    """
+    Small LRU with per-entry expiry.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict() # key -> (value, timestamp)
+
+    def get(self, key: Hashable):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, timestamp = entry
+        if time.time() - timestamp >= self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value):
+        self.entries[key] = (value, time.time())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+class PageMetadataService:
+    """
+    Shared thumbnail/description cache for pages, keyed by page id and by title.
+    Lookups from every endpoint that arrive within `batch_delay` are merged into
+    `prop=pageimages|description` requests of up to 50 pages, and those chunks are
+    fetched in parallel under a concurrency cap.
+    Metadata values are dicts with optional "thumbnail" and "description" keys
+    (an empty dict means the page has neither, and is cached as such).
+    """
+    CHUNK_SIZE = 50
+
+    def __init__(self, wiki_client, ttl: float = 3600, max_entries: int = 20000, batch_delay: float = 0.01, concurrency: int = 4):
+        self.wiki_client = wiki_client
+        self.by_pageid = _TTLCache(ttl, max_entries)
+        self.by_title = _TTLCache(ttl, max_entries)
+        self.batch_delay = batch_delay
+        self.concurrency = concurrency
+        # Created lazily so it binds to the running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Lookups waiting for the next batch: key -> Future
+        self._pending_pageids: Dict[int, asyncio.Future] = {}
+        self._pending_titles: Dict[str, asyncio.Future] = {}
+        # Callers awaiting each pending future (see _wait)
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def get_by_pageids(self, pageids: Iterable[int]) -> Dict[int, Dict]:
+        results = {}
+        waiting = {}
+        for pageid in set(int(p) for p in pageids if p):
+            meta = self.by_pageid.get(pageid)
+            if meta is not None:
+                results[pageid] = meta
+            else:
+                waiting[pageid] = self._enqueue(self._pending_pageids, pageid)
+
+        results.update(await self._wait(waiting))
+        return results
+
+    async def get_by_titles(self, titles: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Returns metadata keyed by normalized (space-separated) title.
+        """
+        results = {}
+        waiting = {}
+        for title in set(normalize_title(t) for t in titles if t):
+            meta = self.by_title.get(title)
+            if meta is not None:
+                results[title] = meta
+            else:
+                waiting[title] = self._enqueue(self._pending_titles, title)
+
+        results.update(await self._wait(waiting))
+        return results
+
+    def _enqueue(self, pending: Dict, key) -> asyncio.Future:
+        future = pending.get(key)
+        if future is None or future.done():
+            future = asyncio.get_running_loop().create_future()
+            pending[key] = future
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = tracing.detached_task(self._flush())
+        return future
+
+    async def _wait(self, futures: Dict) -> Dict:
+        """
+        Awaits futures shared with other callers. They are shielded, so a cancelled
+        caller does not cancel the lookup for the others; a future is only cancelled
+        once its last waiter is gone.
+        """
+        for future in futures.values():
+            self._waiters[future] = self._waiters.get(future, 0) + 1
+        results = {}
+        try:
+            for key, future in futures.items():
+                results[key] = await asyncio.shield(future)
+        finally:
+            for future in futures.values():
+                remaining = self._waiters.get(future, 0) - 1
+                if remaining > 0:
+                    self._waiters[future] = remaining
+                else:
+                    self._waiters.pop(future, None)
+                    if not future.done():
+                        future.cancel()
+        return results
+
+    async def _flush(self):
+        # Lookups enqueued while a batch is being fetched join the next round
+        while self._pending_pageids or self._pending_titles:
+            await self._flush_batch()
+
+    async def _flush_batch(self):
+        # Give concurrent callers a moment to join the batch
+        await asyncio.sleep(self.batch_delay)
+
+        # Futures cancelled by all their callers are dropped from the batch
+        pageids = {key: future for key, future in self._pending_pageids.items() if not future.done()}
+        titles = {key: future for key, future in self._pending_titles.items() if not future.done()}
+        self._pending_pageids, self._pending_titles = {}, {}
+
+        tasks = []
+        pageid_keys = list(pageids.keys())
+        for i in range(0, len(pageid_keys), self.CHUNK_SIZE):
+            tasks.append(self._fetch_chunk("pageids", pageid_keys[i:i + self.CHUNK_SIZE], pageids))
+        title_keys = list(titles.keys())
+        for i in range(0, len(title_keys), self.CHUNK_SIZE):
+            tasks.append(self._fetch_chunk("titles", title_keys[i:i + self.CHUNK_SIZE], titles))
+
+        await asyncio.gather(*tasks)
+
+    async def _fetch_chunk(self, kind: str, keys: List, futures: Dict):
+        params = {
+            "action": "query",
+            "prop": "pageimages|description",
+            "pithumbsize": 100,
+            kind: "|".join(map(str, keys)),
+            "format": "json"
+        }
+
+        found = {}
+        try:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+            async with self._semaphore:
+                response = await self.wiki_client._api_get(params)
+            data = fastjson.loads(response.content)
+            query = data.get("query", {})
+
+            for pid, pdata in query.get("pages", {}).items():
+                meta = {}
+                if "thumbnail" in pdata:
+                    meta["thumbnail"] = pdata["thumbnail"].get("source")
+                if "description" in pdata:
+                    meta["description"] = pdata["description"]
+
+                title = pdata.get("title")
+                if title:
+                    self.by_title.set(title, meta)
+                if "missing" not in pdata and pdata.get("pageid"):
+                    self.by_pageid.set(pdata["pageid"], meta)
+
+                found[pdata.get("pageid") if kind == "pageids" else title] = meta
+
+            if kind == "titles":
+                # Map requested spellings back to the canonical titles the API answered with
+                for entry in query.get("normalized", []):
+                    if entry.get("to") in found:
+                        found[entry.get("from")] = found[entry["to"]]
+                        self.by_title.set(entry.get("from"), found[entry["to"]])
+        except Exception as e:
+            logger.error(f"Error fetching page metadata: {e}")
+
+        for key in keys:
+            future = futures[key]
+            if not future.done():
+                future.set_result(found.get(key, {}))
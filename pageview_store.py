@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import fastjson
+import tracing
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REST_URL = os.environ.get("EDISCO_REST_URL", "https://wikimedia.org/api/rest_v1")
+TOP_URL = REST_URL + "/metrics/pageviews/top/he.wikipedia/all-access/{year}/{month}/{day}"
+
+class TopViewsStore:
+    """
+    Per-day top-1000 pageview rankings (`metrics/pageviews/top`).
+    A published day never changes, so it is fetched once and kept: in memory
+    (LRU of `max_days`) and, if `cache_dir` is set, as one JSON file per day
+    that survives restarts. Days that are not published yet (404) are retried
+    after `missing_ttl` seconds; other errors are not cached.
+    """
+
+    def __init__(self, wiki_client, cache_dir: Optional[str] = None, max_days: int = 60, missing_ttl: float = 600.0):
+        self.wiki_client = wiki_client
+        self.cache_dir = cache_dir
+        self.max_days = max_days
+        self.missing_ttl = missing_ttl
+        self.days = OrderedDict() # date -> [(article, views), ...]
+        self.missing: Dict[date, float] = {} # date -> when it was found unpublished
+        self._inflight: Dict[date, asyncio.Task] = {}
+
+    def _path(self, day: date) -> str:
+        return os.path.join(self.cache_dir, f"top-{day.isoformat()}.json")
+
+    def _read_file(self, day: date) -> Optional[List[Tuple[str, int]]]:
+        try:
+            with open(self._path(day), "rb") as f:
+                return [tuple(article) for article in fastjson.loads(f.read())]
+        except FileNotFoundError:
+            return None
+
+    def _write_file(self, day: date, articles: List[Tuple[str, int]]):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self._path(day) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(fastjson.dumps_bytes(articles))
+        # Atomic, so a crash never leaves a truncated day behind
+        os.replace(tmp, self._path(day))
+
+    def _remember(self, day: date, articles: List[Tuple[str, int]]):
+        self.days[day] = articles
+        self.days.move_to_end(day)
+        while len(self.days) > self.max_days:
+            self.days.popitem(last=False)
+
+    async def get_day(self, day: date) -> Optional[List[Tuple[str, int]]]:
+        """
+        The (article, views) ranking for `day`, or None if it is unavailable.
+        """
+        articles = self.days.get(day)
+        if articles is not None:
+            self.days.move_to_end(day)
+            return articles
+        missing_since = self.missing.get(day)
+        if missing_since is not None and time.time() - missing_since < self.missing_ttl:
+            return None
+
+        task = self._inflight.get(day)
+        if task is None:
+            task = tracing.detached_task(self._load(day))
+            self._inflight[day] = task
+            task.add_done_callback(lambda _: self._inflight.pop(day, None))
+        return await asyncio.shield(task)
+
+    async def get_days(self, days: List[date]) -> List[Optional[List[Tuple[str, int]]]]:
+        return await asyncio.gather(*(self.get_day(day) for day in days))
+
+    async def _load(self, day: date) -> Optional[List[Tuple[str, int]]]:
+        if self.cache_dir:
+            try:
+                articles = await asyncio.to_thread(self._read_file, day)
+            except Exception as e:
+                logger.error(f"Error reading cached top views for {day}: {e}")
+                articles = None
+            if articles is not None:
+                self._remember(day, articles)
+                return articles
+
+        url = TOP_URL.format(year=day.strftime("%Y"), month=day.strftime("%m"), day=day.strftime("%d"))
+        try:
+            response = await self.wiki_client._api_get(url=url)
+            if response.status_code == 404:
+                # Not published yet
+                self.missing[day] = time.time()
+                return None
+            response.raise_for_status()
+            items = fastjson.loads(response.content).get("items", [])
+        except Exception as e:
+            logger.error(f"Error fetching top viewed for {day}: {e}")
+            return None
+
+        if not items:
+            self.missing[day] = time.time()
+            return None
+        articles = [(article.get("article"), article.get("views", 0)) for article in items[0].get("articles", [])]
+        self.missing.pop(day, None)
+        self._remember(day, articles)
+
+        if self.cache_dir:
+            try:
+                await asyncio.to_thread(self._write_file, day, articles)
+            except Exception as e:
+                logger.error(f"Error caching top views for {day}: {e}")
+        return articles
+
+class TitleViewsStore:
+    """
+    Per-(title, day) view counts from `prop=pageviews`, for rankings over
+    arbitrary titles (a user's edited pages, a searched title).
+    Published daily counts never change, so a title is only re-queried for
+    the days it is still missing, and no more than once per `missing_ttl`
+    seconds while those days are unpublished. Chunks of 50 titles are fetched
+    concurrently under the WikiClient request governor.
+    """
+    CHUNK_SIZE = 50
+
+    def __init__(self, wiki_client, max_titles: int = 20000, missing_ttl: float = 600.0):
+        self.wiki_client = wiki_client
+        self.max_titles = max_titles
+        self.missing_ttl = missing_ttl
+        self.views = OrderedDict() # title -> {"YYYY-MM-DD": views or None}
+        self.checked: Dict[str, float] = {} # title -> last time it was queried
+
+    def _needed_days(self, title: str, days: List[str], now: float) -> int:
+        """
+        How many days back (pvipdays) `title` still has to be queried, 0 if none.
+        """
+        known = self.views.get(title, {})
+        missing = [day for day in days if known.get(day) is None]
+        if not missing:
+            return 0
+        if all(day in known for day in missing) and now - self.checked.get(title, 0) < self.missing_ttl:
+            # Queried recently; these days are simply not published (or had no views)
+            return 0
+        return days.index(missing[-1]) + 1
+
+    async def get_views(self, titles: List[str], days: List[str]) -> Dict[str, Dict[str, Optional[int]]]:
+        """
+        Views of each title for each of `days` (ISO dates, newest first, starting today).
+        """
+        now = time.time()
+        by_depth: Dict[int, List[str]] = {}
+        for title in titles:
+            depth = self._needed_days(title, days, now)
+            if depth:
+                by_depth.setdefault(depth, []).append(title)
+
+        await asyncio.gather(*(
+            self._fetch_chunk(group[i:i + self.CHUNK_SIZE], depth)
+            for depth, group in by_depth.items()
+            for i in range(0, len(group), self.CHUNK_SIZE)
+        ))
+
+        results = {}
+        for title in titles:
+            known = self.views.get(title)
+            if known is not None:
+                self.views.move_to_end(title)
+                results[title] = {day: known.get(day) for day in days}
+        return results
+
+    async def _fetch_chunk(self, titles: List[str], depth: int):
+        params = {
+            "action": "query",
+            "prop": "pageviews",
+            "titles": "|".join(titles),
+            "pvipdays": depth,
+            "format": "json"
+        }
+        try:
+            response = await self.wiki_client._api_get(params)
+            pages = fastjson.loads(response.content).get("query", {}).get("pages", {})
+        except Exception as e:
+            logger.error(f"Error fetching article views: {e}")
+            return
+
+        now = time.time()
+        # Results are keyed by the normalized title; map them back to what was asked
+        normalized = {title.replace("_", " "): title for title in titles}
+        for page in pages.values():
+            title = normalized.get(page.get("title"), page.get("title"))
+            known = self.views.setdefault(title, {})
+            known.update(page.get("pageviews") or {})
+            self.checked[title] = now
+
+        while len(self.views) > self.max_titles:
+            title, _ = self.views.popitem(last=False)
+            self.checked.pop(title, None)
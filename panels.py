@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import logging
+from typing import Dict, Optional, Set, Tuple
+
+import fastjson
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Panel name -> (WikiClient method, accepted parameters)
+PANELS = {
+    "top-edited": ("get_top_edited_articles", ("limit", "period", "anon_only", "user", "title", "sort")),
+    "top-editors": ("get_top_editors", ("limit", "period", "anon_only", "user", "title")),
+    "talk-pages": ("get_top_talk_pages", ("limit", "period", "anon_only", "user", "title", "sort")),
+    "new-articles": ("get_new_articles", ("limit", "period", "anon_only", "user", "title")),
+    "top-viewed": ("get_top_viewed_articles", ("limit", "period", "user", "title")),
+}
+
+class _Topic:
+    """
+    One (panel, params) combination and the sockets subscribed to it.
+    """
+
+    def __init__(self, panel: str, params: Dict):
+        self.panel = panel
+        self.params = params
+        self.sockets: Set = set()
+        self.digest: Optional[str] = None
+        self.message: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+class PanelPublisher:
+    """
+    Pushes dashboard panel data to WebSocket subscribers.
+    Every distinct (panel, params) topic is computed once per tick for all of its
+    subscribers (through the cached WikiClient methods) and pushed only when the
+    result differs from what was last sent, so load does not grow with open tabs.
+    """
+
+    def __init__(self, wiki_client, interval: float = 5.0):
+        self.wiki_client = wiki_client
+        self.interval = interval
+        self.topics: Dict[Tuple, _Topic] = {}
+        # socket -> {panel: topic key}
+        self.subscriptions: Dict = {}
+
+    @staticmethod
+    def normalize(panel: str, params: Dict) -> Dict:
+        _, accepted = PANELS[panel]
+        normalized = {}
+        for name in accepted:
+            value = params.get(name)
+            if value in (None, ""):
+                continue
+            if name == "limit":
+                value = int(value)
+            elif name == "anon_only":
+                value = value in (True, "true", "1", 1)
+            normalized[name] = value
+        return normalized
+
+    async def subscribe(self, websocket, panel: str, params: Dict):
+        """
+        (Re)subscribes `websocket` to `panel` and sends the current data right away.
+        """
+        if panel not in PANELS:
+            raise ValueError(f"Unknown panel: {panel}")
+        params = self.normalize(panel, params)
+        key = (panel, tuple(sorted(params.items())))
+
+        self.unsubscribe(websocket, panel)
+        topic = self.topics.get(key)
+        if topic is None:
+            topic = self.topics[key] = _Topic(panel, params)
+        topic.sockets.add(websocket)
+        self.subscriptions.setdefault(websocket, {})[panel] = key
+
+        if topic.message is not None:
+            await websocket.send_text(topic.message)
+        if topic.task is None:
+            topic.task = asyncio.create_task(self._run(key, topic))
+
+    def unsubscribe(self, websocket, panel: Optional[str] = None):
+        """
+        Removes one panel subscription, or all of them when `panel` is None.
+        """
+        panels = self.subscriptions.get(websocket, {})
+        for name in ([panel] if panel else list(panels)):
+            key = panels.pop(name, None)
+            topic = self.topics.get(key) if key else None
+            if topic is None:
+                continue
+            topic.sockets.discard(websocket)
+            if not topic.sockets:
+                if topic.task:
+                    topic.task.cancel()
+                del self.topics[key]
+        if not panels:
+            self.subscriptions.pop(websocket, None)
+
+    async def stop(self):
+        """
+        Cancels every topic task and drops all subscriptions.
+        """
+        tasks = [topic.task for topic in self.topics.values() if topic.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.topics = {}
+        self.subscriptions = {}
+
+    async def _run(self, key: Tuple, topic: _Topic):
+        method = getattr(self.wiki_client, PANELS[topic.panel][0])
+        last_result = None
+        while topic.sockets:
+            try:
+                results = await method(**topic.params)
+                # Cached methods return the same object until the entry is refreshed
+                if results is not last_result:
+                    last_result = results
+                    await self._publish(topic, results)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error updating panel {topic.panel}: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _publish(self, topic: _Topic, results):
+        message = fastjson.dumps({"panel": topic.panel, "params": topic.params, "results": results})
+        digest = hashlib.sha1(fastjson.dumps_bytes(results, sort_keys=True)).hexdigest()
+        if digest == topic.digest:
+            return
+        topic.digest = digest
+        topic.message = message
+
+        sockets = list(topic.sockets)
+        sent = await asyncio.gather(*(socket.send_text(message) for socket in sockets), return_exceptions=True)
+        for socket, outcome in zip(sockets, sent):
+            if isinstance(outcome, Exception):
+                self.unsubscribe(socket)
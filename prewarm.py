@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import random
+from typing import Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (WikiClient method, kwargs) combinations polled by the dashboard (static/app.js)
+DEFAULT_JOBS: List[Tuple[str, Dict]] = [
+    (method, {"limit": 25, "period": period})
+    for method in ("get_top_edited_articles", "get_top_editors", "get_top_talk_pages")
+    for period in ("24h", "7d")
+] + [
+    ("get_new_articles", {"limit": 25, "period": "24h"}),
+    ("get_new_articles", {"limit": 100, "period": "7d"}),
+]
+
+class CachePrewarmer:
+    """
+    Refreshes hot `async_cache` entries shortly before they expire, so
+    user-facing requests are served from a warm cache.
+    Each job runs on its own jittered schedule; a semaphore caps how many
+    refreshes hit the MediaWiki API at the same time.
+    """
+
+    def __init__(self, wiki_client, jobs: Optional[List[Tuple[str, Dict]]] = None, concurrency: int = 2, lead: float = 10.0, jitter: float = 5.0):
+        self.wiki_client = wiki_client
+        self.jobs = jobs if jobs is not None else DEFAULT_JOBS
+        self.lead = lead
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        # Created here so it binds to the running event loop
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        for name, kwargs in self.jobs:
+            self._tasks.append(asyncio.create_task(self._run_job(name, kwargs)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run_job(self, name: str, kwargs: Dict):
+        method = getattr(self.wiki_client, name)
+        # Refresh a little before the TTL runs out
+        interval = max(1.0, method.ttl - self.lead)
+
+        # Stagger the first run so jobs do not all fire together at startup
+        await asyncio.sleep(random.uniform(0, self.jitter))
+
+        while True:
+            async with self.semaphore:
+                try:
+                    await method.refresh(self.wiki_client, **kwargs)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error pre-warming {name}({kwargs}): {e}")
+
+            await asyncio.sleep(max(1.0, interval + random.uniform(-self.jitter, self.jitter)))
@@ -0,0 +1,201 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+import metrics
+import tracing
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Priority lanes, highest first: user-facing calls (e.g. a diff being opened),
+# ordinary dashboard queries, and background work (backfills, prefetching, indexing)
+INTERACTIVE = 0
+NORMAL = 1
+BULK = 2
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+UPSTREAM_REQUESTS = metrics.counter("edisco_upstream_requests_total", "Upstream HTTP requests (every attempt) by operation and status.", ("operation", "status"))
+UPSTREAM_DURATION = metrics.histogram("edisco_upstream_request_duration_seconds", "Upstream HTTP request duration per attempt.", ("operation",))
+UPSTREAM_WAIT = metrics.histogram("edisco_upstream_queue_wait_seconds", "Time spent waiting for a rate / concurrency slot.", ("operation",))
+UPSTREAM_RETRIES = metrics.counter("edisco_upstream_retries_total", "Upstream requests retried after throttling or transport errors.", ("operation",))
+
+def operation_name(url: str, params: Optional[Dict]) -> str:
+    """
+    Short label for an upstream call: the Action API list / prop / action it
+    uses (e.g. "recentchanges", "pageimages", "compare"), or "top_pageviews"
+    for the REST top-viewed endpoint.
+    """
+    if params:
+        if params.get("list"):
+            return str(params["list"]).split("|")[0]
+        if params.get("prop"):
+            return str(params["prop"]).split("|")[0]
+        if params.get("action") and params["action"] != "query":
+            return str(params["action"])
+    if "/metrics/pageviews/top/" in url:
+        return "top_pageviews"
+    return "other"
+
+class _Host:
+    """
+    Per-host limits: a token bucket for the request rate and a fixed number of
+    concurrent slots, granted to waiters in priority order.
+    """
+
+    def __init__(self, rate: float, burst: int, concurrency: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.concurrency = concurrency
+        self.active = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        # Set from Retry-After / maxlag; nobody starts a request before this (monotonic time)
+        self.paused_until = 0.0
+
+    async def acquire(self, priority: int, seq: int):
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiters, (priority, seq, future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just as we were cancelled
+                    self.release()
+                raise
+
+        try:
+            await self._take_token()
+        except asyncio.CancelledError:
+            self.release()
+            raise
+
+    def release(self):
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    async def _take_token(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class RequestGovernor:
+    """
+    Single gate for every MediaWiki / Wikimedia REST request made by WikiClient.
+    Per host it enforces a token-bucket rate and a concurrency cap whose free
+    slots go to the highest-priority lane first, so interactive calls overtake
+    queued background work. Action API requests carry `maxlag`; throttled
+    responses (429/5xx, maxlag errors) are retried with exponential backoff,
+    honoring Retry-After, and pause the whole host meanwhile.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, rate: float = 20.0, burst: int = 20, concurrency: int = 6, maxlag: Optional[int] = 5, max_retries: int = 4, backoff: float = 1.0, max_backoff: float = 60.0):
+        self.client = client
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.maxlag = maxlag
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hosts: Dict[str, _Host] = {}
+        self._seq = itertools.count()
+
+    def _host(self, url: str) -> _Host:
+        name = urlsplit(url).netloc
+        host = self.hosts.get(name)
+        if host is None:
+            host = self.hosts[name] = _Host(self.rate, self.burst, self.concurrency)
+        return host
+
+    def _retry_delay(self, response: Optional[httpx.Response], attempt: int) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def get(self, url: str, params: Optional[Dict] = None, priority: int = NORMAL) -> httpx.Response:
+        """
+        GETs `url` through the host's limits. Returns the last response once it
+        is not throttled or retries are exhausted; raises the last transport error.
+        """
+        if params is not None and self.maxlag is not None and "action" in params:
+            params = {**params, "maxlag": self.maxlag}
+
+        host = self._host(url)
+        seq = next(self._seq)
+        operation = operation_name(url, params)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            error = None
+            waited = time.perf_counter()
+            await host.acquire(priority, seq)
+            started = time.perf_counter()
+            UPSTREAM_WAIT.observe(started - waited, operation)
+            try:
+                response = await self.client.get(url, params=params)
+            except httpx.TransportError as e:
+                error = e
+            finally:
+                host.release()
+                ended = time.perf_counter()
+                UPSTREAM_DURATION.observe(ended - started, operation)
+            status = response.status_code if response is not None else "error"
+            UPSTREAM_REQUESTS.inc(operation, status)
+            tracing.record("upstream_wait", waited, started, operation=operation)
+            tracing.record(f"upstream.{operation}", started, ended, status=status, attempt=attempt, priority=priority)
+
+            # MediaWiki answers maxlag with HTTP 200, an error body and X-Database-Lag
+            throttled = response is not None and (response.status_code in RETRY_STATUSES or "X-Database-Lag" in response.headers)
+            if not throttled and error is None:
+                return response
+            if attempt == self.max_retries:
+                break
+
+            UPSTREAM_RETRIES.inc(operation)
+            delay = self._retry_delay(response, attempt)
+            if response is None:
+                reason = str(error)
+            elif "X-Database-Lag" in response.headers:
+                reason = f"maxlag, {response.headers['X-Database-Lag']}s lag"
+            else:
+                reason = f"HTTP {response.status_code}"
+            logger.warning(f"Request to {urlsplit(url).netloc} throttled ({reason}), retrying in {delay:.1f}s")
+            if response is not None:
+                host.pause(delay)
+            await asyncio.sleep(delay)
+
+        if error is not None:
+            raise error
+        return response
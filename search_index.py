@@ -0,0 +1,296 @@
+import asyncio
+import html
+import logging
+import re
+import time
+from array import array
+from typing import Dict, List, Optional, Set
+
+import fastjson
+from edit_store import EditRecord
+from request_governor import BULK
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ADDED = 1
+REMOVED = 2
+
+ROW_RE = re.compile(r'<tr[^>]*>(.*?)</tr>', re.S)
+ADDED_CELL_RE = re.compile(r'<td class="diff-addedline[^"]*"[^>]*>(.*?)</td>', re.S)
+DELETED_CELL_RE = re.compile(r'<td class="diff-deletedline[^"]*"[^>]*>(.*?)</td>', re.S)
+TAG_RE = re.compile(r'<[^>]+>')
+TOKEN_RE = re.compile(r'\w+')
+
+# Hebrew one-letter prefixes (and, the, in, to, from, that, as) written attached to the word
+HEBREW_PREFIXES = "והבלמשכ"
+MAX_PREFIXES = 3
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def index_terms(token: str) -> List[str]:
+    """
+    The token plus its forms with up to MAX_PREFIXES leading Hebrew prefix
+    letters removed ("והבית" -> "הבית", "בית"), keeping at least two letters,
+    so a search for a bare word also finds its prefixed forms.
+    """
+    terms = [token]
+    for i in range(min(MAX_PREFIXES, len(token) - 2)):
+        if token[i] not in HEBREW_PREFIXES:
+            break
+        terms.append(token[i + 1:])
+    return terms
+
+def _cell_tokens(cell_html: str) -> Set[str]:
+    return set(tokenize(html.unescape(TAG_RE.sub(" ", cell_html))))
+
+def extract_diff_tokens(diff_html: str) -> Dict[str, int]:
+    """
+    Extracts added / removed tokens from MediaWiki diff table HTML.
+    For a changed line (deleted and added cell in the same row) only the tokens
+    that differ count; unchanged context words are ignored.
+    Returns index term (see index_terms) -> ADDED | REMOVED flags.
+    """
+    flags: Dict[str, int] = {}
+    for row in ROW_RE.findall(diff_html):
+        added = set()
+        removed = set()
+        for cell in ADDED_CELL_RE.findall(row):
+            added |= _cell_tokens(cell)
+        for cell in DELETED_CELL_RE.findall(row):
+            removed |= _cell_tokens(cell)
+        if added and removed:
+            added, removed = added - removed, removed - added
+        for token in added:
+            for term in index_terms(token):
+                flags[term] = flags.get(term, 0) | ADDED
+        for token in removed:
+            for term in index_terms(token):
+                flags[term] = flags.get(term, 0) | REMOVED
+    return flags
+
+class DiffSearchIndex:
+    """
+    Token-level inverted index over the text added and removed by each revision
+    in the retention window (main namespace edits). Words are also indexed
+    without their Hebrew prefixes, so lookups stay exact.
+    New revisions are submitted by EditStore; a worker fetches their diffs in
+    batches of 50, extracts the changed tokens once and appends postings.
+    History already in the store is indexed once in the background, newest first.
+
+    Postings are `array('q')` of (revid << 2 | flags); revisions that leave the
+    window are dropped from `revs` and purged from the postings lazily by `compact()`.
+    """
+    CHUNK_SIZE = 50
+
+    def __init__(self, wiki_client, edit_store, retention: int = 7 * 24 * 3600, queue_size: int = 5000):
+        self.wiki_client = wiki_client
+        self.edit_store = edit_store
+        self.retention = retention
+        self.queue_size = queue_size
+        self.postings: Dict[str, array] = {}
+        # revid -> EditRecord for every indexed revision in the window
+        self.revs: Dict[int, EditRecord] = {}
+        # Every edit at or after this epoch has been indexed (None until live ingestion starts)
+        self.covered_since: Optional[int] = None
+        # Edits before this epoch may have been dropped (queue overflow, failed batch);
+        # coverage never extends below it
+        self.gap_floor = 0
+        self.live_since: Optional[int] = None
+        self.dead = 0
+        self._last_evict = 0
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        # Created here so it binds to the running event loop
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.live_since = int(time.time())
+        self.covered_since = self.live_since
+        self._tasks.append(asyncio.create_task(self._live_worker()))
+        self._tasks.append(asyncio.create_task(self._backfill()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def covers(self, since: int) -> bool:
+        return self.covered_since is not None and since >= self.covered_since
+
+    def _mark_gap(self, epoch: int):
+        """
+        Records that an edit at `epoch` was not indexed: only newer edits are covered.
+        """
+        self.gap_floor = max(self.gap_floor, epoch + 1)
+        self.covered_since = max(self.covered_since, self.gap_floor)
+
+    def _extend_coverage(self, epoch: int):
+        self.covered_since = max(min(self.covered_since, epoch), self.gap_floor)
+
+    def submit(self, edit: EditRecord):
+        """
+        EditStore listener: queues a new main-namespace revision for indexing.
+        """
+        if self.queue is None or edit.ns != 0 or edit.type != "edit" or not edit.revid:
+            return
+        try:
+            self.queue.put_nowait(edit)
+        except asyncio.QueueFull:
+            # Coverage is no longer contiguous; only newer edits can be served
+            logger.warning("Search index queue full, dropping revision")
+            self._mark_gap(edit.epoch)
+
+    async def _live_worker(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.CHUNK_SIZE and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self._index_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error indexing live revisions: {e}")
+                self._mark_gap(max(edit.epoch for edit in batch))
+
+    async def _backfill(self):
+        """
+        Indexes the store's history newest-first, extending coverage backwards.
+        """
+        while not self.edit_store.ready:
+            await asyncio.sleep(5)
+
+        history = [
+            edit for edit in reversed(self.edit_store.edits)
+            if edit.epoch < self.live_since and edit.ns == 0 and edit.type == "edit" and edit.revid
+        ]
+        for i in range(0, len(history), self.CHUNK_SIZE):
+            batch = history[i:i + self.CHUNK_SIZE]
+            try:
+                await self._index_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error indexing historical revisions: {e}")
+                return
+            self._extend_coverage(batch[-1].epoch)
+
+        self._extend_coverage(self.edit_store.covered_since)
+        logger.info(f"Search index backfilled {len(history)} revisions ({len(self.revs)} indexed)")
+
+    async def _index_batch(self, batch: List[EditRecord]):
+        by_revid = {edit.revid: edit for edit in batch}
+        params = {
+            "action": "query",
+            "prop": "revisions",
+            "rvdiffto": "prev",
+            "revids": "|".join(map(str, by_revid.keys())),
+            "format": "json"
+        }
+        response = await self.wiki_client._api_get(params, priority=BULK)
+        data = fastjson.loads(response.content)
+
+        for page_data in data.get("query", {}).get("pages", {}).values():
+            for rev in page_data.get("revisions", []):
+                revid = rev.get("revid")
+                if revid not in by_revid:
+                    continue
+                diff = rev.get("diff", {})
+                diff_html = diff.get("*")
+                if diff_html is None and "notcached" in diff:
+                    # The API only renders a few uncached diffs per request; fetched
+                    # directly so indexing neither evicts user-opened diffs nor counts as diff views
+                    diff_html = await self.wiki_client._fetch_diff(revid, priority=BULK, cache=False)
+                if diff_html:
+                    self.add(by_revid[revid], extract_diff_tokens(diff_html))
+
+        self.evict()
+
+    def add(self, edit: EditRecord, token_flags: Dict[str, int]):
+        revid = edit.revid
+        if revid in self.revs:
+            return
+        self.revs[revid] = edit
+        for token, flags in token_flags.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = array("q")
+            postings.append(revid << 2 | flags)
+
+    def evict(self, now: Optional[int] = None):
+        if now is None:
+            now = int(time.time())
+        cutoff = now - self.retention
+        if now - self._last_evict < 60:
+            return
+        self._last_evict = now
+
+        expired = [revid for revid, edit in self.revs.items() if edit.epoch < cutoff]
+        for revid in expired:
+            del self.revs[revid]
+        self.dead += len(expired)
+
+        # Purge dead postings once they make up a good part of the index
+        if self.dead > max(1000, len(self.revs)):
+            self.compact()
+
+    def compact(self):
+        revs = self.revs
+        for token in list(self.postings):
+            kept = array("q", (p for p in self.postings[token] if (p >> 2) in revs))
+            if kept:
+                self.postings[token] = kept
+            else:
+                del self.postings[token]
+        self.dead = 0
+
+    def search(self, query: str, since: Optional[int] = None, limit: int = 500) -> List[Dict]:
+        """
+        Returns edits (newest first) whose added or removed text contains every
+        word of `query`, with "status" set to "added", "removed" or "unknown".
+        Matching is on whole words, case-insensitively; a word also matches its
+        forms with Hebrew prefixes attached ("בית" finds "והבית").
+        """
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+
+        # Intersect posting lists, rarest token first; flags are AND-ed across tokens
+        matches: Optional[Dict[int, int]] = None # revid -> flags
+        for token in sorted(tokens, key=lambda t: len(self.postings.get(t, ()))):
+            token_flags: Dict[int, int] = {}
+            for posting in self.postings.get(token, ()):
+                revid = posting >> 2
+                if revid in self.revs and (matches is None or revid in matches):
+                    token_flags[revid] = token_flags.get(revid, 0) | (posting & 3)
+            if matches is not None:
+                token_flags = {revid: matches[revid] & flags for revid, flags in token_flags.items()}
+            matches = token_flags
+            if not matches:
+                return []
+
+        hits = []
+        for revid, flags in matches.items():
+            edit = self.revs[revid]
+            if since is not None and edit.epoch < since:
+                continue
+            hits.append((edit.epoch, revid, flags, edit))
+        hits.sort(key=lambda x: (x[0], x[1]), reverse=True)
+
+        results = []
+        for _, _, flags, edit in hits[:limit]:
+            result = edit.to_row()
+            if flags & ADDED:
+                result["status"] = "added"
+            elif flags & REMOVED:
+                result["status"] = "removed"
+            else:
+                result["status"] = "unknown"
+            results.append(result)
+        return results
@@ -27,6 +27,7 @@ const refreshAll = () => {
     const period = globalPeriodSelect.value;
 
     fetchRecentEdits(limit, period);
+    updateLiveFilters();
     updateTopSection();
     fetchNewArticles();
     fetchTopViewedArticles();
@@ -107,11 +108,36 @@ function showError(message) {
 const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
 const wsUrl = `${protocol}//${window.location.host}/ws/live`;
 let socket;
+const panelsUrl = `${protocol}//${window.location.host}/ws/panels`;
+let panelSocket;
+const panelParams = {}; // panel -> last subscribed params (JSON)
+
+// Live feed filters are applied on the server; changing them reconnects the feed
+function liveFeedUrl() {
+    // Batched mode: at most one frame (a JSON array of edits) per 250ms
+    const params = new URLSearchParams({ batch_ms: '250' });
+    if (anonOnlyToggle.checked) params.set('anon_only', 'true');
+    const filterValue = userFilterInput.value.trim();
+    if (filterValue) {
+        params.set(filterMode === 'article' ? 'title' : 'user', filterValue);
+    }
+    return `${wsUrl}?${params.toString()}`;
+}
+
+function updateLiveFilters() {
+    if (!socket || socket.feedUrl === liveFeedUrl()) return;
+    const previous = socket;
+    connectWebSocket();
+    previous.close();
+}
 
 function connectWebSocket() {
-    socket = new WebSocket(wsUrl);
+    const feedUrl = liveFeedUrl();
+    const ws = new WebSocket(feedUrl);
+    ws.feedUrl = feedUrl;
+    socket = ws;
 
-    socket.onopen = () => {
+    ws.onopen = () => {
         console.log('Connected to live feed');
         document.querySelector('.live-indicator').classList.remove('offline');
         // Clear empty state if it exists
@@ -119,7 +145,7 @@ function connectWebSocket() {
         if (emptyState) emptyState.remove();
     };
 
-    socket.onmessage = (event) => {
+    ws.onmessage = (event) => {
         // Parse current control value to check if we are in live mode
         const controlValue = feedControl.value; // e.g., "live_25", "pos_50"
         const isLive = controlValue.startsWith('live_');
@@ -127,17 +153,20 @@ function connectWebSocket() {
         if (!isLive) return;
 
         const data = JSON.parse(event.data);
-        addEditToFeed(data);
+        addEditsToFeed(Array.isArray(data) ? data : [data]);
     };
 
-    socket.onclose = () => {
+    ws.onclose = () => {
+        // Replaced by a connection with new filters
+        if (ws !== socket) return;
         console.log('Disconnected from live feed, retrying in 5s...');
         document.querySelector('.live-indicator').classList.add('offline');
         showError('החיבור לשרת נותק. מנסה להתחבר מחדש...');
         setTimeout(connectWebSocket, 5000);
     };
 
-    socket.onerror = (error) => {
+    ws.onerror = (error) => {
+        if (ws !== socket) return;
         console.error('WebSocket error:', error);
         document.querySelector('.live-indicator').classList.add('offline');
         // WebSocket errors are often silent for security, but we can infer connection issues
@@ -145,17 +174,22 @@ function connectWebSocket() {
     };
 }
 
-function addEditToFeed(edit) {
-    // Deduplicate: Check if we already have this edit
-    const rcid = edit.rcid || edit.id;
-    if (rcid) {
-        const existing = document.querySelector(`.edit-card[data-rcid="${rcid}"]`);
-        if (existing) return;
+function addEditsToFeed(edits) {
+    // Edits arrive oldest first; build one fragment (newest on top) so a batch costs a single reflow
+    const fragment = document.createDocumentFragment();
+    for (let i = edits.length - 1; i >= 0; i--) {
+        const edit = edits[i];
+        // Deduplicate: Check if we already have this edit
+        const rcid = edit.rcid || edit.id;
+        if (rcid) {
+            const existing = document.querySelector(`.edit-card[data-rcid="${rcid}"]`);
+            if (existing) continue;
+        }
+        fragment.appendChild(createEditCard(edit));
     }
 
-    const card = createEditCard(edit);
-
-    feedList.insertBefore(card, feedList.firstChild);
+    if (!fragment.firstChild) return;
+    feedList.insertBefore(fragment, feedList.firstChild);
 
     // Limit feed based on selection (if not custom)
     const parts = feedControl.value.split('_');
@@ -416,10 +450,11 @@ topViewedPeriodSelect.addEventListener('change', () => {
 
 // Top Viewed Articles Logic
 async function fetchTopViewedArticles() {
+    subscribePanel('top-viewed');
     const period = topViewedPeriodSelect.value;
     topViewedList.innerHTML = '<div class="empty-state">טוען...</div>';
     try {
-        let url = `/api/top-viewed?limit=25&period=${period}&_t=${Date.now()}`;
+        let url = `/api/top-viewed?limit=25&period=${period}`;
         if (userFilterInput.value.trim()) {
             if (filterMode === 'article') {
                 url += `&title=${encodeURIComponent(userFilterInput.value.trim())}`;
@@ -430,20 +465,7 @@ async function fetchTopViewedArticles() {
         const response = await fetch(url);
         if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
         const data = await response.json();
-
-        if (data.results.length === 0) {
-            topViewedList.innerHTML = '<div class="empty-state">אין נתונים.</div>';
-            return;
-        }
-
-        const fragment = document.createDocumentFragment();
-        data.results.forEach((article) => {
-            const card = createTopViewedCard(article);
-            fragment.appendChild(card);
-        });
-
-        topViewedList.innerHTML = '';
-        topViewedList.appendChild(fragment);
+        renderTopViewedArticles(data.results);
 
     } catch (error) {
         console.error('Error fetching top viewed articles:', error);
@@ -452,11 +474,21 @@ async function fetchTopViewedArticles() {
     }
 }
 
-// Initial load
-fetchTopViewedArticles();
+function renderTopViewedArticles(results) {
+    if (results.length === 0) {
+        topViewedList.innerHTML = '<div class="empty-state">אין נתונים.</div>';
+        return;
+    }
 
-// Refresh every 10 minutes
-setInterval(fetchTopViewedArticles, 600000);
+    const fragment = document.createDocumentFragment();
+    results.forEach((article) => {
+        const card = createTopViewedCard(article);
+        fragment.appendChild(card);
+    });
+
+    topViewedList.innerHTML = '';
+    topViewedList.appendChild(fragment);
+}
 
 function createTopViewedCard(article) {
     const div = document.createElement('div');
@@ -488,8 +520,10 @@ function createTopViewedCard(article) {
 // Initial load
 fetchTopViewedArticles();
 
-// Refresh every 10 minutes
-setInterval(fetchTopViewedArticles, 600000);
+// Fallback polling every 10 minutes while the panel socket is down
+setInterval(() => {
+    if (!panelsConnected()) fetchTopViewedArticles();
+}, 600000);
 
 // Auto Refresh Logic
 let autoRefreshInterval;
@@ -546,12 +580,13 @@ async function updateTopSection() {
 }
 
 async function fetchTopEdited() {
+    subscribePanel('top-edited');
     const topList = document.getElementById('topEditedList');
     const period = document.getElementById('topPeriod').value;
     topList.innerHTML = '<div class="empty-state">טוען...</div>';
 
     try {
-        let url = `/api/top-edited?limit=25&period=${period}&anon_only=${anonOnlyToggle.checked}`;
+        let url = `/api/top-edited?limit=25&period=${period}&sort=${topEditedSortMode}&anon_only=${anonOnlyToggle.checked}`;
         if (userFilterInput.value.trim()) {
             if (filterMode === 'article') {
                 url += `&title=${encodeURIComponent(userFilterInput.value.trim())}`;
@@ -561,21 +596,7 @@ async function fetchTopEdited() {
         }
         const response = await fetch(url);
         const data = await response.json();
-
-        if (data.results.length === 0) {
-            topList.innerHTML = '<div class="empty-state">אין נתונים.</div>';
-            return;
-        }
-
-        // Optimization: Use DocumentFragment
-        const fragment = document.createDocumentFragment();
-        data.results.forEach((article, index) => {
-            const card = createTopArticleCard(article, index + 1);
-            fragment.appendChild(card);
-        });
-
-        topList.innerHTML = '';
-        topList.appendChild(fragment);
+        renderTopEdited(data.results);
 
     } catch (error) {
         console.error('Error fetching top edited:', error);
@@ -583,6 +604,24 @@ async function fetchTopEdited() {
     }
 }
 
+function renderTopEdited(results) {
+    const topList = document.getElementById('topEditedList');
+    if (results.length === 0) {
+        topList.innerHTML = '<div class="empty-state">אין נתונים.</div>';
+        return;
+    }
+
+    // Optimization: Use DocumentFragment
+    const fragment = document.createDocumentFragment();
+    results.forEach((article, index) => {
+        const card = createTopArticleCard(article, index + 1);
+        fragment.appendChild(card);
+    });
+
+    topList.innerHTML = '';
+    topList.appendChild(fragment);
+}
+
 async function fetchTopEditors() {
     const topList = document.getElementById('topEditedList');
     const period = document.getElementById('topPeriod').value;
@@ -704,8 +743,10 @@ fetchRecentEdits(50);
 fetchTopEdited();
 startAutoRefresh();
 
-// Refresh top edited every 30 seconds
-setInterval(updateTopSection, 30000);
+// Fallback polling for top edited every 30 seconds while the panel socket is down
+setInterval(() => {
+    if (!panelsConnected()) updateTopSection();
+}, 30000);
 
 // Top Talk Pages Logic
 const topTalkList = document.getElementById('topTalkList');
@@ -731,6 +772,7 @@ topTalkSortBtn.addEventListener('click', () => {
 });
 
 async function fetchTopTalkPages() {
+    subscribePanel('talk-pages');
     const period = topTalkPeriodSelect.value;
     const sort = topTalkSortMode;
     topTalkList.innerHTML = '<div class="empty-state">טוען...</div>';
@@ -746,20 +788,7 @@ async function fetchTopTalkPages() {
         }
         const response = await fetch(url);
         const data = await response.json();
-
-        if (data.results.length === 0) {
-            topTalkList.innerHTML = '<div class="empty-state">אין נתונים.</div>';
-            return;
-        }
-
-        const fragment = document.createDocumentFragment();
-        data.results.forEach((article, index) => {
-            const card = createTopTalkCard(article, index + 1);
-            fragment.appendChild(card);
-        });
-
-        topTalkList.innerHTML = '';
-        topTalkList.appendChild(fragment);
+        renderTopTalkPages(data.results);
 
     } catch (error) {
         console.error('Error fetching top talk pages:', error);
@@ -767,6 +796,22 @@ async function fetchTopTalkPages() {
     }
 }
 
+function renderTopTalkPages(results) {
+    if (results.length === 0) {
+        topTalkList.innerHTML = '<div class="empty-state">אין נתונים.</div>';
+        return;
+    }
+
+    const fragment = document.createDocumentFragment();
+    results.forEach((article, index) => {
+        const card = createTopTalkCard(article, index + 1);
+        fragment.appendChild(card);
+    });
+
+    topTalkList.innerHTML = '';
+    topTalkList.appendChild(fragment);
+}
+
 function createTopTalkCard(article, rank) {
     const div = document.createElement('div');
     div.className = 'edit-card';
@@ -848,8 +893,10 @@ function createTopTalkCard(article, rank) {
 // Initial load
 fetchTopTalkPages();
 
-// Refresh every 60 seconds
-setInterval(fetchTopTalkPages, 60000);
+// Fallback polling every 60 seconds while the panel socket is down
+setInterval(() => {
+    if (!panelsConnected()) fetchTopTalkPages();
+}, 60000);
 
 // New Articles Logic
 const newArticlesList = document.getElementById('newArticlesList');
@@ -860,6 +907,7 @@ newPeriodSelect.addEventListener('change', () => {
 });
 
 async function fetchNewArticles() {
+    subscribePanel('new-articles');
     const period = newPeriodSelect.value;
     newArticlesList.innerHTML = '<div class="empty-state">טוען...</div>';
     const limit = period === '7d' ? 100 : 25;
@@ -875,20 +923,7 @@ async function fetchNewArticles() {
         }
         const response = await fetch(url);
         const data = await response.json();
-
-        if (data.results.length === 0) {
-            newArticlesList.innerHTML = '<div class="empty-state">אין נתונים.</div>';
-            return;
-        }
-
-        const fragment = document.createDocumentFragment();
-        data.results.forEach((article) => {
-            const card = createNewArticleCard(article);
-            fragment.appendChild(card);
-        });
-
-        newArticlesList.innerHTML = '';
-        newArticlesList.appendChild(fragment);
+        renderNewArticles(data.results);
 
     } catch (error) {
         console.error('Error fetching new articles:', error);
@@ -896,6 +931,22 @@ async function fetchNewArticles() {
     }
 }
 
+function renderNewArticles(results) {
+    if (results.length === 0) {
+        newArticlesList.innerHTML = '<div class="empty-state">אין נתונים.</div>';
+        return;
+    }
+
+    const fragment = document.createDocumentFragment();
+    results.forEach((article) => {
+        const card = createNewArticleCard(article);
+        fragment.appendChild(card);
+    });
+
+    newArticlesList.innerHTML = '';
+    newArticlesList.appendChild(fragment);
+}
+
 function createNewArticleCard(article) {
     const div = document.createElement('div');
     div.className = 'edit-card';
@@ -931,5 +982,70 @@ function createNewArticleCard(article) {
 // Initial load for new articles
 fetchNewArticles();
 
-// Refresh new articles every 60 seconds
-setInterval(fetchNewArticles, 60000);
+// Fallback polling for new articles every 60 seconds while the panel socket is down
+setInterval(() => {
+    if (!panelsConnected()) fetchNewArticles();
+}, 60000);
+
+// Panel Subscriptions
+// The server pushes panel data over /ws/panels only when it changes,
+// so open tabs no longer poll the REST endpoints.
+const panelRenderers = {
+    'top-edited': renderTopEdited,
+    'talk-pages': renderTopTalkPages,
+    'new-articles': renderNewArticles,
+    'top-viewed': renderTopViewedArticles,
+};
+
+function panelsConnected() {
+    return panelSocket && panelSocket.readyState === WebSocket.OPEN;
+}
+
+function currentPanelParams(panel) {
+    const params = {};
+    const filterValue = userFilterInput.value.trim();
+    if (filterValue) {
+        params[filterMode === 'article' ? 'title' : 'user'] = filterValue;
+    }
+
+    if (panel === 'top-edited') {
+        return { ...params, limit: 25, period: topPeriodSelect.value, sort: topEditedSortMode, anon_only: anonOnlyToggle.checked };
+    } else if (panel === 'talk-pages') {
+        return { ...params, limit: 25, period: topTalkPeriodSelect.value, sort: topTalkSortMode, anon_only: anonOnlyToggle.checked };
+    } else if (panel === 'new-articles') {
+        const period = newPeriodSelect.value;
+        return { ...params, limit: period === '7d' ? 100 : 25, period, anon_only: anonOnlyToggle.checked };
+    }
+    return { ...params, limit: 25, period: topViewedPeriodSelect.value };
+}
+
+function subscribePanel(panel, force = false) {
+    if (!panelsConnected()) return;
+    const params = currentPanelParams(panel);
+    const key = JSON.stringify(params);
+    // Only resubscribe when the panel's parameters actually changed
+    if (!force && panelParams[panel] === key) return;
+    panelParams[panel] = key;
+    panelSocket.send(JSON.stringify({ action: 'subscribe', panel, params }));
+}
+
+function connectPanelSocket() {
+    panelSocket = new WebSocket(panelsUrl);
+
+    panelSocket.onopen = () => {
+        Object.keys(panelRenderers).forEach(panel => subscribePanel(panel, true));
+    };
+
+    panelSocket.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        const render = panelRenderers[data.panel];
+        if (render && data.results) render(data.results);
+    };
+
+    panelSocket.onclose = () => {
+        // Polling takes over until we reconnect
+        setTimeout(connectPanelSocket, 5000);
+    };
+}
+
+connectPanelSocket();
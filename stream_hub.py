@@ -0,0 +1,300 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Mapping, Optional, Set, Union
+
+import fastjson
+import metrics
+from edit_store import EditRecord
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Slow-consumer policies for a full subscriber queue
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+POLICIES = (DROP_OLDEST, DISCONNECT)
+
+# Live feed wire formats: compact JSON (default), compact MessagePack, or the full EventStreams payload
+JSON = "json"
+MSGPACK = "msgpack"
+RAW = "raw"
+FORMATS = (JSON, MSGPACK, RAW)
+
+LIVE_PUBLISHED = metrics.counter("edisco_live_events_published_total", "Events fanned out to live subscribers (counted once per event).")
+LIVE_DROPPED = metrics.counter("edisco_live_dropped_events_total", "Events dropped from slow live subscribers' queues, by policy.", ("policy",))
+STREAM_RECONNECTS = metrics.counter("edisco_stream_reconnects_total", "Reconnections to the upstream EventStreams feed, by reason (ended, error).", ("reason",))
+
+def resolve_format(name: Optional[str]) -> str:
+    """
+    Validates a requested wire format; MessagePack falls back to JSON when
+    the optional `msgpack` package is not installed.
+    """
+    name = name or JSON
+    if name not in FORMATS:
+        raise ValueError(f"Unknown live feed format: {name}")
+    if name == MSGPACK and msgpack is None:
+        logger.warning("msgpack is not installed, sending JSON instead")
+        return JSON
+    return name
+
+def compact_event(event: Dict) -> Dict:
+    """
+    Projects an EventStreams event onto the live feed's compact schema:
+    the `list=recentchanges` fields the dashboard reads, with an epoch timestamp.
+    Built from the same EditRecord the EditStore holds, so both agree on every field.
+    """
+    record = EditRecord.from_stream_event(event)
+    edit = record.to_row()
+    edit["timestamp"] = record.epoch
+    return edit
+
+class LiveEvent:
+    """
+    One event as handed to live subscribers. It is projected once on publish
+    and encoded at most once per wire format, however many subscribers receive it.
+    """
+    __slots__ = ("raw", "data", "_encoded")
+
+    def __init__(self, raw: Dict):
+        self.raw = raw
+        self.data = compact_event(raw)
+        self._encoded: Dict[str, Union[str, bytes]] = {}
+
+    def encode(self, fmt: str) -> Union[str, bytes]:
+        encoded = self._encoded.get(fmt)
+        if encoded is None:
+            if fmt == MSGPACK:
+                encoded = msgpack.packb(self.data)
+            else:
+                encoded = fastjson.dumps(self.raw if fmt == RAW else self.data)
+            self._encoded[fmt] = encoded
+        return encoded
+
+def encode_frame(events: List[LiveEvent], fmt: str) -> Union[str, bytes]:
+    """
+    Joins already-encoded events into one batched frame (an array) without re-encoding them.
+    """
+    if fmt == MSGPACK:
+        return msgpack.Packer().pack_array_header(len(events)) + b"".join(event.encode(fmt) for event in events)
+    return "[" + ",".join(event.encode(fmt) for event in events) + "]"
+
+class LiveFilter:
+    """
+    Server-side filter a live subscriber declares when it connects.
+    Mirrors the REST filters: namespaces, anonymous users only, exact user / title.
+    """
+
+    def __init__(self, namespaces: Optional[Set[int]] = None, anon_only: bool = False, user: Optional[str] = None, title: Optional[str] = None):
+        self.namespaces = namespaces
+        self.anon_only = anon_only
+        self.user = user
+        self.title = title
+
+    @classmethod
+    def from_params(cls, params: Mapping[str, str]) -> "LiveFilter":
+        """
+        Builds a filter from query parameters (`namespace=0|1`, `anon_only=true`, `user`, `title`).
+        Raises ValueError on a malformed namespace.
+        """
+        namespaces = None
+        if params.get("namespace"):
+            namespaces = {int(ns) for ns in params["namespace"].replace(",", "|").split("|") if ns != ""}
+        return cls(
+            namespaces=namespaces,
+            anon_only=params.get("anon_only", "").lower() in ("1", "true"),
+            user=params.get("user") or None,
+            title=params.get("title") or None,
+        )
+
+    def matches(self, edit: Dict) -> bool:
+        """
+        Matches a compact (recentchanges-shaped) event.
+        """
+        if self.namespaces is not None and edit.get("ns") not in self.namespaces:
+            return False
+        if self.anon_only and "anon" not in edit:
+            return False
+        if self.user and edit.get("user") != self.user:
+            return False
+        if self.title and edit.get("title") != self.title:
+            return False
+        return True
+
+class Subscription:
+    """
+    One live subscriber: its filter and a bounded queue.
+    When the queue is full, `drop_oldest` discards the oldest pending event;
+    `disconnect` drops everything pending and tells the consumer to go away
+    (`get()` returns None), so a stalled client can never grow memory.
+    """
+
+    def __init__(self, queue_size: int, live_filter: Optional[LiveFilter] = None, policy: str = DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.filter = live_filter
+        self.policy = policy
+        self.dropped = 0
+        self.overflowed = False
+
+    def offer(self, event: LiveEvent):
+        if self.overflowed or (self.filter and not self.filter.matches(event.data)):
+            return
+        if self.queue.full():
+            if self.policy == DISCONNECT:
+                self.dropped += self.queue.qsize()
+                LIVE_DROPPED.inc(DISCONNECT, amount=self.queue.qsize())
+                self.overflowed = True
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                # Wake the consumer so it can close the connection
+                self.queue.put_nowait(None)
+                return
+            self.queue.get_nowait()
+            self.dropped += 1
+            LIVE_DROPPED.inc(DROP_OLDEST)
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Optional[LiveEvent]:
+        """
+        Next matching event, or None once the subscriber has been cut off.
+        """
+        return await self.queue.get()
+
+    async def get_batch(self, max_events: int, max_wait: float) -> Optional[List[LiveEvent]]:
+        """
+        Waits for the next event, then keeps collecting until `max_events` are
+        pending or `max_wait` seconds have passed, whichever comes first.
+        Returns None once the subscriber has been cut off.
+        """
+        first = await self.queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait
+        while len(batch) < max_events:
+            if self.queue.empty():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                event = self.queue.get_nowait()
+            if event is None:
+                # Deliver what we have; the next call reports the cut-off
+                self.queue.put_nowait(None)
+                break
+            batch.append(event)
+        return batch
+
+class StreamHub:
+    """
+    Keeps a single upstream EventStreams subscription and fans every
+    Hebrew Wikipedia edit out to any number of subscribers.
+    Each event is decoded and filtered once (in WikiClient.get_recent_edits_stream)
+    and then handed to per-client queues, so slow clients never touch the upstream read.
+    Listeners (e.g. EditStore) receive every Hebrew Wikipedia event; WebSocket
+    subscribers only receive events of `client_types` that match their own filter.
+    """
+
+    def __init__(self, wiki_client, queue_size: int = 500, reconnect_delay: float = 5.0, client_types: tuple = ("edit",), policy: str = DROP_OLDEST):
+        self.wiki_client = wiki_client
+        self.client_types = client_types
+        self.policy = policy
+        self.listeners: List[Callable[[Dict], None]] = []
+        self.queue_size = queue_size
+        self.reconnect_delay = reconnect_delay
+        self.subscribers: Set[Subscription] = set()
+        self.last_timestamp: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """
+        Starts the upstream reader task (idempotent).
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe(self, live_filter: Optional[LiveFilter] = None, policy: Optional[str] = None) -> Subscription:
+        """
+        Registers a new subscriber and returns its Subscription.
+        `policy` overrides the hub's slow-consumer policy for this subscriber.
+        """
+        subscription = Subscription(self.queue_size, live_filter, policy or self.policy)
+        self.subscribers.add(subscription)
+        logger.info(f"Live subscriber added ({len(self.subscribers)} connected)")
+        return subscription
+
+    def add_listener(self, listener: Callable[[Dict], None]):
+        """
+        Registers a synchronous callback that sees every upstream event.
+        """
+        self.listeners.append(listener)
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+        if subscription.dropped:
+            logger.warning(f"Live subscriber dropped {subscription.dropped} events while too slow")
+        logger.info(f"Live subscriber removed ({len(self.subscribers)} connected)")
+
+    def publish(self, edit: Dict):
+        """
+        Hands one event to every matching subscriber queue without awaiting.
+        A full queue applies its subscriber's policy instead of blocking the upstream reader.
+        """
+        for listener in self.listeners:
+            try:
+                listener(edit)
+            except Exception as e:
+                logger.error(f"Stream listener error: {e}")
+
+        if edit.get("type") not in self.client_types or not self.subscribers:
+            return
+
+        LIVE_PUBLISHED.inc()
+        event = LiveEvent(edit)
+        for subscription in list(self.subscribers):
+            subscription.offer(event)
+
+    async def _run(self):
+        while True:
+            try:
+                # Resume from the last event we saw so a reconnect does not leave a gap
+                since = None
+                if self.last_timestamp:
+                    since = datetime.fromtimestamp(self.last_timestamp, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+                async for edit in self.wiki_client.get_recent_edits_stream(since=since, types=None):
+                    if edit.get("timestamp"):
+                        self.last_timestamp = edit["timestamp"]
+                    self.publish(edit)
+
+                logger.warning("Upstream stream ended, reconnecting...")
+                STREAM_RECONNECTS.inc("ended")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Upstream stream error: {e}")
+                STREAM_RECONNECTS.inc("error")
+
+            await asyncio.sleep(self.reconnect_delay)
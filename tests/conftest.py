@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import pytest
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from edit_store import format_timestamp, parse_timestamp
+
+class FakeResponse:
+    def __init__(self, data, status_code: int = 200, headers: Optional[Dict] = None):
+        self.content = json.dumps(data).encode()
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+class FakeRecentChanges:
+    """
+    Stand-in for WikiClient._api_get serving `list=recentchanges` from a fixed
+    list of edits (rcstart / rcend / rclimit / rccontinue / rcnamespace), and
+    counting calls.
+    """
+
+    def __init__(self, epochs: List[int], namespace: int = 0):
+        # Newest first, like the API
+        self.rows = [
+            {"type": "edit", "ns": namespace, "title": f"Page {i % 50}", "rcid": i + 1, "revid": i + 1,
+             "old_revid": i, "user": f"User {i % 7}", "timestamp": format_timestamp(epoch), "comment": "", "oldlen": 0, "newlen": 1}
+            for i, epoch in enumerate(sorted(epochs, reverse=True))
+        ]
+        self.epochs = [parse_timestamp(row["timestamp"]) for row in self.rows]
+        self.calls = []
+        self.fail = None # callable(params) -> bool
+
+    async def __call__(self, params: Optional[Dict] = None, url: Optional[str] = None, priority: int = None):
+        self.calls.append(dict(params or {}))
+        if self.fail and self.fail(params):
+            raise RuntimeError("upstream failure")
+        newer = parse_timestamp(params["rcstart"]) if "rcstart" in params else None
+        older = parse_timestamp(params["rcend"]) if "rcend" in params else None
+        namespace = int(params.get("rcnamespace", 0))
+        matching = [
+            row for row, epoch in zip(self.rows, self.epochs)
+            if row["ns"] == namespace
+            and (newer is None or epoch <= newer)
+            and (older is None or epoch >= older)
+        ]
+        offset = int(params.get("rccontinue", 0))
+        limit = int(params.get("rclimit", 500))
+        page = matching[offset:offset + limit]
+        data = {"query": {"recentchanges": page}}
+        if offset + limit < len(matching):
+            data["continue"] = {"rccontinue": str(offset + limit)}
+        return FakeResponse(data)
+
+@pytest.fixture
+def now() -> int:
+    return int(time.time())
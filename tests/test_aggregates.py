@@ -0,0 +1,64 @@
+import time
+
+from aggregates import EditAggregates, WindowAggregator
+from edit_store import EditRecord
+
+HOUR = 3600
+
+def edit(epoch, rcid, title, user, comment="", ns=0, anon=False):
+    return EditRecord(epoch, rcid, revid=rcid, ns=ns, title=title, user=user, comment=comment, flags=1 if anon else 0)
+
+def test_top_titles_count_unique_users_and_sections():
+    now = int(time.time())
+    aggregator = WindowAggregator(windows={"1h": HOUR})
+    aggregator.add(edit(now - 10, 1, "A", "u1", "/* History */ typo"))
+    aggregator.add(edit(now - 20, 2, "A", "u1", "/* History */ more"))
+    aggregator.add(edit(now - 30, 3, "A", "u2", "/* Intro */"))
+    aggregator.add(edit(now - 40, 4, "B", "u3"))
+
+    top = aggregator.top_titles("1h")
+    assert [(row["title"], row["count"]) for row in top] == [("A", 2), ("B", 1)]
+    assert top[0]["active_section"] == "History"
+    assert top[0]["last_revid"] == 1
+    assert aggregator.top_users("1h") == [{"user": "u1", "count": 2}, {"user": "u2", "count": 1}, {"user": "u3", "count": 1}]
+
+def test_window_keeps_the_bucket_holding_its_start():
+    now = int(time.time())
+    aggregator = WindowAggregator(bucket_seconds=300, windows={"1h": HOUR})
+    cutoff = aggregator.windows["1h"].cutoff
+    aggregator.add(edit(cutoff, 1, "Edge", "u1"))
+    aggregator.add(edit(cutoff - 1, 2, "Old", "u2"))
+
+    titles = {row["title"] for row in aggregator.top_titles("1h")}
+    assert titles == {"Edge"}
+    assert cutoff <= now - HOUR
+
+def test_expire_subtracts_buckets_that_slid_out():
+    now = int(time.time())
+    aggregator = WindowAggregator(bucket_seconds=300, windows={"1h": HOUR})
+    aggregator.add(edit(now - HOUR + 300, 1, "A", "u1"))
+    aggregator.add(edit(now - 60, 2, "A", "u2"))
+    aggregator.add(edit(now - 60, 3, "B", "u1"))
+    version = aggregator.version
+
+    # Half an hour later the oldest edit has left the window
+    aggregator.expire(now + 1800)
+    window = aggregator.windows["1h"]
+    assert window.title_users["A"] == {"u2": 1}
+    assert window.user_counts == {"u1": 1, "u2": 1}
+    assert aggregator.version > version
+
+    aggregator.expire(now + 2 * HOUR)
+    assert not window.title_edits and not window.user_counts and not window.title_last
+    assert not aggregator.buckets
+
+def test_edit_aggregates_route_anonymous_edits():
+    now = int(time.time())
+    aggregates = EditAggregates(namespaces=(0,))
+    aggregates.add(edit(now - 10, 1, "A", "10.0.0.1", anon=True))
+    aggregates.add(edit(now - 10, 2, "A", "u1"))
+    aggregates.add(edit(now - 10, 3, "Talk", "u1", ns=1))
+
+    assert aggregates.get(0).top_users("24h", 10) == [{"user": "10.0.0.1", "count": 1}, {"user": "u1", "count": 1}]
+    assert aggregates.get(0, anon_only=True).top_users("24h", 10) == [{"user": "10.0.0.1", "count": 1}]
+    assert aggregates.get(1) is None
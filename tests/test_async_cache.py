@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+from wiki_client import WikiClient
+
+class Source:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    @WikiClient.async_cache(ttl=60, max_entries=2, stale_ttl=60)
+    async def cached_value(self, key: int, scale: int = 1):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("upstream failure")
+        return {"value": key * scale, "call": self.calls}
+
+@pytest.fixture
+def source():
+    Source.cached_value.cache.clear()
+    return Source()
+
+def test_concurrent_misses_share_one_call(source):
+    async def run():
+        return await asyncio.gather(*(source.cached_value(1) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert source.calls == 1
+    assert all(result is results[0] for result in results)
+
+def test_equivalent_spellings_share_an_entry(source):
+    async def run():
+        first = await source.cached_value(2)
+        assert await source.cached_value(key=2) is first
+        assert await source.cached_value(2, scale=1) is first
+
+    asyncio.run(run())
+    assert source.calls == 1
+
+def test_least_recently_used_entry_is_evicted(source):
+    async def run():
+        await source.cached_value(1)
+        await source.cached_value(2)
+        await source.cached_value(1) # 2 is now the least recently used
+        await source.cached_value(3)
+
+    asyncio.run(run())
+    cache = Source.cached_value.cache
+    assert set(cache) == {Source.cached_value.key(1), Source.cached_value.key(3)}
+
+def test_stale_entry_is_served_while_it_refreshes(source):
+    async def run():
+        first = await source.cached_value(1)
+        key = Source.cached_value.key(1)
+        result, _, size = Source.cached_value.cache[key]
+        Source.cached_value.cache[key] = (result, time.time() - 90, size)
+
+        stale = await source.cached_value(1)
+        assert stale is first
+        # Let the background refresh finish
+        await asyncio.sleep(0.05)
+        fresh = await source.cached_value(1)
+        return fresh
+
+    fresh = asyncio.run(run())
+    assert fresh["call"] == 2
+    assert source.calls == 2
+
+def test_expired_entry_is_fetched_again(source):
+    async def run():
+        await source.cached_value(1)
+        key = Source.cached_value.key(1)
+        result, _, size = Source.cached_value.cache[key]
+        Source.cached_value.cache[key] = (result, time.time() - 200, size)
+        return await source.cached_value(1)
+
+    assert asyncio.run(run())["call"] == 2
+
+def test_failures_are_not_cached(source):
+    source.fail = True
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await source.cached_value(1)
+        source.fail = False
+        return await source.cached_value(1)
+
+    assert asyncio.run(run())["call"] == 2
+    assert len(Source.cached_value.cache) == 1
@@ -0,0 +1,68 @@
+import asyncio
+
+from conftest import FakeResponse
+from diff_cache import DiffCache
+from request_governor import BULK, INTERACTIVE
+from wiki_client import WikiClient
+
+def test_diff_cache_is_bounded_by_bytes_and_lru():
+    cache = DiffCache(max_bytes=25, compress=False)
+    cache.set(1, "a" * 10)
+    cache.set(2, "b" * 10)
+    assert cache.get(1) == "a" * 10 # 1 becomes most recent
+    cache.set(3, "c" * 10)
+    assert 2 not in cache
+    assert cache.get(1) == "a" * 10 and cache.get(3) == "c" * 10
+    assert cache.bytes == 20
+
+def test_diff_cache_compresses_large_bodies():
+    cache = DiffCache(compress_min=100)
+    html = "<td>same line</td>" * 200
+    cache.set(1, html)
+    assert cache.entries[1][0] is True
+    assert cache.bytes < len(html)
+    assert cache.get(1) == html
+
+class SlowLanes:
+    """
+    compare calls: BULK ones wait until released, INTERACTIVE ones answer at once.
+    """
+
+    def __init__(self):
+        self.release_bulk = asyncio.Event()
+        self.calls = []
+
+    async def __call__(self, params=None, url=None, priority=None):
+        self.calls.append((params["fromrev"], priority))
+        if priority == BULK:
+            await self.release_bulk.wait()
+        return FakeResponse({"compare": {"*": f"<diff {params['fromrev']}>"}})
+
+def test_concurrent_requests_share_one_call():
+    async def run():
+        client = WikiClient()
+        client._api_get = api = SlowLanes()
+        results = await asyncio.gather(*(client.get_diff(7) for _ in range(5)))
+        return api.calls, results, client
+    calls, results, client = asyncio.run(run())
+    assert calls == [(7, INTERACTIVE)]
+    assert results == ["<diff 7>"] * 5
+    assert client.diff_cache.get(7) == "<diff 7>"
+    assert client._diff_inflight == {}
+
+def test_interactive_request_does_not_wait_behind_bulk_prefetch():
+    async def run():
+        client = WikiClient()
+        client._api_get = api = SlowLanes()
+        prefetch = asyncio.ensure_future(client.get_diff(7, priority=BULK))
+        await asyncio.sleep(0)
+        opened = await asyncio.wait_for(client.get_diff(7), 1)
+        # Later bulk callers get the interactive result from the cache
+        joined = await asyncio.wait_for(client.get_diff(7, priority=BULK), 1)
+        api.release_bulk.set()
+        await prefetch
+        return api.calls, opened, joined, client
+    calls, opened, joined, client = asyncio.run(run())
+    assert opened == joined == "<diff 7>"
+    assert calls == [(7, BULK), (7, INTERACTIVE)]
+    assert client._diff_inflight == {}
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import timedelta
+
+from conftest import FakeRecentChanges, parse_timestamp
+from edit_store import EditRecord, EditStore
+from wiki_client import WikiClient
+
+HOUR = 3600
+
+def store_with(epochs, retention_hours=24):
+    client = WikiClient()
+    fake = FakeRecentChanges(epochs)
+    client._api_get = fake
+    return EditStore(client, namespaces=(0,), retention=timedelta(hours=retention_hours)), fake
+
+def test_backfill_loads_the_retention_window(now):
+    store, fake = store_with([now - i * 120 for i in range(1000)])
+    asyncio.run(store.backfill())
+
+    assert store.ready
+    assert len(fake.calls) >= 4 # one 6-hour chunk per quarter day
+    assert store.rcids >= {row["rcid"] for row, epoch in zip(fake.rows, fake.epochs) if epoch > now - 23 * HOUR}
+    assert all(edit.epoch >= now - 24 * HOUR - 1 for edit in store.edits)
+    assert store.covers(0, now - 23 * HOUR)
+    assert not store.covers(1, now - HOUR)
+    epochs = [edit.epoch for edit in store.edits]
+    assert epochs == sorted(epochs)
+
+def test_failed_chunks_are_retried(now):
+    store, fake = store_with([now - i * 600 for i in range(200)])
+    failed = set()
+
+    def fail_once(params):
+        if params["rcstart"] not in failed:
+            failed.add(params["rcstart"])
+            return True
+        return False
+
+    fake.fail = fail_once
+    asyncio.run(store.backfill())
+    assert store.covers(0, now - 23 * HOUR)
+    assert store.rcids >= {row["rcid"] for row, epoch in zip(fake.rows, fake.epochs) if epoch > now - 23 * HOUR}
+
+def test_persistent_hole_limits_coverage(now):
+    store, fake = store_with([now - i * 600 for i in range(100)])
+    # The chunk from 12h to 18h ago always fails
+    fake.fail = lambda params: now - 13 * HOUR <= parse_timestamp(params["rcstart"]) <= now - 11 * HOUR
+
+    asyncio.run(store.backfill(chunk_retries=1))
+    assert store.ready
+    assert store.covers(0, now - 11 * HOUR)
+    assert not store.covers(0, now - 13 * HOUR)
+
+def test_stream_events_are_ordered_deduplicated_and_filtered(now):
+    store, _ = store_with([])
+    store.ready, store.covered_since = True, now - HOUR
+    for rcid, epoch, user in ((1, now - 10, "u1"), (2, now - 30, "10.0.0.1"), (3, now - 20, "u2"), (1, now - 10, "u1")):
+        store.ingest_stream_event({"id": rcid, "type": "edit", "namespace": 0, "title": "A", "user": user, "timestamp": epoch})
+    store.ingest_stream_event({"id": 9, "type": "edit", "namespace": 4, "title": "B", "user": "u1", "timestamp": now})
+
+    assert [edit.rcid for edit in store.edits] == [2, 3, 1]
+    assert [row["rcid"] for row in store.query(0, now - HOUR)] == [1, 3, 2]
+    assert [row["rcid"] for row in store.query(0, anon_only=True)] == [2]
+    assert [row["rcid"] for row in store.query(0, user="u2")] == [3]
+
+def test_evict_drops_edits_past_retention(now):
+    store, _ = store_with([], retention_hours=1)
+    store.add(EditRecord(now - 2 * HOUR, 1, title="A"))
+    store.add(EditRecord(now - 10, 2, title="A"))
+    store.evict(now)
+    assert [edit.rcid for edit in store.edits] == [2]
+    assert store.rcids == {2}
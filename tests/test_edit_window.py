@@ -0,0 +1,76 @@
+import asyncio
+
+from conftest import FakeRecentChanges, format_timestamp
+from edit_store import EditRecord
+from wiki_client import WikiClient
+
+DAY = 24 * 3600
+
+class CoveringStore:
+    def __init__(self, since):
+        self.since = since
+
+    def covers(self, namespace, since):
+        return since >= self.since
+
+def windows_with(epochs):
+    client = WikiClient()
+    fake = FakeRecentChanges(epochs)
+    client._api_get = fake
+    return client.edit_windows, fake
+
+def test_window_holds_records_and_serves_fresh_rows(now):
+    windows, fake = windows_with([now - i * 60 for i in range(300)])
+
+    async def run():
+        first = await windows.get(0, "24h", 100)
+        first[0]["title"] = "changed"
+        calls = len(fake.calls)
+        second = await windows.get(0, "24h", 100)
+        return first, second, calls
+
+    first, second, calls = asyncio.run(run())
+    assert len(second) == 100
+    assert [row["rcid"] for row in second] == [row["rcid"] for row in first]
+    # Served from the window, as new dicts
+    assert len(fake.calls) == calls
+    assert second[0]["title"] != "changed"
+    window = windows.windows[(0, "24h", False, None, None)]
+    assert all(isinstance(edit, EditRecord) for edit in window.edits)
+
+def test_refresh_adds_only_new_edits_and_drops_expired(now):
+    windows, fake = windows_with([now - 600 - i * 60 for i in range(50)])
+
+    async def run():
+        await windows.get(0, "1h", 500)
+        window = windows.windows[(0, "1h", False, None, None)]
+        # Two new edits arrive; the window is past its ttl
+        fake.rows[:0] = [dict(fake.rows[0], rcid=1000 + i, timestamp=format_timestamp(now - i)) for i in range(2)]
+        fake.epochs[:0] = [now, now - 1]
+        window.fetched_at -= windows.ttl
+        return await windows.get(0, "1h", 500)
+
+    rows = asyncio.run(run())
+    rcids = [row["rcid"] for row in rows]
+    assert rcids[:2] == [1000, 1001]
+    assert len(rcids) == len(set(rcids))
+    assert all(row["timestamp"] >= format_timestamp(now - 3600 - 5) for row in rows)
+
+def test_sweep_drops_idle_windows(now):
+    windows, _ = windows_with([now - i * 60 for i in range(10)])
+    asyncio.run(windows.get(0, "24h", 100))
+    asyncio.run(windows.get(1, "24h", 100))
+    windows.windows[(1, "24h", False, None, None)].used_at -= windows.max_age
+
+    windows.sweep()
+    assert list(windows.windows) == [(0, "24h", False, None, None)]
+
+def test_sweep_drops_windows_the_store_covers(now):
+    windows, _ = windows_with([now - i * 60 for i in range(10)])
+    asyncio.run(windows.get(0, "24h", 100))
+    asyncio.run(windows.get(0, "7d", 100))
+
+    # The store holds the last two days: the 24h window goes, the 7d one stays
+    windows.wiki_client.edit_store = CoveringStore(now - 2 * DAY)
+    windows.sweep(now)
+    assert list(windows.windows) == [(0, "7d", False, None, None)]
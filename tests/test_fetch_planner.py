@@ -0,0 +1,48 @@
+import asyncio
+
+from conftest import FakeRecentChanges
+from fetch_planner import ROWS_PER_CALL, estimate_density, plan_intervals
+from wiki_client import WikiClient
+
+WEEK = 7 * 24 * 3600
+
+def planned_fetch(epochs, since, max_fetch):
+    client = WikiClient()
+    fake = FakeRecentChanges(epochs)
+    client._api_get = fake
+    rows = asyncio.run(client._fetch_edits_planned(since, max_fetch))
+    return rows, fake
+
+def test_density_counts_the_covered_span_not_the_oldest_row(now):
+    # 100 edits in the newest hour, but the fetch covered a whole day
+    assert estimate_density(100, now, now - 24 * 3600) == 100 / (24 * 3600)
+
+def test_plan_intervals_are_contiguous_and_bounded(now):
+    intervals = plan_intervals(now, now - WEEK, density=1.0, needed=5000)
+    assert intervals[0][0] == now
+    for (_, end), (start, _) in zip(intervals, intervals[1:]):
+        assert end == start
+    assert intervals[-1][1] >= now - WEEK
+    assert len(intervals) <= 10
+
+def test_sparse_window_needs_few_calls(now):
+    # 2,000 edits in the last 24h of a 7-day window: the minimum is 4 calls
+    epochs = [now - i * 43 for i in range(2000)]
+    rows, fake = planned_fetch(epochs, now - WEEK, 10000)
+    assert len(rows) == 2000
+    assert len({row["rcid"] for row in rows}) == 2000
+    assert len(fake.calls) <= 12
+
+def test_dense_window_returns_newest_edits_without_gaps(now):
+    epochs = [now - i * 30 for i in range(20000)]
+    rows, fake = planned_fetch(epochs, now - WEEK, 10000)
+    assert len(rows) >= 10000
+    rcids = {row["rcid"] for row in rows}
+    # Every edit newer than the oldest one returned is present
+    assert rcids == set(range(1, max(rcids) + 1))
+    assert len(fake.calls) <= 10000 // ROWS_PER_CALL + 8
+
+def test_small_window_fits_in_the_probe(now):
+    rows, fake = planned_fetch([now - i for i in range(100)], now - WEEK, 10000)
+    assert len(rows) == 100
+    assert len(fake.calls) == 1
@@ -0,0 +1,46 @@
+import gzip
+
+from starlette.requests import Request
+
+import fastjson
+from http_cache import EncodedResponseCache
+
+RESULTS = [{"title": f"Page {i}", "count": i} for i in range(100)]
+
+def request(**headers):
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]})
+
+def test_gzip_body_has_its_own_etag():
+    cache = EncodedResponseCache()
+    plain = cache.response(request(), RESULTS)
+    zipped = cache.response(request(accept_encoding="gzip"), RESULTS)
+
+    assert "Content-Encoding" not in plain.headers
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.headers["ETag"] != plain.headers["ETag"]
+    assert fastjson.loads(gzip.decompress(zipped.body)) == {"results": RESULTS}
+
+def test_if_none_match_gets_304_only_for_the_same_encoding():
+    cache = EncodedResponseCache()
+    etag = cache.response(request(accept_encoding="gzip"), RESULTS).headers["ETag"]
+
+    assert cache.response(request(accept_encoding="gzip", if_none_match=etag), RESULTS).status_code == 304
+    assert cache.response(request(if_none_match=f"W/{etag}"), RESULTS).status_code == 200
+
+def test_same_result_object_is_encoded_once():
+    cache = EncodedResponseCache(max_entries=1)
+    cache.response(request(accept_encoding="gzip"), RESULTS)
+    entry = cache.entries[id(RESULTS)]
+    cache.response(request(accept_encoding="gzip"), RESULTS)
+    assert cache.entries[id(RESULTS)] is entry
+
+    # An equal but new result object is a new entry, and the LRU stays bounded
+    cache.response(request(), list(RESULTS))
+    assert len(cache.entries) == 1 and id(RESULTS) not in cache.entries
+
+def test_small_bodies_are_sent_uncompressed():
+    cache = EncodedResponseCache(min_size=512)
+    results = [1]
+    response = cache.response(request(accept_encoding="gzip"), results)
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == cache.entries[id(results)].etag
@@ -0,0 +1,92 @@
+import asyncio
+
+from conftest import FakeResponse
+from page_metadata import PageMetadataService
+
+class FakeWiki:
+    """
+    Answers `prop=pageimages|description` for titles and page ids, counting calls.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.calls = []
+        self.delay = delay
+        self.fail = False
+
+    async def _api_get(self, params=None, url=None, priority=None):
+        self.calls.append(params)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream failure")
+        pages = {}
+        normalized = []
+        for title in params.get("titles", "").split("|") if "titles" in params else []:
+            canonical = title.replace("_", " ")
+            if canonical != title:
+                normalized.append({"from": title, "to": canonical})
+            pageid = abs(hash(canonical)) % 10000 + 1
+            pages[str(pageid)] = {"pageid": pageid, "title": canonical, "description": f"about {canonical}"}
+        for pageid in params.get("pageids", "").split("|") if "pageids" in params else []:
+            pages[pageid] = {"pageid": int(pageid), "title": f"Page {pageid}", "thumbnail": {"source": f"thumb/{pageid}.jpg"}}
+        return FakeResponse({"query": {"pages": pages, "normalized": normalized}})
+
+def test_concurrent_lookups_are_batched_and_cached():
+    wiki = FakeWiki()
+    service = PageMetadataService(wiki)
+
+    async def run():
+        first, second = await asyncio.gather(
+            service.get_by_pageids([1, 2]),
+            service.get_by_pageids([2, 3]),
+        )
+        again = await service.get_by_pageids([3])
+        return first, second, again
+
+    first, second, again = asyncio.run(run())
+    assert len(wiki.calls) == 1
+    assert wiki.calls[0]["pageids"].count("|") == 2
+    assert first[1] == {"thumbnail": "thumb/1.jpg"}
+    assert second[3] == again[3]
+
+def test_large_lookups_are_split_into_chunks():
+    wiki = FakeWiki()
+    service = PageMetadataService(wiki)
+    results = asyncio.run(service.get_by_pageids(range(1, 121)))
+    assert len(results) == 120
+    assert len(wiki.calls) == 3
+
+def test_titles_are_normalized():
+    wiki = FakeWiki()
+    service = PageMetadataService(wiki)
+    results = asyncio.run(service.get_by_titles(["Main_Page", "Main Page"]))
+    assert list(results) == ["Main Page"]
+    assert results["Main Page"]["description"] == "about Main Page"
+
+def test_cancelled_caller_does_not_cancel_the_shared_lookup():
+    wiki = FakeWiki(delay=0.05)
+    service = PageMetadataService(wiki)
+
+    async def run():
+        cancelled = asyncio.create_task(service.get_by_pageids([7]))
+        kept = asyncio.create_task(service.get_by_pageids([7]))
+        await asyncio.sleep(0.02)
+        cancelled.cancel()
+        return await kept
+
+    assert asyncio.run(run()) == {7: {"thumbnail": "thumb/7.jpg"}}
+    assert len(wiki.calls) == 1
+
+def test_failed_lookup_returns_empty_and_is_retried():
+    wiki = FakeWiki()
+    wiki.fail = True
+    service = PageMetadataService(wiki)
+
+    async def run():
+        failed = await service.get_by_pageids([5])
+        wiki.fail = False
+        return failed, await service.get_by_pageids([5])
+
+    failed, retried = asyncio.run(run())
+    assert failed == {5: {}}
+    assert retried == {5: {"thumbnail": "thumb/5.jpg"}}
+    assert len(wiki.calls) == 2
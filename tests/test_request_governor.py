@@ -0,0 +1,86 @@
+import asyncio
+
+import httpx
+import pytest
+
+from request_governor import BULK, INTERACTIVE, NORMAL, RequestGovernor
+
+URL = "https://he.wikipedia.org/w/api.php"
+
+def governor_with(handler, **kwargs):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return RequestGovernor(client, **kwargs)
+
+def test_free_slots_go_to_the_highest_priority_lane():
+    order = []
+
+    async def run():
+        gate = asyncio.Event()
+        entered = asyncio.Event()
+
+        async def handler(request):
+            name = request.url.params["name"]
+            order.append(name)
+            if name == "first":
+                entered.set()
+                await gate.wait()
+            return httpx.Response(200, json={})
+
+        governor = governor_with(handler, concurrency=1, rate=1000, burst=1000)
+        first = asyncio.create_task(governor.get(URL, {"name": "first"}, NORMAL))
+        await entered.wait()
+        bulk = asyncio.create_task(governor.get(URL, {"name": "bulk"}, BULK))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(governor.get(URL, {"name": "interactive"}, INTERACTIVE))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(first, bulk, interactive)
+
+    asyncio.run(run())
+    assert order == ["first", "interactive", "bulk"]
+
+def test_throttled_requests_are_retried_with_maxlag():
+    calls = []
+
+    def handler(request):
+        calls.append(dict(request.url.params))
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        if len(calls) == 2:
+            return httpx.Response(200, headers={"X-Database-Lag": "7"}, json={"error": {"code": "maxlag"}})
+        return httpx.Response(200, json={"ok": True})
+
+    governor = governor_with(handler, backoff=0)
+    response = asyncio.run(governor.get(URL, {"action": "query"}))
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+    assert len(calls) == 3
+    assert all(params["maxlag"] == "5" for params in calls)
+
+def test_retry_after_is_honored_and_capped():
+    governor = governor_with(lambda request: httpx.Response(200), max_backoff=60)
+    assert governor._retry_delay(httpx.Response(429, headers={"Retry-After": "12"}), 0) == 12
+    assert governor._retry_delay(httpx.Response(429, headers={"Retry-After": "600"}), 0) == 60
+    # Without Retry-After: jittered exponential backoff
+    assert 2 <= governor._retry_delay(httpx.Response(503), 2) <= 4
+
+def test_gives_up_after_max_retries():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    governor = governor_with(handler, backoff=0, max_retries=2)
+    assert asyncio.run(governor.get(URL, {"action": "query"})).status_code == 503
+    assert len(calls) == 3
+
+def test_transport_errors_are_raised_after_retries():
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    governor = governor_with(handler, backoff=0, max_retries=1)
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(governor.get(URL))
+    host = governor.hosts["he.wikipedia.org"]
+    assert host.active == 0 and not host.waiters
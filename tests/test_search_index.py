@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+from conftest import FakeResponse
+from diff_cache import DiffCache
+from edit_store import EditRecord
+from request_governor import BULK
+from search_index import ADDED, REMOVED, DiffSearchIndex, extract_diff_tokens, index_terms
+
+def diff_row(added: str = "", removed: str = "") -> str:
+    cells = ""
+    if removed:
+        cells += f'<td class="diff-deletedline"><div>{removed}</div></td>'
+    if added:
+        cells += f'<td class="diff-addedline"><div>{added}</div></td>'
+    return f"<tr>{cells}</tr>"
+
+def record(revid: int, epoch: int) -> EditRecord:
+    return EditRecord(epoch, revid, revid=revid, ns=0, type="edit", title=f"Page {revid}", user="User")
+
+def test_index_terms_strip_hebrew_prefixes():
+    assert index_terms("והבית") == ["והבית", "הבית", "בית", "ית"]
+    assert index_terms("בלב") == ["בלב", "לב"]
+    assert index_terms("שלום") == ["שלום", "לום", "ום"]
+    assert index_terms("abc") == ["abc"]
+
+def test_changed_line_only_indexes_changed_words():
+    flags = extract_diff_tokens(diff_row(added="the new house", removed="the old house"))
+    assert flags == {"new": ADDED, "old": REMOVED}
+
+def test_search_matches_prefixed_forms_and_intersects_words(now):
+    index = DiffSearchIndex(None, None)
+    index.add(record(1, now - 10), extract_diff_tokens(diff_row(added="נבנה והבית החדש")))
+    index.add(record(2, now - 20), extract_diff_tokens(diff_row(removed="בית ספר")))
+
+    assert [(r["revid"], r["status"]) for r in index.search("בית")] == [(1, "added"), (2, "removed")]
+    assert [r["revid"] for r in index.search("בית חדש")] == [1]
+    assert index.search("בית", since=now - 15)[0]["revid"] == 1
+    assert index.search("אין") == []
+
+def test_evicted_revisions_disappear_and_compact_purges_postings(now):
+    index = DiffSearchIndex(None, None, retention=3600)
+    index.add(record(1, now - 7200), {"old": ADDED})
+    index.add(record(2, now - 10), {"new": ADDED})
+    index.evict(now)
+    assert index.search("old") == []
+    index.compact()
+    assert "old" not in index.postings
+    assert list(index.postings["new"]) == [2 << 2 | ADDED]
+
+def test_gap_floor_limits_coverage(now):
+    index = DiffSearchIndex(None, None)
+    index.covered_since = now
+    index._mark_gap(now - 100)
+    index._extend_coverage(now - 5000)
+    assert index.covered_since == now - 99
+    assert not index.covers(now - 200)
+    assert index.covers(now - 50)
+
+def test_queue_overflow_marks_a_gap(now):
+    async def run():
+        index = DiffSearchIndex(None, None, queue_size=1)
+        index.queue = asyncio.Queue(maxsize=1)
+        index.covered_since = now - 1000
+        index.submit(record(1, now - 30))
+        index.submit(record(2, now - 20))
+        return index
+    index = asyncio.run(run())
+    assert index.covered_since == now - 19
+
+class FakeWiki:
+    """
+    prop=revisions answers with `notcached` diffs; compare calls are recorded.
+    """
+
+    def __init__(self):
+        self.diff_cache = DiffCache()
+        self.compares = []
+
+    async def _api_get(self, params, priority=None):
+        revids = params["revids"].split("|")
+        revisions = [{"revid": int(revid), "diff": {"notcached": ""}} for revid in revids]
+        return FakeResponse({"query": {"pages": {"1": {"revisions": revisions}}}})
+
+    async def _fetch_diff(self, revid, priority=None, cache=True):
+        self.compares.append((revid, priority, cache))
+        return diff_row(added=f"word{revid}")
+
+    async def get_diff(self, revid, priority=None):
+        raise AssertionError("indexing must not go through the user diff cache")
+
+def test_notcached_diffs_bypass_the_user_diff_cache(now):
+    wiki = FakeWiki()
+    index = DiffSearchIndex(wiki, None)
+    asyncio.run(index._index_batch([record(5, now), record(6, now)]))
+    assert sorted(wiki.compares) == [(5, BULK, False), (6, BULK, False)]
+    assert len(wiki.diff_cache.entries) == 0
+    assert [r["revid"] for r in index.search("word5")] == [5]
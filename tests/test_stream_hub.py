@@ -0,0 +1,22 @@
+from edit_store import EditRecord, format_timestamp
+from stream_hub import JSON, LiveEvent, compact_event
+
+EVENT = {
+    "id": 42, "type": "edit", "namespace": 0, "title": "Page", "user": "10.0.0.1",
+    "timestamp": 1700000000, "comment": "fix", "minor": True, "bot": False,
+    "revision": {"old": 7, "new": 8}, "length": {"old": 100, "new": 120},
+}
+
+def test_compact_event_matches_the_store_record():
+    edit = compact_event(EVENT)
+    row = EditRecord.from_stream_event(EVENT).to_row()
+    assert edit["timestamp"] == 1700000000
+    assert row["timestamp"] == format_timestamp(1700000000)
+    del edit["timestamp"], row["timestamp"]
+    assert edit == row
+    assert "minor" in edit and "anon" in edit and "bot" not in edit
+
+def test_live_event_encodes_each_format_once():
+    event = LiveEvent(EVENT)
+    assert event.encode(JSON) is event.encode(JSON)
+    assert event.data["revid"] == 8
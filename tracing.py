@@ -0,0 +1,187 @@
+import asyncio
+import functools
+import itertools
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+# Request-scoped timing: the middleware puts a Trace in a context variable for
+# each /api request; upstream calls and processing phases add spans to it.
+# Tasks started while handling the request (gather, single-flight fetches)
+# inherit the context, so their spans land in the same trace.
+# Outside a request (background tasks) recording is a no-op. Tasks shared by
+# several requests (single-flight fetches, batch flushes) are started with
+# detached_task(), so they do not keep adding spans to the trace of whichever
+# request happened to start them, possibly after it finished.
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("edisco_trace", default=None)
+_ids = itertools.count(1)
+
+class Span:
+    __slots__ = ("name", "start", "duration", "attrs")
+
+    def __init__(self, name: str, start: float, duration: float, attrs: Dict):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.attrs = attrs
+
+class Trace:
+    """
+    Spans recorded while handling one request, with start times relative to the request.
+    """
+
+    def __init__(self, name: str):
+        self.id = str(next(_ids))
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall_time = time.time()
+        self.duration: Optional[float] = None
+        self.spans: List[Span] = []
+
+    def add(self, name: str, start: float, duration: float, attrs: Dict):
+        self.spans.append(Span(name, start, duration, attrs))
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value: the total, then per span name the summed
+        duration (parallel spans overlap, so sums can exceed the total) and count.
+        """
+        totals: Dict[str, List] = OrderedDict()
+        for span in self.spans:
+            entry = totals.setdefault(span.name, [0.0, 0])
+            entry[0] += span.duration
+            entry[1] += 1
+        parts = [f"total;dur={(self.duration or 0) * 1000:.1f}"]
+        for name, (duration, count) in totals.items():
+            part = f"{name};dur={duration * 1000:.1f}"
+            if count > 1:
+                part += f';desc="{count}x"'
+            parts.append(part)
+        return ", ".join(parts)
+
+    def to_dict(self, spans: bool = True) -> Dict:
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "time": self.wall_time,
+            "duration_ms": round((self.duration or 0) * 1000, 2),
+            "span_count": len(self.spans),
+        }
+        if spans:
+            data["spans"] = [
+                {"name": span.name, "start_ms": round((span.start - self.started) * 1000, 2), "duration_ms": round(span.duration * 1000, 2), **span.attrs}
+                for span in sorted(self.spans, key=lambda span: span.start)
+            ]
+        return data
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+def record(name: str, start: float, end: Optional[float] = None, **attrs):
+    """
+    Adds a span that ran from `start` (time.perf_counter()) until `end` (default: now).
+    """
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, start, (end if end is not None else time.perf_counter()) - start, attrs)
+
+@contextmanager
+def span(name: str, **attrs):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter() - start, attrs)
+
+def traced(name: str):
+    """
+    Decorator recording each call of a coroutine function as a span.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+async def _untraced(coro):
+    # Runs in the task's own copy of the context, so this does not affect the caller
+    _current.set(None)
+    return await coro
+
+def detached_task(coro) -> asyncio.Future:
+    """
+    Schedules `coro` as a task that records into no trace.
+    """
+    return asyncio.ensure_future(_untraced(coro))
+
+class TraceStore:
+    """
+    The last `max_traces` finished traces, for the debug endpoints.
+    """
+
+    def __init__(self, max_traces: int = 200):
+        self.traces = deque(maxlen=max_traces)
+
+    def add(self, trace: Trace):
+        self.traces.append(trace)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        for trace in self.traces:
+            if trace.id == trace_id:
+                return trace
+        return None
+
+    def recent(self) -> List[Dict]:
+        return [trace.to_dict(spans=False) for trace in reversed(self.traces)]
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware tracing requests under `prefix`: adds a Server-Timing
+    header and, when a TraceStore is given (debug mode), an X-Trace-Id header
+    and keeps the full span list in the store.
+    """
+
+    def __init__(self, app, prefix: str = "/api/", store: Optional[TraceStore] = None):
+        self.app = app
+        self.prefix = prefix
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        query = scope.get("query_string", b"").decode("latin-1")
+        trace = Trace(scope["path"] + ("?" + query if query else ""))
+        token = _current.set(trace)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                trace.finish()
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                if self.store is not None:
+                    headers.append((b"x-trace-id", trace.id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            trace.finish()
+            if self.store is not None:
+                self.store.add(trace)
@@ -1,37 +1,101 @@
 import httpx
-import json
 import asyncio
+import functools
+import inspect
 import logging
+import os
 import time
 import re
+from collections import OrderedDict
+from page_metadata import PageMetadataService, normalize_title
+from diff_cache import DiffCache
+from pageview_store import TitleViewsStore, TopViewsStore
+import fastjson
+import metrics
+import tracing
+from edit_store import parse_timestamp
+from edit_window import EditWindows, PERIOD_SECONDS, WINDOW_PROP_SET
+from fetch_planner import ROWS_PER_CALL, estimate_density, plan_intervals
+from request_governor import RequestGovernor, INTERACTIVE, NORMAL
 from typing import List, Dict, Optional, AsyncGenerator
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ASYNC_CACHE_REQUESTS = metrics.counter("edisco_async_cache_requests_total", "async_cache lookups by method and result (hit, stale, miss, shared).", ("method", "result"))
+DIFF_CACHE_REQUESTS = metrics.counter("edisco_diff_cache_requests_total", "get_diff lookups by result (hit, miss, shared).", ("result",))
+STREAM_EVENTS = metrics.counter("edisco_stream_events_total", "EventStreams events read from upstream (received) and kept as Hebrew Wikipedia events (kept).", ("stage",))
+
+# name -> async_cache wrapper, for the cache size gauges
+_CACHED_METHODS = {}
+
+def _async_cache_bytes() -> Dict:
+    return {
+        (name,): sum(size for _, _, size in list(wrapper.cache.values()))
+        for name, wrapper in _CACHED_METHODS.items()
+    }
+
+metrics.gauge("edisco_async_cache_entries", "Entries held per cached method.", ("method",), collect=lambda: {(name,): len(wrapper.cache) for name, wrapper in _CACHED_METHODS.items()})
+metrics.gauge("edisco_async_cache_bytes", "JSON size of the results held per cached method.", ("method",), collect=_async_cache_bytes)
+
 class WikiClient:
-    BASE_URL = "https://he.wikipedia.org/w/api.php"
-    STREAM_URL = "https://stream.wikimedia.org/v2/stream/recentchange"
+    # Overridable so the app can run against a local stand-in (see bench/)
+    BASE_URL = os.environ.get("EDISCO_API_URL", "https://he.wikipedia.org/w/api.php")
+    STREAM_URL = os.environ.get("EDISCO_STREAM_URL", "https://stream.wikimedia.org/v2/stream/recentchange")
+    SERVER_NAME = "he.wikipedia.org"
 
     def __init__(self):
         self.client = httpx.AsyncClient(headers={
             "User-Agent": "EdiscoBot/1.0 (https://github.com/A0pple/Edisco; contact@edisco.app) based on httpx/0.23.0"
         }, timeout=30.0) # Increased timeout for batch operations
+        # Rate limits, priority lanes and retries for every API call (see _api_get)
+        self.governor = RequestGovernor(self.client)
+        # Shared, batched thumbnail/description cache used by every endpoint
+        self.page_metadata = PageMetadataService(self)
+        # Immutable per-day top-viewed rankings (optionally persisted; see main.py)
+        self.top_views = TopViewsStore(self)
+        # Per-(title, day) view counts for user / title filtered rankings
+        self.title_views = TitleViewsStore(self)
+        # Byte-bounded diff HTML cache, optionally warmed by a DiffPrefetcher (attached by the app)
+        self.diff_cache = DiffCache()
+        self.diff_prefetcher = None
+        self._diff_inflight = {} # revid -> (task, priority)
+        # Optional resident EditStore (attached by the app); answers recent-changes queries from memory
+        self.edit_store = None
+        # Optional DiffSearchIndex (attached by the app); answers search_edits without fetching diffs
+        self.search_index = None
+        # Shared per-(namespace, period, filters) recent-changes windows behind the aggregations
+        self.edit_windows = EditWindows(self)
+
+    async def _api_get(self, params: Optional[Dict] = None, url: Optional[str] = None, priority: int = NORMAL) -> httpx.Response:
+        """
+        GETs the Action API (or `url`) through the request governor.
+        """
+        return await self.governor.get(url or self.BASE_URL, params=params, priority=priority)
 
-    async def get_recent_edits_stream(self) -> AsyncGenerator[Dict, None]:
+    async def get_recent_edits_stream(self, since: Optional[str] = None, types: Optional[tuple] = ("edit",)) -> AsyncGenerator[Dict, None]:
         """
         Connects to the Wikimedia EventStreams SSE and yields Hebrew Wikipedia edits.
+        If `since` is given (ISO timestamp), the stream is replayed from that point.
+        `types` limits the event types yielded (None yields every Hebrew Wikipedia event).
+        Meant to be consumed once by StreamHub, which fans events out to clients.
         """
+        params = {"since": since} if since else None
         async with httpx.AsyncClient(timeout=None) as client:
-            async with client.stream("GET", self.STREAM_URL) as response:
+            async with client.stream("GET", self.STREAM_URL, params=params) as response:
                 async for line in response.aiter_lines():
-                    if line.startswith("data: "):
+                    if not line.startswith("data: "):
+                        continue
+                    STREAM_EVENTS.inc("received")
+                    # Cheap substring prefilter: most events belong to other wikis and are never decoded
+                    if self.SERVER_NAME in line:
                         try:
-                            data = json.loads(line[6:])
-                            if data.get("server_name") == "he.wikipedia.org" and data.get("type") == "edit":
+                            data = fastjson.loads(line[6:])
+                            if data.get("server_name") == self.SERVER_NAME and (types is None or data.get("type") in types):
+                                STREAM_EVENTS.inc("kept")
                                 yield data
-                        except json.JSONDecodeError:
+                        except fastjson.JSONDecodeError:
                             continue
                         except Exception as e:
                             logger.error(f"Error processing stream data: {e}")
@@ -39,7 +103,18 @@ class WikiClient:
     async def search_edits(self, query: str, limit: int = 500, period: str = "7d") -> List[Dict]:
         """
         Searches recent edits (last 7 days or 24h) for a specific word in added/removed content.
-        Optimized to use batch diff fetching.
+        Collects `search_edits_stream`, newest first.
+        """
+        results = [result async for result in self.search_edits_stream(query, limit, period)]
+        results.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+        return results
+
+    async def search_edits_stream(self, query: str, limit: int = 500, period: str = "7d", concurrency: int = 4) -> AsyncGenerator[Dict, None]:
+        """
+        Yields search matches as soon as they are found.
+        Answered from the diff search index when it covers the period (all edits in the window);
+        otherwise falls back to batch diff fetching over the latest `limit` changes,
+        with up to `concurrency` diff batches in flight.
         """
         # 1. Get recent changes
         from datetime import datetime, timedelta
@@ -50,6 +125,15 @@ class WikiClient:
         else:
             start_time = now - timedelta(days=7)
 
+        since = int(time.time()) - int((now - start_time).total_seconds())
+        if self.search_index and self.search_index.covers(since):
+            with tracing.span("search_index"):
+                results = self.search_index.search(query, since, limit)
+            await self._attach_page_metadata(results)
+            for result in results:
+                yield result
+            return
+
         # Fetch recent changes (ids only first to be fast?) 
         # Actually we need metadata too.
         params = {
@@ -63,16 +147,14 @@ class WikiClient:
         }
         
         try:
-            response = await self.client.get(self.BASE_URL, params=params)
+            response = await self._api_get(params)
             response.raise_for_status()
-            data = response.json()
+            data = fastjson.loads(response.content)
             recent_changes = data.get("query", {}).get("recentchanges", [])
         except Exception as e:
             logger.error(f"Error fetching recent changes: {e}")
-            return []
+            return
 
-        results = []
-        
         # 2. Batch fetch diffs
         # We can fetch up to 50 revisions at a time
         rev_ids = [rc["revid"] for rc in recent_changes if "revid" in rc]
@@ -80,89 +162,83 @@ class WikiClient:
         # Map revid to rc object for easy access
         rc_map = {rc["revid"]: rc for rc in recent_changes if "revid" in rc}
         
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def search_batch(chunk):
+            async with semaphore:
+                matches = await self._search_diff_batch(query, chunk, rc_map)
+            # 3. Attach images from the shared metadata cache
+            await self._attach_page_metadata(matches)
+            return matches
+
         chunk_size = 50
-        for i in range(0, len(rev_ids), chunk_size):
-            chunk = rev_ids[i:i + chunk_size]
-            if not chunk: continue
-            
-            diff_params = {
-                "action": "query",
-                "prop": "revisions",
-                "rvdiffto": "prev",
-                "revids": "|".join(map(str, chunk)),
-                "format": "json"
-            }
-            
-            try:
-                diff_resp = await self.client.get(self.BASE_URL, params=diff_params)
-                diff_data = diff_resp.json()
-                pages = diff_data.get("query", {}).get("pages", {})
-                
-                for page_id, page_data in pages.items():
-                    if "revisions" in page_data:
-                        for rev in page_data["revisions"]:
-                            revid = rev.get("revid")
-                            diff_html = rev.get("diff", {}).get("*", "")
+        tasks = [
+            asyncio.ensure_future(search_batch(rev_ids[i:i + chunk_size]))
+            for i in range(0, len(rev_ids), chunk_size)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for result in await next_done:
+                    yield result
+        finally:
+            # The consumer went away (e.g. client disconnected); stop outstanding batches
+            for task in tasks:
+                task.cancel()
+
+    async def _search_diff_batch(self, query: str, chunk: List[int], rc_map: Dict[int, Dict]) -> List[Dict]:
+        """
+        Fetches diffs for up to 50 revisions and returns the matching edits.
+        """
+        results = []
+        diff_params = {
+            "action": "query",
+            "prop": "revisions",
+            "rvdiffto": "prev",
+            "revids": "|".join(map(str, chunk)),
+            "format": "json"
+        }
+        
+        try:
+            diff_resp = await self._api_get(diff_params)
+            diff_data = fastjson.loads(diff_resp.content)
+            pages = diff_data.get("query", {}).get("pages", {})
+            
+            for page_id, page_data in pages.items():
+                if "revisions" in page_data:
+                    for rev in page_data["revisions"]:
+                        revid = rev.get("revid")
+                        diff_html = rev.get("diff", {}).get("*", "")
+                        
+                        if not diff_html:
+                            continue
                             
-                            if not diff_html:
-                                continue
-                                
-                            if query in diff_html:
-                                rc = rc_map.get(revid)
-                                if not rc: continue
-                                
-                                status = "unknown"
-                                # Simple heuristic for added/removed
-                                if "diff-addedline" in diff_html and query in diff_html.split("diff-addedline")[1].split("</td>")[0]:
-                                     status = "added"
-                                elif "diff-deletedline" in diff_html and query in diff_html.split("diff-deletedline")[1].split("</td>")[0]:
-                                     status = "removed"
-                                
-                                if status != "unknown" or query in diff_html:
-                                     # Create a copy to avoid mutating if shared (though here it's unique)
-                                     result_rc = rc.copy()
-                                     result_rc["status"] = status
-                                     results.append(result_rc)
-            except Exception as e:
-                logger.error(f"Error fetching diff batch: {e}")
-
-        # 3. Fetch images for results
-        if results:
-            page_ids = [str(edit["pageid"]) for edit in results if "pageid" in edit]
-            # Deduplicate
-            page_ids = list(set(page_ids))
-            
-            chunk_size = 50
-            for i in range(0, len(page_ids), chunk_size):
-                chunk = page_ids[i:i + chunk_size]
-                if not chunk: continue
-                
-                img_params = {
-                    "action": "query",
-                    "prop": "pageimages",
-                    "pithumbsize": 100,
-                    "pageids": "|".join(chunk),
-                    "format": "json"
-                }
-                try:
-                    img_resp = await self.client.get(self.BASE_URL, params=img_params)
-                    img_data = img_resp.json()
-                    pages = img_data.get("query", {}).get("pages", {})
-                    
-                    for edit in results:
-                        pid = str(edit.get("pageid"))
-                        if pid in pages:
-                            thumbnail = pages[pid].get("thumbnail", {})
-                            if thumbnail:
-                                edit["thumbnail"] = thumbnail.get("source")
-                except Exception as e:
-                    logger.error(f"Error fetching images for search results: {e}")
+                        if query in diff_html:
+                            rc = rc_map.get(revid)
+                            if not rc: continue
+                            
+                            status = "unknown"
+                            # Simple heuristic for added/removed
+                            if "diff-addedline" in diff_html and query in diff_html.split("diff-addedline")[1].split("</td>")[0]:
+                                 status = "added"
+                            elif "diff-deletedline" in diff_html and query in diff_html.split("diff-deletedline")[1].split("</td>")[0]:
+                                 status = "removed"
+                            
+                            if status != "unknown" or query in diff_html:
+                                 # Create a copy to avoid mutating if shared (though here it's unique)
+                                 result_rc = rc.copy()
+                                 result_rc["status"] = status
+                                 results.append(result_rc)
+        except Exception as e:
+            logger.error(f"Error fetching diff batch: {e}")
 
         return results
 
-    async def _fetch_edits_worker(self, start_time, end_time, max_fetch, namespace: int = 0, anon_only: bool = False, props: str = "ids|title|user|timestamp|comment|sizes", user: Optional[str] = None, title: Optional[str] = None) -> List[Dict]:
+    @tracing.traced("fetch_pages")
+    async def _fetch_edits_worker(self, start_time, end_time, max_fetch, namespace: int = 0, anon_only: bool = False, props: str = "ids|title|user|timestamp|comment|sizes", user: Optional[str] = None, title: Optional[str] = None, priority: int = NORMAL, raise_errors: bool = False) -> List[Dict]:
         """
         Worker to fetch edits for a specific time range.
+        A failed request ends the fetch with the edits gathered so far,
+        or raises when `raise_errors` is set.
         """
         edits_chunk = []
         continue_token = None
@@ -197,9 +273,9 @@ class WikiClient:
                 params["rctitle"] = title
 
             try:
-                response = await self.client.get(self.BASE_URL, params=params)
+                response = await self._api_get(params, priority=priority)
                 response.raise_for_status()
-                data = response.json()
+                data = fastjson.loads(response.content)
                 batch = data.get("query", {}).get("recentchanges", [])
                 
                 if not batch:
@@ -214,43 +290,95 @@ class WikiClient:
                     
             except Exception as e:
                 logger.error(f"Error fetching edits worker batch: {e}")
+                if raise_errors:
+                    raise
                 break
                 
         return edits_chunk
 
+    @tracing.traced("fetch_planned")
+    async def _fetch_edits_planned(self, since: int, max_fetch: int, namespace: int = 0, anon_only: bool = False, props: str = "ids|title|user|timestamp|comment|sizes", user: Optional[str] = None, title: Optional[str] = None, until: Optional[int] = None, raise_errors: bool = False) -> List[Dict]:
+        """
+        Fetches the newest `max_fetch` edits since `since` (epoch seconds) without gaps,
+        ending at `until` (epoch seconds, inclusive; default: now).
+        A probe (the newest page) measures current edit density; each following round
+        plans contiguous intervals sized to about one API call each and reaching back
+        only as far as the missing edits should take, at the density measured over
+        the span covered so far. When a round's oldest interval comes back empty,
+        the rest of the window is fetched as one interval. Intervals are paginated to
+        the end, so a busy interval is never truncated in the middle of the window.
+        With `raise_errors`, a failed request raises instead of leaving a gap.
+        """
+        from datetime import datetime, timezone
+
+        def as_datetime(epoch):
+            return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+        now = until if until is not None else int(time.time())
+        probe_start = as_datetime(until) if until is not None else None
+        edits = await self._fetch_edits_worker(probe_start, as_datetime(since), min(ROWS_PER_CALL, max_fetch), namespace, anon_only, props, user, title, raise_errors=raise_errors)
+        if len(edits) < min(ROWS_PER_CALL, max_fetch):
+            # The whole window fits in the probe
+            return edits
+
+        seen = {edit.get("rcid") for edit in edits}
+        # The probe was cut off at its oldest row, so that is as far as it covered
+        newest = parse_timestamp(edits[-1]["timestamp"])
+        rounds = 0
+        exhausted = False
+        while len(edits) < max_fetch and newest > since:
+            needed = max_fetch - len(edits)
+            if exhausted:
+                # The last round ran out of edits: fetch what is left in one paginated interval
+                intervals = [(newest, since)]
+            else:
+                intervals = plan_intervals(newest, since, estimate_density(len(edits), now, newest), needed)
+            rounds += 1
+
+            results = await asyncio.gather(*(
+                self._fetch_edits_worker(as_datetime(start), as_datetime(end), needed, namespace, anon_only, props, user, title, raise_errors=raise_errors)
+                for start, end in intervals
+            ))
+            for batch in results:
+                for edit in batch:
+                    # Interval bounds are inclusive, so edges can repeat
+                    if edit.get("rcid") not in seen:
+                        seen.add(edit.get("rcid"))
+                        edits.append(edit)
+            newest = intervals[-1][1]
+            exhausted = not results[-1]
+
+        logger.info(f"Planned fetch: {len(edits)} edits in {rounds} round(s) after the probe")
+        return edits
+
     async def get_recent_edits(self, limit: int = 50, period: Optional[str] = None, max_fetch: int = 500, fetch_images: bool = True, namespace: int = 0, anon_only: bool = False, props: str = "ids|title|user|timestamp|comment|sizes", user: Optional[str] = None, title: Optional[str] = None, sort: str = "date") -> List[Dict]:
         """
         Fetches recent edits. 
-        Optimized: Uses parallel fetching for '7d' period.
+        Served from the resident EditStore when it covers the request, otherwise
+        period queries read the shared edit window (see EditWindows), which all
+        aggregations of the same namespace, period and filters fetch only once.
         """
         from datetime import datetime, timedelta
         now = datetime.utcnow()
         
         all_edits = []
 
-        if period == "7d":
-            # Parallel fetch strategy for 7 days
-            # Split into smaller chunks (e.g. 6 hours) to increase parallelism and speed
-            tasks = []
-            
-            # 7 days * 4 chunks per day = 28 chunks
-            chunks_per_day = 4
-            hours_per_chunk = 24 / chunks_per_day
-            
-            # We want to fetch roughly max_fetch total. 
-            per_chunk_limit = max(200, int(max_fetch / 20)) # Divide by ~20 instead of 28 to be safe
-            
-            for i in range(7 * chunks_per_day):
-                # Chunk i: from (now - i*6h) to (now - (i+1)*6h)
-                t_start = now - timedelta(hours=i*hours_per_chunk)
-                t_end = now - timedelta(hours=(i+1)*hours_per_chunk)
-                
-                tasks.append(self._fetch_edits_worker(t_start, t_end, per_chunk_limit, namespace, anon_only, props, user, title))
-            
-            results = await asyncio.gather(*tasks)
-            for res in results:
-                all_edits.extend(res)
-                
+        period_hours = {"1h": 1, "24h": 24, "7d": 24 * 7}.get(period)
+        since = None
+        if period_hours:
+            since = int(time.time()) - period_hours * 3600
+
+        if self.edit_store and self.edit_store.covers(namespace, since):
+            with tracing.span("store_query"):
+                all_edits = self.edit_store.query(namespace, since, max_fetch, anon_only, user, title)
+
+        elif period in PERIOD_SECONDS and set(props.split("|")) <= WINDOW_PROP_SET:
+            all_edits = await self.edit_windows.get(namespace, period, max_fetch, anon_only, user, title)
+
+        elif period == "7d":
+            # Parallel fetch over intervals planned from the measured edit density
+            all_edits = await self._fetch_edits_planned(since, max_fetch, namespace, anon_only, props, user, title)
+
             # Sort by timestamp (newest first)
             all_edits.sort(key=lambda x: x["timestamp"], reverse=True)
             
@@ -290,60 +418,139 @@ class WikiClient:
         all_edits = all_edits[:limit]
 
         # Fetch images for all collected edits if requested
-        if fetch_images and all_edits:
-            # Deduplicate by pageid to save requests
-            page_ids = list(set([str(edit["pageid"]) for edit in all_edits if "pageid" in edit]))
-            
-            # Split into chunks of 50
-            chunk_size = 50
-            for i in range(0, len(page_ids), chunk_size):
-                chunk = page_ids[i:i + chunk_size]
-                if not chunk: continue
-                
-                img_params = {
-                    "action": "query",
-                    "prop": "pageimages",
-                    "pithumbsize": 100,
-                    "pageids": "|".join(chunk),
-                    "format": "json"
-                }
-                try:
-                    img_resp = await self.client.get(self.BASE_URL, params=img_params)
-                    img_data = img_resp.json()
-                    pages = img_data.get("query", {}).get("pages", {})
-                    
-                    # Map images back to edits
-                    for edit in all_edits:
-                        pid = str(edit.get("pageid"))
-                        if pid in pages:
-                            thumbnail = pages[pid].get("thumbnail", {})
-                            if thumbnail:
-                                edit["thumbnail"] = thumbnail.get("source")
-                except Exception as e:
-                    logger.error(f"Error fetching images for chunk: {e}")
+        if fetch_images:
+            await self._attach_page_metadata(all_edits)
 
         return all_edits
 
-    # Simple async cache decorator
-    def async_cache(ttl: int = 30):
+    @tracing.traced("metadata")
+    async def _attach_page_metadata(self, items: List[Dict], title_of=None, description: bool = False):
+        """
+        Sets "thumbnail" (and "description" if requested) on each item from the shared
+        PageMetadataService. Items are looked up by "pageid" when they have one,
+        otherwise by title (`title_of(item)` if given, else item["title"]).
+        """
+        if not items:
+            return
+
+        by_pageid = []
+        by_title = []
+        for item in items:
+            if title_of is None and item.get("pageid"):
+                by_pageid.append(item)
+            elif title_of is not None or item.get("title"):
+                by_title.append(item)
+
+        pageid_meta, title_meta = await asyncio.gather(
+            self.page_metadata.get_by_pageids(item["pageid"] for item in by_pageid),
+            self.page_metadata.get_by_titles((title_of(item) if title_of else item["title"]) for item in by_title)
+        )
+
+        def apply(item, meta):
+            if meta.get("thumbnail"):
+                item["thumbnail"] = meta["thumbnail"]
+            if description and meta.get("description"):
+                item["description"] = meta["description"]
+
+        for item in by_pageid:
+            apply(item, pageid_meta.get(int(item["pageid"]), {}))
+        for item in by_title:
+            key = normalize_title(title_of(item) if title_of else item["title"])
+            apply(item, title_meta.get(key, {}))
+
+    def _window_aggregator(self, namespace: int, period: str, anon_only: bool, user: Optional[str], title: Optional[str]):
+        """
+        Returns the edit store's sliding-window aggregator if it can answer an
+        unfiltered top-N query for `period`, otherwise None (fall back to fetching).
+        """
+        from aggregates import WINDOWS
+
+        if not self.edit_store or user or title or period not in WINDOWS:
+            return None
+        if not self.edit_store.covers(namespace, int(time.time()) - WINDOWS[period]):
+            return None
+        return self.edit_store.aggregates.get(namespace, anon_only)
+
+    # Async cache decorator: bounded LRU + single-flight + stale-while-revalidate
+    def async_cache(ttl: int = 30, max_entries: int = 128, stale_ttl: Optional[int] = None):
+        """
+        Caches results per normalized call arguments.
+        - Concurrent misses for the same key share one in-flight call (single-flight).
+        - At most `max_entries` keys are kept; the least recently used is evicted.
+        - Entries older than `ttl` but younger than `ttl + stale_ttl` are returned
+          immediately while one background task refreshes them.
+        The wrapper exposes `cache`, `key(*args, **kwargs)` and `refresh(self, *args, **kwargs)`.
+        """
+        if stale_ttl is None:
+            stale_ttl = ttl * 5
+
         def decorator(func):
-            cache = {}
-            
+            cache = OrderedDict() # key -> (result, timestamp, JSON size for the bytes gauge)
+            inflight = {} # key -> asyncio.Task
+            signature = inspect.signature(func)
+
+            def make_key(args, kwargs):
+                # Bind against the signature so positional, keyword and default
+                # spellings of the same call share one entry
+                bound = signature.bind(None, *args, **kwargs)
+                bound.apply_defaults()
+                return tuple(list(bound.arguments.items())[1:])
+
+            def log_failure(task):
+                if not task.cancelled() and task.exception():
+                    logger.error(f"Error refreshing {func.__name__}: {task.exception()}")
+
+            def refresh(self, *args, **kwargs) -> asyncio.Task:
+                key = make_key(args, kwargs)
+                task = inflight.get(key)
+                if task is None:
+                    async def run():
+                        try:
+                            result = await func(self, *args, **kwargs)
+                            cache[key] = (result, time.time(), len(fastjson.dumps_bytes(result)))
+                            cache.move_to_end(key)
+                            while len(cache) > max_entries:
+                                cache.popitem(last=False)
+                            return result
+                        finally:
+                            inflight.pop(key, None)
+
+                    task = tracing.detached_task(run())
+                    task.add_done_callback(log_failure)
+                    inflight[key] = task
+                return task
+
+            @functools.wraps(func)
             async def wrapper(self, *args, **kwargs):
-                # Create a key based on args and kwargs
-                # We assume args are hashable (int, str). 
-                # kwargs might need sorting.
-                key = (args, tuple(sorted(kwargs.items())))
+                key = make_key(args, kwargs)
                 
                 now = time.time()
                 if key in cache:
-                    result, timestamp = cache[key]
-                    if now - timestamp < ttl:
+                    result, timestamp, _ = cache[key]
+                    age = now - timestamp
+                    if age < ttl + stale_ttl:
+                        cache.move_to_end(key)
+                        if age >= ttl:
+                            # Serve stale, revalidate in the background
+                            ASYNC_CACHE_REQUESTS.inc(func.__name__, "stale")
+                            tracing.record(func.__name__, time.perf_counter(), cache="stale")
+                            refresh(self, *args, **kwargs)
+                        else:
+                            ASYNC_CACHE_REQUESTS.inc(func.__name__, "hit")
+                            tracing.record(func.__name__, time.perf_counter(), cache="hit")
                         return result
                 
-                result = await func(self, *args, **kwargs)
-                cache[key] = (result, now)
-                return result
+                outcome = "shared" if key in inflight else "miss"
+                ASYNC_CACHE_REQUESTS.inc(func.__name__, outcome)
+                # Shield so a disconnecting caller does not cancel the shared fetch
+                with tracing.span(func.__name__, cache=outcome):
+                    return await asyncio.shield(refresh(self, *args, **kwargs))
+
+            _CACHED_METHODS[func.__name__] = wrapper
+            wrapper.cache = cache
+            wrapper.key = lambda *args, **kwargs: make_key(args, kwargs)
+            wrapper.refresh = refresh
+            wrapper.ttl = ttl
             return wrapper
         return decorator
 
@@ -355,99 +562,86 @@ class WikiClient:
         - "count": Unique users/Edit count (default/Most Edited)
         - "date": Last timestamp (Last Updated)
         """
-        # Fetch a large number of recent edits to aggregate
-        # We need enough edits to get meaningful data, especially for 7d
-        # Increased limits to ensure better coverage
-        max_fetch = 10000 if period == "7d" else 2000
-        # Minimal props for aggregation
-        edits = await self.get_recent_edits(limit=max_fetch, period=period, max_fetch=max_fetch, fetch_images=False, anon_only=anon_only, props="ids|title|user|timestamp|comment", user=user, title=title)
+        aggregator = self._window_aggregator(0, period, anon_only, user, title)
+        if aggregator:
+            # Answer from the incrementally maintained window (no fetch, no rescan)
+            with tracing.span("window_aggregate"):
+                results = aggregator.top_titles(period, limit, sort, section_field="active_section")
+        else:
+            # Fetch a large number of recent edits to aggregate
+            # We need enough edits to get meaningful data, especially for 7d
+            # Increased limits to ensure better coverage
+            max_fetch = 10000 if period == "7d" else 2000
+            # Minimal props for aggregation
+            edits = await self.get_recent_edits(limit=max_fetch, period=period, max_fetch=max_fetch, fetch_images=False, anon_only=anon_only, props="ids|title|user|timestamp|comment", user=user, title=title)
+            aggregating = time.perf_counter()
         
-        from collections import defaultdict
+            from collections import defaultdict
         
-        # Count unique users per title
-        title_users = defaultdict(set)
-        title_sections = defaultdict(lambda: defaultdict(int))
-        title_info = {} # Store basic info like pageid to fetch images later if needed
+            # Count unique users per title
+            title_users = defaultdict(set)
+            title_sections = defaultdict(lambda: defaultdict(int))
+            title_info = {} # Store basic info like pageid to fetch images later if needed
         
-        for edit in edits:
-            title = edit.get("title")
-            user = edit.get("user")
-            comment = edit.get("comment", "")
-
-            if title and user:
-                title_users[title].add(user)
-            
-            if title:
-                if title not in title_info:
-                    title_info[title] = {
-                        "pageid": edit.get("pageid"),
-                        "title": title,
-                        "last_timestamp": edit.get("timestamp"),
-                        "last_user": user if user else None
-                    }
+            for edit in edits:
+                title = edit.get("title")
+                user = edit.get("user")
+                comment = edit.get("comment", "")
+
+                if title and user:
+                    title_users[title].add(user)
+            
+                if title:
+                    if title not in title_info:
+                        title_info[title] = {
+                            "pageid": edit.get("pageid"),
+                            "title": title,
+                            "last_timestamp": edit.get("timestamp"),
+                            "last_user": user if user else None,
+                            "last_revid": edit.get("revid")
+                        }
                 
-                # Extract section
-                if comment:
-                    match = re.search(r'/\*\s*(.*?)\s*\*/', comment)
-                    if match:
-                        section = match.group(1).strip()
-                        if section:
-                            title_sections[title][section] += 1
+                    # Extract section
+                    if comment:
+                        match = re.search(r'/\*\s*(.*?)\s*\*/', comment)
+                        if match:
+                            section = match.group(1).strip()
+                            if section:
+                                title_sections[title][section] += 1
         
-        # Convert to list of dicts with count
-        results = []
-        for title, users in title_users.items():
-            info = title_info.get(title, {"title": title})
-            info["count"] = len(users)
+            # Convert to list of dicts with count
+            results = []
+            for title, users in title_users.items():
+                info = title_info.get(title, {"title": title})
+                info["count"] = len(users)
             
-            # Find most active section
-            sections = title_sections.get(title, {})
-            if sections:
-                most_active = max(sections.items(), key=lambda x: x[1])
-                info["active_section"] = most_active[0]
+                # Find most active section
+                sections = title_sections.get(title, {})
+                if sections:
+                    most_active = max(sections.items(), key=lambda x: x[1])
+                    info["active_section"] = most_active[0]
 
-            results.append(info)
+                results.append(info)
             
-        # Sort
-        if sort == "date":
-            # Sort by last_timestamp descending
-            results.sort(key=lambda x: x.get("last_timestamp", ""), reverse=True)
-        else:
-            # Default: Sort by count descending (Most Edited)
-            results.sort(key=lambda x: x["count"], reverse=True)
+            # Sort
+            if sort == "date":
+                # Sort by last_timestamp descending
+                results.sort(key=lambda x: x.get("last_timestamp", ""), reverse=True)
+            else:
+                # Default: Sort by count descending (Most Edited)
+                results.sort(key=lambda x: x["count"], reverse=True)
         
-        # Take top N
-        results = results[:limit]
+            # Take top N
+            results = results[:limit]
+            tracing.record("aggregate", aggregating, edits=len(edits))
             
         # Fetch images for top articles
-        if results:
-            page_ids = [str(r["pageid"]) for r in results if "pageid" in r]
-            chunk_size = 50
-            for i in range(0, len(page_ids), chunk_size):
-                chunk = page_ids[i:i + chunk_size]
-                if not chunk: continue
-                
-                img_params = {
-                    "action": "query",
-                    "prop": "pageimages",
-                    "pithumbsize": 100,
-                    "pageids": "|".join(chunk),
-                    "format": "json"
-                }
-                try:
-                    img_resp = await self.client.get(self.BASE_URL, params=img_params)
-                    img_data = img_resp.json()
-                    pages = img_data.get("query", {}).get("pages", {})
-                    
-                    for r in results:
-                        pid = str(r.get("pageid"))
-                        if pid in pages:
-                            thumbnail = pages[pid].get("thumbnail", {})
-                            if thumbnail:
-                                r["thumbnail"] = thumbnail.get("source")
-                except Exception as e:
-                    logger.error(f"Error fetching images for top articles: {e}")
-                    
+        await self._attach_page_metadata(results)
+
+        # Warm the diff cache for the latest edit of each listed article
+        if self.diff_prefetcher:
+            self.diff_prefetcher.submit(r.get("last_revid") for r in results)
+
         return results
 
     @async_cache(ttl=60)
@@ -455,29 +649,36 @@ class WikiClient:
         """
         Fetches top editors in the last `period`, ranked by number of edits.
         """
-        # Fetch a large number of recent edits to aggregate
-        # Increased limits significantly to ensure accuracy for "most edits"
-        max_fetch = 25000 if period == "7d" else 5000
-        # Minimal props for aggregation
-        edits = await self.get_recent_edits(limit=max_fetch, period=period, max_fetch=max_fetch, fetch_images=False, anon_only=anon_only, props="ids|title|user|timestamp", user=user, title=title)
+        aggregator = self._window_aggregator(0, period, anon_only, user, title)
+        if aggregator:
+            with tracing.span("window_aggregate"):
+                return aggregator.top_users(period, limit)
+        else:
+            # Fetch a large number of recent edits to aggregate
+            # Increased limits significantly to ensure accuracy for "most edits"
+            max_fetch = 25000 if period == "7d" else 5000
+            # Minimal props for aggregation
+            edits = await self.get_recent_edits(limit=max_fetch, period=period, max_fetch=max_fetch, fetch_images=False, anon_only=anon_only, props="ids|title|user|timestamp", user=user, title=title)
+            aggregating = time.perf_counter()
         
-        from collections import Counter
+            from collections import Counter
         
-        # Count edits per user
-        user_counts = Counter()
+            # Count edits per user
+            user_counts = Counter()
         
-        for edit in edits:
-            user = edit.get("user")
-            if user:
-                user_counts[user] += 1
+            for edit in edits:
+                user = edit.get("user")
+                if user:
+                    user_counts[user] += 1
         
-        # Convert to list of dicts
-        results = []
-        for user, count in user_counts.most_common(limit):
-            results.append({
-                "user": user,
-                "count": count
-            })
+            # Convert to list of dicts
+            results = []
+            for user, count in user_counts.most_common(limit):
+                results.append({
+                    "user": user,
+                    "count": count
+                })
+            tracing.record("aggregate", aggregating, edits=len(edits))
             
         return results
 
@@ -489,124 +690,88 @@ class WikiClient:
         - "count": Unique users (default/Most Active)
         - "date": Last timestamp (Last Updated)
         """
-        # Fetch a large number of recent edits to aggregate
-        max_fetch = 10000 if period == "7d" else 2000
-        # namespace=1 is Talk
-        # Minimal props for aggregation
-        # Prepare title if provided: ensure namespace 1 implied or filtered?
-        # get_recent_edits takes 'title'. If we provide 'title', it filters by that.
-        # But we also set namespace=1. So if the user searches for "Israel", we might want "Talk:Israel".
-        # Let's adjust title if it doesn't look like a talk page.
-        search_title = title
-        if title:
-             if not title.startswith("שיחה:") and not title.startswith("Talk:"):
-                  search_title = f"שיחה:{title}"
+        aggregator = self._window_aggregator(1, period, anon_only, user, title)
+        if aggregator:
+            # Answer from the incrementally maintained window (no fetch, no rescan)
+            with tracing.span("window_aggregate"):
+                results = aggregator.top_titles(period, limit, sort, section_field="active_discussion")
+        else:
+            # Fetch a large number of recent edits to aggregate
+            max_fetch = 10000 if period == "7d" else 2000
+            # namespace=1 is Talk
+            # Minimal props for aggregation
+            # Prepare title if provided: ensure namespace 1 implied or filtered?
+            # get_recent_edits takes 'title'. If we provide 'title', it filters by that.
+            # But we also set namespace=1. So if the user searches for "Israel", we might want "Talk:Israel".
+            # Let's adjust title if it doesn't look like a talk page.
+            search_title = title
+            if title:
+                 if not title.startswith("שיחה:") and not title.startswith("Talk:"):
+                      search_title = f"שיחה:{title}"
         
-        edits = await self.get_recent_edits(limit=max_fetch, period=period, max_fetch=max_fetch, fetch_images=False, namespace=1, anon_only=anon_only, props="ids|title|user|timestamp|comment", user=user, title=search_title)
+            edits = await self.get_recent_edits(limit=max_fetch, period=period, max_fetch=max_fetch, fetch_images=False, namespace=1, anon_only=anon_only, props="ids|title|user|timestamp|comment", user=user, title=search_title)
+            aggregating = time.perf_counter()
         
-        from collections import defaultdict
+            from collections import defaultdict
         
-        # Count unique users per title
-        title_users = defaultdict(set)
-        title_sections = defaultdict(lambda: defaultdict(int))
-        title_info = {} 
+            # Count unique users per title
+            title_users = defaultdict(set)
+            title_sections = defaultdict(lambda: defaultdict(int))
+            title_info = {} 
         
-        for edit in edits:
-            title = edit.get("title")
-            user = edit.get("user")
-            comment = edit.get("comment", "")
-            
-            if title and user:
-                title_users[title].add(user)
-            
-            if title:
-                if title not in title_info:
-                    title_info[title] = {
-                        "pageid": edit.get("pageid"),
-                        "title": title,
-                        "last_timestamp": edit.get("timestamp"),
-                        "last_user": user if user else None
-                    }
+            for edit in edits:
+                title = edit.get("title")
+                user = edit.get("user")
+                comment = edit.get("comment", "")
+            
+                if title and user:
+                    title_users[title].add(user)
+            
+                if title:
+                    if title not in title_info:
+                        title_info[title] = {
+                            "pageid": edit.get("pageid"),
+                            "title": title,
+                            "last_timestamp": edit.get("timestamp"),
+                            "last_user": user if user else None
+                        }
                 
-                # Extract section
-                if comment:
-                    match = re.search(r'/\*\s*(.*?)\s*\*/', comment)
-                    if match:
-                        section = match.group(1).strip()
-                        if section:
-                            title_sections[title][section] += 1
+                    # Extract section
+                    if comment:
+                        match = re.search(r'/\*\s*(.*?)\s*\*/', comment)
+                        if match:
+                            section = match.group(1).strip()
+                            if section:
+                                title_sections[title][section] += 1
         
-        # Convert to list of dicts with count
-        results = []
-        for title, users in title_users.items():
-            info = title_info.get(title, {"title": title})
-            info["count"] = len(users)
+            # Convert to list of dicts with count
+            results = []
+            for title, users in title_users.items():
+                info = title_info.get(title, {"title": title})
+                info["count"] = len(users)
             
-            # Find most active section
-            sections = title_sections.get(title, {})
-            if sections:
-                most_active = max(sections.items(), key=lambda x: x[1])
-                info["active_discussion"] = most_active[0]
+                # Find most active section
+                sections = title_sections.get(title, {})
+                if sections:
+                    most_active = max(sections.items(), key=lambda x: x[1])
+                    info["active_discussion"] = most_active[0]
             
-            results.append(info)
+                results.append(info)
             
-        # Sort
-        if sort == "date":
-            # Sort by last_timestamp descending
-            results.sort(key=lambda x: x.get("last_timestamp", ""), reverse=True)
-        else:
-            # Default: Sort by count descending (Most Active)
-            results.sort(key=lambda x: x["count"], reverse=True)
+            # Sort
+            if sort == "date":
+                # Sort by last_timestamp descending
+                results.sort(key=lambda x: x.get("last_timestamp", ""), reverse=True)
+            else:
+                # Default: Sort by count descending (Most Active)
+                results.sort(key=lambda x: x["count"], reverse=True)
         
-        # Take top N
-        results = results[:limit]
+            # Take top N
+            results = results[:limit]
+            tracing.record("aggregate", aggregating, edits=len(edits))
             
         # Fetch images from main articles
-        if results:
-            # Map clean title to result objects (could be multiple if normalization is tricky, but usually 1-1)
-            clean_title_to_results = defaultdict(list)
-            
-            for r in results:
-                title = r["title"]
-                clean_title = title
-                if title.startswith("שיחה:"):
-                    clean_title = title.replace("שיחה:", "", 1)
-                elif title.startswith("Talk:"):
-                    clean_title = title.replace("Talk:", "", 1)
-                
-                clean_title_to_results[clean_title].append(r)
-            
-            clean_titles = list(clean_title_to_results.keys())
-            
-            chunk_size = 50
-            for i in range(0, len(clean_titles), chunk_size):
-                chunk = clean_titles[i:i + chunk_size]
-                if not chunk: continue
-                
-                img_params = {
-                    "action": "query",
-                    "prop": "pageimages",
-                    "pithumbsize": 100,
-                    "titles": "|".join(chunk),
-                    "format": "json"
-                }
-                try:
-                    img_resp = await self.client.get(self.BASE_URL, params=img_params)
-                    img_data = img_resp.json()
-                    pages = img_data.get("query", {}).get("pages", {})
-                    
-                    for pid, pdata in pages.items():
-                        if "thumbnail" in pdata:
-                            api_title = pdata.get("title")
-                            thumb_url = pdata["thumbnail"]["source"]
-                            
-                            # Try to match with our clean titles
-                            if api_title in clean_title_to_results:
-                                for r in clean_title_to_results[api_title]:
-                                    r["thumbnail"] = thumb_url
-                            
-                except Exception as e:
-                    logger.error(f"Error fetching images for top talk pages: {e}")
+        await self._attach_page_metadata(results, title_of=lambda r: re.sub(r'^(שיחה|Talk):', '', r["title"]))
 
         return results
 
@@ -649,39 +814,13 @@ class WikiClient:
             params["rctitle"] = title
 
         try:
-            response = await self.client.get(self.BASE_URL, params=params)
+            response = await self._api_get(params)
             response.raise_for_status()
-            data = response.json()
+            data = fastjson.loads(response.content)
             new_articles = data.get("query", {}).get("recentchanges", [])
             
             # Fetch images
-            if new_articles:
-                page_ids = [str(a["pageid"]) for a in new_articles if "pageid" in a]
-                chunk_size = 50
-                for i in range(0, len(page_ids), chunk_size):
-                    chunk = page_ids[i:i + chunk_size]
-                    if not chunk: continue
-                    
-                    img_params = {
-                        "action": "query",
-                        "prop": "pageimages",
-                        "pithumbsize": 100,
-                        "pageids": "|".join(chunk),
-                        "format": "json"
-                    }
-                    try:
-                        img_resp = await self.client.get(self.BASE_URL, params=img_params)
-                        img_data = img_resp.json()
-                        pages = img_data.get("query", {}).get("pages", {})
-                        
-                        for article in new_articles:
-                            pid = str(article.get("pageid"))
-                            if pid in pages:
-                                thumbnail = pages[pid].get("thumbnail", {})
-                                if thumbnail:
-                                    article["thumbnail"] = thumbnail.get("source")
-                    except Exception as e:
-                        logger.error(f"Error fetching images for new articles: {e}")
+            await self._attach_page_metadata(new_articles)
             
             return new_articles
             
@@ -693,30 +832,14 @@ class WikiClient:
     async def get_top_viewed_articles(self, limit: int = 25, period: str = "24h", user: Optional[str] = None, title: Optional[str] = None) -> List[Dict]:
         """
         Fetches top viewed articles.
-        If period="24h", fetches from yesterday.
-        If period="7d", fetches last 7 days and aggregates.
+        If period="24h", uses yesterday (or the day before, until yesterday is published).
+        If period="7d", merges the last 7 days.
+        Daily rankings come from the TopViewsStore, so only days not seen before are fetched.
         """
         from datetime import datetime, timedelta
         from collections import defaultdict
-        
-        # Helper to fetch one day
-        async def fetch_day(date):
-            year = date.strftime("%Y")
-            month = date.strftime("%m")
-            day = date.strftime("%d")
-            url = f"https://wikimedia.org/api/rest_v1/metrics/pageviews/top/he.wikipedia/all-access/{year}/{month}/{day}"
-            try:
-                response = await self.client.get(url)
-                response.raise_for_status()
-                data = response.json()
-                items = data.get("items", [])
-                if items:
-                    return items[0].get("articles", [])
-            except Exception as e:
-                logger.error(f"Error fetching top viewed for {date}: {e}")
-            return []
 
-        # If user is filtered, we find articles they edited recently and check their views
+        # If user or title is filtered, we rank the articles of interest by their own views
         articles_of_interest = None
         if title:
             # Explicit title search
@@ -727,80 +850,38 @@ class WikiClient:
             articles_of_interest = set(edit["title"] for edit in user_edits)
             if not articles_of_interest:
                 return []
-            
-            # Since we can't easily filter the global top views list by a huge list of arbitrary user articles (which might not be in the global top 1000),
-            # we must fetch views for these specific articles.
-            # Batch fetch views for these articles using a different API or strategy.
-            # Strategy: batch fetch pageviews using action=query&prop=pageviews
-            
-            results = []
-            titles = list(articles_of_interest)
-            chunk_size = 50
-            
-            # Aggregate views manually
-            
-            # Note: action=query&prop=pageviews returns last N days. 
-            # We need to sum them up based on Period.
-            
-            # Determine how many days to fetch
-            # Since pageviews can lag by 1-2 days, we fetch more days to be safe.
+
+        if articles_of_interest:
+            # These articles are usually not in the global top 1000, so their views
+            # come from prop=pageviews, cached per (title, day) in the TitleViewsStore.
+            # Since pageviews can lag by 1-2 days, we look at more days to be safe.
             days_back = 10 if period == "7d" else 5
-            
-            for i in range(0, len(titles), chunk_size):
-                chunk = titles[i:i+chunk_size]
-                if not chunk: continue
-                
-                params = {
-                    "action": "query",
-                    "prop": "pageviews",
-                    "titles": "|".join(chunk),
-                    "pvipdays": days_back, # Max days
-                    "format": "json"
-                }
-
-                try:
-                    resp = await self.client.get(self.BASE_URL, params=params)
-                    data = resp.json()
-                    pages = data.get("query", {}).get("pages", {})
-                    
-                    for pid, pdata in pages.items():
-                        title = pdata.get("title")
-                        pviews = pdata.get("pageviews", {})
-                        if not pviews: continue
-                        
-                        # Filter out None values
-                        valid_views = [v for v in pviews.values() if v is not None]
-                        if not valid_views:
-                            continue
-                            
-                        if period == "24h":
-                            # For 24h, we want the most recent day's activity that is recorded.
-                            # Since valid_views are ordered by date (usually), we take the last one?
-                            # Actually, dict values order isn't guaranteed in older python but usually is in 3.7+
-                            # Let's sort keys to be safe
-                            sorted_dates = sorted(pviews.keys())
-                            last_date = sorted_dates[-1]
-                            # Find last non-null
-                            latest_val = 0
-                            for d in reversed(sorted_dates):
-                                if pviews[d] is not None:
-                                    latest_val = pviews[d]
-                                    break
-                            total_views = latest_val
-                        else:
-                            # For 7d, sum all available in the window
-                            total_views = sum(valid_views)
-
-                        if total_views > 0:
-                            results.append({
-                                "title": title,
-                                "views": total_views,
-                                "page_title_for_api": title.replace(" ", "_")
-                            })
-                            
-                except Exception as e:
-                     logger.error(f"Error fetching user article views: {e}")
-            
+            today = datetime.utcnow().date()
+            days = [(today - timedelta(days=i)).isoformat() for i in range(days_back)]
+            title_views = await self.title_views.get_views(list(articles_of_interest), days)
+
+            results = []
+            for article, pviews in title_views.items():
+                # Newest first, skipping days that have no data (yet)
+                valid_views = [v for v in pviews.values() if v is not None]
+                if not valid_views:
+                    continue
+
+                if period == "24h":
+                    # The most recent day's activity that is recorded
+                    total_views = valid_views[0]
+                else:
+                    # For 7d, sum all available in the window
+                    total_views = sum(valid_views)
+
+                if total_views > 0:
+                    display_title = article.replace("_", " ")
+                    results.append({
+                        "title": display_title,
+                        "views": total_views,
+                        "page_title_for_api": display_title.replace(" ", "_")
+                    })
+
             # Sort
             results.sort(key=lambda x: x["views"], reverse=True)
             results = results[:limit]
@@ -808,31 +889,20 @@ class WikiClient:
             # Rank
             for i, r in enumerate(results):
                 r["rank"] = i + 1
-                
-            # Fetch images (reusing logic below)
-            # Proceed to image fetching...
-            # We skip the global fetch block below
         else:
             # Original Global Logic
+            yesterday = (datetime.utcnow() - timedelta(days=1)).date()
             if period == "7d":
-                dates_to_fetch = []
-                yesterday = datetime.utcnow() - timedelta(days=1)
-                for i in range(7):
-                    dates_to_fetch.append(yesterday - timedelta(days=i))
-                
-                # Fetch in parallel
-                tasks = [fetch_day(date) for date in dates_to_fetch]
-                results_list = await asyncio.gather(*tasks)
+                # Closed days are cached; at most the newest one is fetched
+                results_list = await self.top_views.get_days([yesterday - timedelta(days=i) for i in range(7)])
             else:
                 # Try yesterday first
-                yesterday = datetime.utcnow() - timedelta(days=1)
-                day_data = await fetch_day(yesterday)
+                day_data = await self.top_views.get_day(yesterday)
                 
                 if not day_data:
                     logger.info(f"No top viewed data for {yesterday}, trying day before")
                     # Fallback to day before yesterday
-                    day_before = yesterday - timedelta(days=1)
-                    day_data = await fetch_day(day_before)
+                    day_data = await self.top_views.get_day(yesterday - timedelta(days=1))
                 
                 results_list = [day_data]
             
@@ -840,10 +910,7 @@ class WikiClient:
             article_views = defaultdict(int)
             
             for day_articles in results_list:
-                for article in day_articles:
-                    title = article.get("article")
-                    views = article.get("views")
-                    
+                for title, views in day_articles or ():
                     # Filter special pages
                     if title == "עמוד_ראשי" or title.startswith("מיוחד:") or title.startswith("ויקיפדיה:"):
                         continue
@@ -864,64 +931,45 @@ class WikiClient:
                     "page_title_for_api": title
                 })
             
-        # Fetch images
-        if results:
-            titles = [r["page_title_for_api"] for r in results]
-            chunk_size = 50
-            for i in range(0, len(titles), chunk_size):
-                chunk = titles[i:i + chunk_size]
-                if not chunk: continue
-                
-                img_params = {
-                    "action": "query",
-                    "prop": "pageimages|description",
-                    "pithumbsize": 100,
-                    "titles": "|".join(chunk),
-                    "format": "json"
-                }
-                try:
-                    img_resp = await self.client.get(self.BASE_URL, params=img_params)
-                    img_data = img_resp.json()
-                    pages = img_data.get("query", {}).get("pages", {})
-                    
-                    title_to_thumb = {}
-                    title_to_desc = {}
-                    for pid, pdata in pages.items():
-                        api_title_underscore = pdata.get("title", "").replace(" ", "_")
-                        api_title_space = pdata.get("title", "")
-                        
-                        if "thumbnail" in pdata:
-                            title_to_thumb[api_title_underscore] = pdata["thumbnail"]["source"]
-                            title_to_thumb[api_title_space] = pdata["thumbnail"]["source"]
-                        
-                        if "description" in pdata:
-                            title_to_desc[api_title_underscore] = pdata["description"]
-                            title_to_desc[api_title_space] = pdata["description"]
-
-                    for r in results:
-                        t_underscore = r["page_title_for_api"]
-                        t_space = r["title"]
-                        
-                        # Set thumbnail
-                        if t_underscore in title_to_thumb:
-                            r["thumbnail"] = title_to_thumb[t_underscore]
-                        elif t_space in title_to_thumb:
-                            r["thumbnail"] = title_to_thumb[t_space]
-                            
-                        # Set description
-                        if t_underscore in title_to_desc:
-                            r["description"] = title_to_desc[t_underscore]
-                        elif t_space in title_to_desc:
-                            r["description"] = title_to_desc[t_space]
-                            
-                except Exception as e:
-                    logger.error(f"Error fetching images for top viewed: {e}")
+        # Fetch images and descriptions
+        await self._attach_page_metadata(results, title_of=lambda r: r["page_title_for_api"], description=True)
 
         return results
 
-    async def get_diff(self, revid: int) -> Optional[str]:
+    async def get_diff(self, revid: int, priority: int = INTERACTIVE) -> Optional[str]:
         """
         Fetches the diff HTML for a specific revision.
+        Diffs never change, so they are served from the byte-bounded diff cache,
+        and concurrent requests for the same revid share one compare call, unless
+        the call in flight has a lower priority (e.g. a BULK prefetch): then the
+        caller starts its own, so an opened diff never waits behind the bulk lane.
+        """
+        cached = self.diff_cache.get(revid)
+        if cached is not None:
+            DIFF_CACHE_REQUESTS.inc("hit")
+            return cached
+
+        inflight = self._diff_inflight.get(revid)
+        if inflight is not None and inflight[1] <= priority:
+            DIFF_CACHE_REQUESTS.inc("shared")
+            return await asyncio.shield(inflight[0])
+
+        DIFF_CACHE_REQUESTS.inc("miss")
+        task = tracing.detached_task(self._fetch_diff(revid, priority))
+        self._diff_inflight[revid] = (task, priority)
+
+        def forget(done):
+            entry = self._diff_inflight.get(revid)
+            if entry is not None and entry[0] is done:
+                del self._diff_inflight[revid]
+
+        task.add_done_callback(forget)
+        return await asyncio.shield(task)
+
+    async def _fetch_diff(self, revid: int, priority: int = INTERACTIVE, cache: bool = True) -> Optional[str]:
+        """
+        One compare call. With cache=False (bulk indexing) the result is not
+        stored in the user-facing diff cache.
         """
         params = {
             "action": "compare",
@@ -931,12 +979,15 @@ class WikiClient:
         }
         
         try:
-            response = await self.client.get(self.BASE_URL, params=params)
+            response = await self._api_get(params, priority=priority)
             # We don't raise for status immediately as API might return 200 with error
-            data = response.json()
+            data = fastjson.loads(response.content)
             
             if "compare" in data and "*" in data["compare"]:
-                return data["compare"]["*"]
+                diff_html = data["compare"]["*"]
+                if cache:
+                    self.diff_cache.set(revid, diff_html)
+                return diff_html
             elif "error" in data:
                  logger.warning(f"Error fetching diff for {revid}: {data['error']}")
             